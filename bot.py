@@ -1,38 +1,142 @@
 import asyncio
 import config
 import database
-import logging
+import event_log
+import signal
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.bot import DefaultBotProperties
 
-from handlers import admin, user
+from handlers import admin, operator, user
+from logging_setup import report_log_aggregates, setup_logging
+from middlewares.concurrency import ConcurrencyMiddleware, report_dispatch_metrics
+from middlewares.recorder import UpdateRecorderMiddleware
+from middlewares.tenant import TenantMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.unit_of_work import UnitOfWorkMiddleware
+from services.albums import AlbumCollector
+from services.backup import run_backups
+from services.handoff import POLLING_LEASE, Lease, Scheduler
+from services.http_session import TunedAiohttpSession, report_http_metrics
+from services.outbox import run_outbox
+from services.polling import run_polling
+from services.profiler import RuntimeProfiler
+from services.review_queue import send_pending_digests
 from services.subscriptions import check_subscriptions
+from services.teardown import run_teardowns
+from services.tenants import Tenants
 
-logging.basicConfig(level=logging.INFO)
 
+def create_dispatcher(tenants: Tenants, throttle: bool = True) -> Dispatcher:
+    """
+    Собирает Dispatcher с роутерами и middleware.
+    Используется и ботом, и офлайн-инструментами (tools/replay_updates.py).
+    """
+    dp = Dispatcher()
 
-async def main():
-    # init DB
-    database.init_db()
+    # пул инвайт-ссылок и inline-витрина бота, получившего апдейт,
+    # доступны хендлерам как аргументы invite_pool и storefront
+    dp["tenants"] = tenants
+    dp.update.outer_middleware(TenantMiddleware(tenants))
 
-    # init bot & dispatcher
-    bot = Bot(
-        token=config.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode="HTML")
+    # запись входящих апдейтов для офлайн-профилирования
+    if config.RECORD_UPDATES_PATH:
+        dp.update.outer_middleware(UpdateRecorderMiddleware(config.RECORD_UPDATES_PATH))
+
+    # ограничение одновременных хендлеров, у владельцев каналов своя полоса;
+    # до единицы работы, чтобы ожидающие апдейты не держали соединение с БД
+    dp["concurrency"] = ConcurrencyMiddleware(
+        lambda update, raw_state: admin.is_admin_update(update, raw_state) or operator.is_operator_update(update)
     )
-    dp = Dispatcher()
+    dp.update.outer_middleware(dp["concurrency"])
+
+    # одно соединение и транзакция БД на апдейт
+    dp.update.outer_middleware(UnitOfWorkMiddleware())
+
+    # антифлуд: у покупателей и владельцев свои лимиты — одобрение заявок
+    # подряд не должно упираться в лимит, рассчитанный на /start и покупки
+    if throttle:
+        for router, throttling in (
+            (user.router, ThrottlingMiddleware()),
+            (admin.router, ThrottlingMiddleware(config.THROTTLE_OWNER_RATE, config.THROTTLE_OWNER_BURST)),
+        ):
+            router.message.middleware(throttling)
+            router.callback_query.middleware(throttling)
+
+    # сборка альбомов чеков (аргумент albums)
+    dp["albums"] = AlbumCollector()
+
+    # профилирование по команде оператора (аргумент profiler)
+    dp["profiler"] = RuntimeProfiler()
 
     # include routers
+    dp.include_router(operator.router)
     dp.include_router(admin.router)
     dp.include_router(user.router)
+    return dp
+
+
+async def main():
+    # init bots: одна HTTP-сессия на всех, по соединению опроса на бота
+    session = TunedAiohttpSession(polling_connections=len(config.BOT_TOKENS))
+    tenants = Tenants()
+    for token in config.BOT_TOKENS:
+        tenants.add(Bot(
+            token=token,
+            session=session,
+            default=DefaultBotProperties(parse_mode="HTML")
+        ))
+
+    # init DB; каналы без бота закрепляются за первым
+    database.init_db(default_bot_id=tenants.default.bot_id)
+
+    # журнал доменных событий пишется фоновым потоком
+    event_log.start()
+
+    dp = create_dispatcher(tenants)
+
+    # SIGTERM/SIGINT: перестать принимать апдейты, доработать начатое и отдать аренды
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    # пулы инвайт-ссылок и метрики — свои у каждого процесса,
+    # при деплое пулы прогреваются, пока новый процесс ждёт аренду
+    for tenant in tenants:
+        asyncio.create_task(tenant.invite_pool.run())
+    asyncio.create_task(report_http_metrics(session))
+    asyncio.create_task(report_log_aggregates())
+    asyncio.create_task(report_dispatch_metrics(dp["concurrency"]))
 
-    # start background task
-    asyncio.create_task(check_subscriptions(bot))
+    # start background tasks: обход подписок и outbox общие для всех ботов,
+    # выполняет их держатель аренды планировщика
+    def background_jobs():
+        jobs = [check_subscriptions(), run_outbox(tenants), run_teardowns(tenants)]
+        if config.REVIEW_QUEUE_MODE:
+            jobs.append(send_pending_digests(tenants))
+        if config.BACKUP_INTERVAL > 0:
+            jobs.append(run_backups())
+        return jobs
 
-    # start polling
-    await dp.start_polling(bot, skip_updates=True)
+    scheduler = asyncio.create_task(Scheduler(background_jobs).run(stop))
 
+    # start polling: с сохранённого offset, когда прежний процесс отдал аренду опроса
+    polling = Lease(POLLING_LEASE)
+    try:
+        if await polling.acquire(stop):
+            keeper = asyncio.create_task(polling.keep(stop))
+            try:
+                await run_polling(dp, tenants.bots, stop)
+            finally:
+                keeper.cancel()
+                polling.release()
+        stop.set()
+        await scheduler
+    finally:
+        await session.close()
+        event_log.stop()
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
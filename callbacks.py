@@ -0,0 +1,148 @@
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple, Union
+from aiogram import Router, types
+from aiogram.dispatcher.event.handler import CallableObject
+
+# -----------------------------
+# Короткие теги действий
+# -----------------------------
+START = "s"
+START_ADD_CHANNEL = "sa"
+ENTER_CHANNEL = "ec"
+BUY = "b"
+BACK_TO_TARIFFS = "bt"
+SUBSCRIPTIONS_PAGE = "mp"
+
+ADD_MY_CHANNEL = "am"
+ENTER_ADMIN_CHANNEL = "ea"
+CANCEL_ADMIN = "ca"
+CLOSE_MENU = "cl"
+CHANNEL_MENU = "cm"
+UPDATE_PAYMENT_INFO = "up"
+DEL_CHANNEL = "dc"
+ADD_TARIFF = "at"
+LIST_TARIFFS = "lt"
+DEL_TARIFF = "dt"
+CHANNELS_PAGE = "cp"
+TARIFFS_PAGE = "tp"
+APPROVE = "a"
+REJECT = "r"
+REJECT_SILENT = "rs"
+PENDING_PAGE = "pp"
+SHOW_PROOF = "sp"
+APPROVE_VISIBLE = "av"
+REJECT_VISIBLE = "rv"
+EXTEND_SUBSCRIPTIONS = "es"
+
+SEP = ":"
+MAX_LEN = 64  # лимит Telegram на callback_data в байтах
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+class CallbackData(NamedTuple):
+    """
+    Разобранная callback_data: тег действия и целочисленные аргументы.
+    """
+    action: str
+    args: Tuple[int, ...]
+
+
+def _encode_int(value: int) -> str:
+    """
+    Кодирует целое (в т.ч. отрицательное) в base36.
+    """
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    out = []
+    while value:
+        value, rem = divmod(value, 36)
+        out.append(_DIGITS[rem])
+    return sign + "".join(reversed(out))
+
+
+def pack(action: str, *args: int) -> str:
+    """
+    Собирает callback_data вида "<tag>:<int36>:<int36>...".
+    """
+    data = SEP.join([action, *(_encode_int(a) for a in args)])
+    if len(data.encode()) > MAX_LEN:
+        raise ValueError(f"callback_data too long: {data}")
+    return data
+
+
+def unpack(data: str) -> CallbackData:
+    """
+    Разбирает callback_data, собранную через pack().
+    """
+    action, *raw = data.split(SEP)
+    return CallbackData(action, tuple(int(r, 36) for r in raw))
+
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class CallbackTable:
+    """
+    Таблица обработчиков callback-запросов, индексированная по тегу.
+
+    На роутер регистрируется один обработчик: фильтр разбирает
+    callback_data и ищет тег в словаре, поэтому маршрутизация не зависит
+    от количества действий. Неизвестные теги пропускаются дальше,
+    к следующему роутеру.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, Tuple[int, CallableObject]] = {}
+
+    def register(self, action: str, arity: int = 0) -> Callable[[Handler], Handler]:
+        """
+        Декоратор: привязывает обработчик к тегу с заданным числом аргументов.
+        Обработчик получает разобранные данные в аргументе `cd`.
+        """
+        def decorator(func: Handler) -> Handler:
+            if action in self._handlers:
+                raise ValueError(f"Callback action already registered: {action}")
+            self._handlers[action] = (arity, CallableObject(func))
+            return func
+        return decorator
+
+    def __contains__(self, action: str) -> bool:
+        return action in self._handlers
+
+    def resolve(self, action: str) -> Optional[Handler]:
+        """
+        Обработчик, зарегистрированный на тег, или None.
+        """
+        entry = self._handlers.get(action)
+        return entry[1].callback if entry else None
+
+    def attach(self, router: Router) -> None:
+        """
+        Регистрирует диспетчер таблицы на роутере.
+        """
+        router.callback_query.register(self._dispatch, self._match)
+
+    def _match(self, callback: types.CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        if not callback.data:
+            return False
+        action = callback.data.split(SEP, 1)[0]
+        entry = self._handlers.get(action)
+        if entry is None:
+            return False
+        # Некорректные данные с известным тегом не уходят дальше по роутерам
+        return {"cd": self._decode(callback.data, entry[0])}
+
+    @staticmethod
+    def _decode(data: str, arity: int) -> Optional[CallbackData]:
+        try:
+            cd = unpack(data)
+        except ValueError:
+            return None
+        return cd if len(cd.args) == arity else None
+
+    async def _dispatch(self, callback: types.CallbackQuery, cd: Optional[CallbackData], **kwargs: Any) -> Any:
+        if cd is None:
+            return await callback.answer("❗ Ошибка данных", show_alert=True)
+        _, handler = self._handlers[cd.action]
+        return await handler.call(callback, cd=cd, **kwargs)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+
+class SystemClock:
+    """
+    Настоящее время: time.time() и asyncio.sleep().
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Виртуальное время для симуляций и тестов:
+    sleep() не ждёт, а сразу сдвигает часы вперёд.
+    """
+
+    def __init__(self, start: float) -> None:
+        self._now = start
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        self._now += seconds
+
+    async def sleep(self, seconds: float) -> None:
+        self._now += seconds
+        await asyncio.sleep(0)
+
+
+_current = SystemClock()
+
+
+def use(clock) -> None:
+    """
+    Подменяет часы, которыми пользуются БД и планировщик.
+    """
+    global _current
+    _current = clock
+
+
+def now() -> int:
+    """
+    Текущее время в секундах (unix timestamp).
+    """
+    return int(_current.time())
+
+
+async def sleep(seconds: float) -> None:
+    await _current.sleep(seconds)
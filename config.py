@@ -4,4 +4,138 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Несколько ботов в одном процессе: токены через запятую (первый — бот по умолчанию)
+BOT_TOKENS = [t.strip() for t in os.getenv("BOT_TOKENS", BOT_TOKEN or "").split(",") if t.strip()]
+# Операторы (ID через запятую): команды профилирования /profile, /memsnap, /slowcb
+OPERATOR_IDS = {int(i) for i in os.getenv("OPERATOR_IDS", "").split(",") if i.strip()}
 DATABASE_NAME = os.getenv("DATABASE_NAME", "bot.db")
+# Сколько миллисекунд соединение ждёт чужую блокировку записи, прежде чем
+# вернуть «database is locked» (ожидание блокирует event loop — держим коротким)
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "2000"))
+
+# Пул заранее созданных одноразовых инвайт-ссылок (хранится в БД).
+# Ссылка живёт INVITE_LINK_TTL и выдаётся, пока ей осталось не меньше
+# INVITE_LINK_MIN_TTL: покупатель получает ссылку минимум на столько
+INVITE_POOL_SIZE = int(os.getenv("INVITE_POOL_SIZE", "3"))
+INVITE_LINK_TTL = int(os.getenv("INVITE_LINK_TTL", str(24 * 3600)))
+INVITE_LINK_MIN_TTL = int(os.getenv("INVITE_LINK_MIN_TTL", str(12 * 3600)))
+INVITE_POOL_INTERVAL = int(os.getenv("INVITE_POOL_INTERVAL", "60"))
+
+# Антифлуд: токен-бакет на пару (пользователь, действие)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "0.5"))  # токенов в секунду
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_MAX_KEYS = int(os.getenv("THROTTLE_MAX_KEYS", "100000"))
+# Свой лимит для роутера владельцев: разбор очереди — десятки нажатий подряд
+THROTTLE_OWNER_RATE = float(os.getenv("THROTTLE_OWNER_RATE", "5"))
+THROTTLE_OWNER_BURST = int(os.getenv("THROTTLE_OWNER_BURST", "50"))
+
+# Режим очереди проверки: чеки не пересылаются владельцу по одному,
+# а копятся в БД и показываются дайджестом и командой /pending
+REVIEW_QUEUE_MODE = os.getenv("REVIEW_QUEUE_MODE", "0") == "1"
+REVIEW_DIGEST_INTERVAL = int(os.getenv("REVIEW_DIGEST_INTERVAL", "1800"))
+REVIEW_PAGE_SIZE = int(os.getenv("REVIEW_PAGE_SIZE", "10"))
+NOTIFY_PACE = float(os.getenv("NOTIFY_PACE", "0.05"))  # пауза между дайджестами владельцам, сек
+# Альбом чеков: сколько секунд ждать следующее фото с тем же media_group_id
+MEDIA_GROUP_WINDOW = float(os.getenv("MEDIA_GROUP_WINDOW", "1.0"))
+
+# Размер страницы в списках каналов, тарифов и подписок
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+
+# Inline-витрина: сколько секунд Telegram кеширует ответ на запрос
+# (после правки тарифов старая карточка может показываться до этого срока)
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "20"))  # не больше 50
+
+# Outbox: фоновые воркеры побочных эффектов (исключение, напоминания, уведомления)
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_RETENTION = int(os.getenv("OUTBOX_RETENTION", str(7 * 86400)))
+OUTBOX_DEAD_RETENTION = int(os.getenv("OUTBOX_DEAD_RETENTION", str(30 * 86400)))  # исчерпавшие попытки
+# Общий темп всех воркеров: задач в секунду на бота (лимит Telegram — ~30 сообщений/с)
+OUTBOX_RATE = float(os.getenv("OUTBOX_RATE", "25"))
+
+# Удаление канала: фоновый разбор порциями с ограниченной скоростью исключений
+TEARDOWN_CHUNK = int(os.getenv("TEARDOWN_CHUNK", "500"))  # строк за одну транзакцию
+TEARDOWN_RATE = int(os.getenv("TEARDOWN_RATE", "5"))  # исключений участников в секунду
+TEARDOWN_INTERVAL = int(os.getenv("TEARDOWN_INTERVAL", "5"))  # сек между шагами
+TEARDOWN_REPORT_INTERVAL = int(os.getenv("TEARDOWN_REPORT_INTERVAL", "30"))  # сек между отчётами владельцу
+
+# Продление всех подписок канала владельцем (простой канала, акция)
+BULK_EXTEND_MAX_DAYS = int(os.getenv("BULK_EXTEND_MAX_DAYS", "365"))
+BULK_NOTIFY_RATE = int(os.getenv("BULK_NOTIFY_RATE", "10"))  # уведомлений подписчикам в секунду
+
+# Профилирование по команде оператора
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # период выборки стека, сек
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "1"))  # глубина стека в снимках памяти
+
+# HTTP-сессия Bot API
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "50"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "3600"))
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "30"))
+# Таймауты по методам: "sendPhoto=60,banChatMember=10"
+HTTP_METHOD_TIMEOUTS = {
+    name.strip(): int(value)
+    for name, value in (
+        item.split("=", 1) for item in os.getenv("HTTP_METHOD_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+HTTP_METRICS_INTERVAL = int(os.getenv("HTTP_METRICS_INTERVAL", "300"))
+
+# Запись входящих апдейтов (обезличенных) в JSONL для tools/replay_updates.py;
+# пусто — запись выключена. Пишется фоновым потоком, как журнал событий
+RECORD_UPDATES_PATH = os.getenv("RECORD_UPDATES_PATH", "")
+RECORD_UPDATES_MAX_BYTES = int(os.getenv("RECORD_UPDATES_MAX_BYTES", str(256 * 1024 * 1024)))  # порог ротации
+RECORD_UPDATES_KEEP = int(os.getenv("RECORD_UPDATES_KEEP", "4"))  # сколько последних сегментов хранить
+
+# Журнал доменных событий (JSONL, append-only) для аналитики; пусто — выключен.
+# Включён по умолчанию: на диске не больше (EVENT_LOG_KEEP + 1) * EVENT_LOG_MAX_BYTES,
+# старые сегменты удаляются при ротации — забирайте их для аналитики раньше
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "events.jsonl")
+EVENT_LOG_MAX_BYTES = int(os.getenv("EVENT_LOG_MAX_BYTES", str(64 * 1024 * 1024)))  # порог ротации
+EVENT_LOG_KEEP = int(os.getenv("EVENT_LOG_KEEP", "16"))  # сколько последних сегментов хранить; 0 — все
+EVENT_LOG_FSYNC_INTERVAL = float(os.getenv("EVENT_LOG_FSYNC_INTERVAL", "1"))  # сек
+EVENT_LOG_QUEUE_SIZE = int(os.getenv("EVENT_LOG_QUEUE_SIZE", "100000"))  # при переполнении события теряются
+
+# Онлайн-резервные копии БД (sqlite3 backup API); BACKUP_INTERVAL=0 — выключены
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", str(6 * 3600)))  # сек
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "14"))  # сколько последних снимков хранить
+
+# Логирование: запись в фоновом потоке через очередь
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_PATH = os.getenv("LOG_PATH", "")  # пусто — stderr
+LOG_ERROR_PATH = os.getenv("LOG_ERROR_PATH", "")  # отдельный файл для ERROR и выше; пусто — не нужен
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))  # из массовых событий пишется каждое N-е
+LOG_AGGREGATE_INTERVAL = int(os.getenv("LOG_AGGREGATE_INTERVAL", "60"))  # сводка по массовым событиям, сек
+
+# Long polling: offset и необработанные апдейты хранятся в БД, рестарт их не теряет.
+# POLLING_MAX_IN_FLIGHT — сколько апдейтов полосы пользователей в обработке; остальные
+# ждут в памяти (меньше очереди полосы, чтобы догоняющий поток не сбрасывался).
+# Апдейты владельцев в этот лимит не входят. POLLING_MAX_BACKLOG — сколько ждущих
+# апдейтов держать в памяти, прежде чем приостановить опрос
+POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", "30"))
+POLLING_BATCH = int(os.getenv("POLLING_BATCH", "100"))
+POLLING_MAX_IN_FLIGHT = int(os.getenv("POLLING_MAX_IN_FLIGHT", "500"))
+POLLING_MAX_BACKLOG = int(os.getenv("POLLING_MAX_BACKLOG", "10000"))
+POLLING_DRAIN_TIMEOUT = float(os.getenv("POLLING_DRAIN_TIMEOUT", "10"))
+
+# Деплой без простоя: опрос и фоновые задачи ведёт держатель аренды в БД.
+# Новый процесс ждёт её, старый по SIGTERM дорабатывает начатое и отдаёт аренду
+LEASE_TTL = int(os.getenv("LEASE_TTL", "15"))
+LEASE_POLL_INTERVAL = float(os.getenv("LEASE_POLL_INTERVAL", "0.5"))
+SCHEDULER_DRAIN_TIMEOUT = float(os.getenv("SCHEDULER_DRAIN_TIMEOUT", "10"))
+
+# Ограничение одновременно выполняемых хендлеров: отдельные полосы
+# для покупателей и владельцев каналов; сверх очереди апдейты сбрасываются
+CONCURRENCY_USER = int(os.getenv("CONCURRENCY_USER", "64"))
+CONCURRENCY_ADMIN = int(os.getenv("CONCURRENCY_ADMIN", "16"))
+CONCURRENCY_USER_QUEUE = int(os.getenv("CONCURRENCY_USER_QUEUE", "1000"))
+CONCURRENCY_ADMIN_QUEUE = int(os.getenv("CONCURRENCY_ADMIN_QUEUE", "1000"))
+CONCURRENCY_METRICS_INTERVAL = int(os.getenv("CONCURRENCY_METRICS_INTERVAL", "60"))
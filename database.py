@@ -1,25 +1,185 @@
+import clock
 import config
-import time
+import event_log
+import json
 import sqlite3
-from typing import Optional, List, Tuple, Dict, Any
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Tuple, Dict, Any, ContextManager, Iterator
 
 
 
-def get_connection() -> sqlite3.Connection:
-    """
-    Создаёт и возвращает соединение с БД SQLite,
-    с включёнными foreign_keys и row_factory=Row.
-    """
-    conn = sqlite3.connect(config.DATABASE_NAME)
+def _connect(isolation_level: Optional[str] = "") -> sqlite3.Connection:
+    # WAL: читатели не ждут писателя, а писатель — читателей; соединений много
+    # (апдейты, воркеры outbox, обходы, бэкапы), поэтому ещё и busy_timeout
+    conn = sqlite3.connect(config.DATABASE_NAME, isolation_level=isolation_level,
+                           timeout=config.DB_BUSY_TIMEOUT / 1000)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT)}")
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
 
-def init_db() -> None:
+def get_connection() -> ContextManager[sqlite3.Connection]:
+    """
+    Возвращает соединение с БД SQLite (foreign_keys и row_factory=Row)
+    для использования в with-блоке. Внутри единицы работы (unit_of_work)
+    возвращается её общее соединение: with-блок тогда не фиксирует
+    транзакцию, а работает в SAVEPOINT.
+    """
+    unit = _current_unit.get()
+    if unit is not None and not unit.closed:
+        return unit
+    return _connect()
+
+
+# -----------------------------
+# Единица работы: одно соединение и транзакция на апдейт
+# -----------------------------
+
+class UnitOfWork:
+    """
+    Общее соединение для всех вызовов database.* в пределах одного апдейта
+    (см. middlewares/unit_of_work.py). Каждый вызов выполняется в своём
+    SAVEPOINT: ошибка внутри функции откатывает только её изменения.
+    Транзакция фиксируется commit() — в конце апдейта и перед каждым
+    запросом к Bot API (commit_pending), — а rollback() откатывает только
+    изменения после последней фиксации. События журнала копятся
+    и пишутся только после фиксации.
+    """
+
+    def __init__(self) -> None:
+        self.conn = _connect(isolation_level=None)
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+
+    def __enter__(self) -> sqlite3.Connection:
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        self.conn.execute("SAVEPOINT call")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.conn.in_transaction:
+            if exc_type is not None:
+                self.conn.execute("ROLLBACK TO call")
+            self.conn.execute("RELEASE call")
+        return False
+
+    def commit(self) -> None:
+        if self.conn.in_transaction:
+            self.conn.commit()
+        events, self.events = self.events, []
+        event_log.emit_all(events)
+
+    def rollback(self) -> None:
+        if self.conn.in_transaction:
+            self.conn.rollback()
+        self.events = []
+
+    def close(self) -> None:
+        self.closed = True
+        self.conn.close()
+
+
+_current_unit: ContextVar[Optional[UnitOfWork]] = ContextVar("unit_of_work", default=None)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """
+    Открывает единицу работы для текущей задачи asyncio: фиксирует
+    транзакцию при успешном выходе и откатывает при исключении
+    (изменения, зафиксированные перед запросами к Bot API, остаются).
+    """
+    unit = UnitOfWork()
+    token = _current_unit.set(unit)
+    try:
+        yield unit
+        unit.commit()
+    except BaseException:
+        unit.rollback()
+        raise
+    finally:
+        _current_unit.reset(token)
+        unit.close()
+
+
+def commit_pending() -> None:
+    """
+    Фиксирует накопленные изменения текущей единицы работы (если она есть).
+    Вызывается перед запросами к Bot API, чтобы блокировка БД
+    не удерживалась на время сетевого ожидания: все апдейты обрабатываются
+    в одном потоке, и чужой апдейт, ждущий блокировку (busy_timeout),
+    остановил бы event loop вместе с её держателем.
+    """
+    unit = _current_unit.get()
+    if unit is not None and not unit.closed:
+        unit.commit()
+
+
+def _emit(event: str, **fields: Any) -> None:
+    _emit_all([dict(fields, event=event)])
+
+
+def _emit_all(events: List[Dict[str, Any]]) -> None:
+    # Внутри единицы работы событие пишется только после фиксации транзакции
+    unit = _current_unit.get()
+    if unit is not None and not unit.closed:
+        unit.events.extend(events)
+    else:
+        event_log.emit_all(events)
+
+
+def _keyset_page(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Tuple[Any, ...],
+    keys: Tuple[str, ...],
+    cursor: Optional[Tuple[Any, ...]],
+    limit: int,
+    backward: bool = False,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Постраничная выборка по ключу (seek) вместо OFFSET.
+
+    sql — SELECT с WHERE, к которому добавляется условие
+    (keys) > cursor (или < при backward) и ORDER BY keys.
+    Возвращает (строки по возрастанию ключа, есть ли ещё строки
+    в направлении движения).
+    """
+    cols = ", ".join(keys)
+    order = "DESC" if backward else "ASC"
+    if cursor is not None:
+        marks = ", ".join("?" * len(keys))
+        op = "<" if backward else ">"
+        sql += f" AND ({cols}) {op} ({marks})"
+        params += tuple(cursor)
+    sql += f" ORDER BY {', '.join(f'{k} {order}' for k in keys)} LIMIT ?"
+    rows = [dict(r) for r in conn.execute(sql, params + (limit + 1,)).fetchall()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
+
+
+def _bot_filter(column: str, bot_id: Optional[int]) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Условие выборки по боту-тенанту; bot_id=None — без фильтра (все тенанты).
+    """
+    if bot_id is None:
+        return "", ()
+    return f" AND {column} = ?", (bot_id,)
+
+
+def init_db(default_bot_id: int = 0) -> None:
     """
     Создаёт все таблицы, если они ещё не существуют,
     и добавляет колонку reminded_1h в subscriptions при необходимости.
+    Каналы без бота-тенанта (созданные до поддержки нескольких ботов)
+    закрепляются за default_bot_id.
     """
     with get_connection() as conn:
         c = conn.cursor()
@@ -29,9 +189,18 @@ def init_db() -> None:
                 channel_id    INTEGER PRIMARY KEY,
                 owner_id      INTEGER NOT NULL,
                 title         TEXT    NOT NULL,
-                payment_info  TEXT
+                payment_info  TEXT,
+                bot_id        INTEGER NOT NULL DEFAULT 0,
+                deleted_at    INTEGER
             )
         """)
+        columns = {r["name"] for r in c.execute("PRAGMA table_info(channels)")}
+        if "bot_id" not in columns:
+            c.execute("ALTER TABLE channels ADD COLUMN bot_id INTEGER NOT NULL DEFAULT 0")
+        if "deleted_at" not in columns:
+            c.execute("ALTER TABLE channels ADD COLUMN deleted_at INTEGER")
+        if default_bot_id:
+            c.execute("UPDATE channels SET bot_id = ? WHERE bot_id = 0", (default_bot_id,))
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS tariffs (
@@ -74,70 +243,561 @@ def init_db() -> None:
         # Нет нужды отдельно ALTER TABLE для reminded_1h,
         # если сразу создаём с DEFAULT 0.
 
+        # Все чеки заявки по порядку (альбом); orders.proof_photo_id — первый из них
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS order_proofs (
+                order_id  INTEGER NOT NULL,
+                position  INTEGER NOT NULL,
+                file_id   TEXT    NOT NULL,
+                PRIMARY KEY(order_id, position),
+                FOREIGN KEY(order_id) REFERENCES orders(id)
+                    ON DELETE CASCADE
+            )
+        """)
+
+        # Приём апдейтов: следующий offset getUpdates по каждому боту и полученные,
+        # но ещё не обработанные апдейты (после рестарта обрабатываются первыми)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS update_offsets (
+                bot_id       INTEGER PRIMARY KEY,
+                next_offset  INTEGER NOT NULL
+            )
+        """)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS update_inbox (
+                bot_id     INTEGER NOT NULL,
+                update_id  INTEGER NOT NULL,
+                payload    TEXT    NOT NULL,
+                PRIMARY KEY(bot_id, update_id)
+            )
+        """)
+
+        # Аренды процесса (services/handoff.py): опрос Telegram и фоновые задачи
+        # ведёт только держатель аренды, новый процесс при деплое ждёт её освобождения
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name        TEXT    PRIMARY KEY,
+                holder      TEXT    NOT NULL,
+                expires_at  INTEGER NOT NULL
+            )
+        """)
+
+        # Заявки удалённых каналов (переносятся при разборе канала)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS orders_archive (
+                id                INTEGER PRIMARY KEY,
+                channel_id        INTEGER NOT NULL,
+                user_id           INTEGER NOT NULL,
+                tariff_id         INTEGER NOT NULL,
+                status            TEXT    NOT NULL,
+                proof_photo_id    TEXT,
+                rejection_reason  TEXT,
+                created_at        INTEGER NOT NULL,
+                archived_at       INTEGER NOT NULL
+            )
+        """)
+
+        # Инвайт-ссылки: пул заранее созданных (issued_at IS NULL) и выданные
+        # до истечения срока — чтобы отозвать их при удалении канала
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS invite_links (
+                invite_link  TEXT    PRIMARY KEY,
+                channel_id   INTEGER NOT NULL,
+                bot_id       INTEGER NOT NULL,
+                expire_at    INTEGER NOT NULL,
+                issued_at    INTEGER,
+                issued_for   TEXT
+            )
+        """)
+        columns = {r["name"] for r in c.execute("PRAGMA table_info(invite_links)")}
+        if "issued_for" not in columns:
+            c.execute("ALTER TABLE invite_links ADD COLUMN issued_for TEXT")
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_invite_links_channel
+                ON invite_links(channel_id, issued_at, expire_at)
+        """)
+        # Повтор задачи одобрения получает ту же ссылку, а не новую из пула
+        c.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_invite_links_issued_for
+                ON invite_links(issued_for)
+             WHERE issued_for IS NOT NULL
+        """)
+
+        # Незавершённые удаления каналов; next_at — время, на которое
+        # запланировано исключение последнего поставленного участника
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS channel_teardowns (
+                channel_id    INTEGER PRIMARY KEY,
+                bot_id        INTEGER NOT NULL,
+                owner_id      INTEGER NOT NULL,
+                title         TEXT    NOT NULL,
+                message_id    INTEGER,
+                started_at    INTEGER NOT NULL,
+                next_at       INTEGER NOT NULL,
+                members       INTEGER NOT NULL DEFAULT 0,
+                orders        INTEGER NOT NULL DEFAULT 0,
+                reported_at   INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind          TEXT    NOT NULL,
+                payload       TEXT    NOT NULL,
+                idem_key      TEXT    NOT NULL UNIQUE,
+                status        TEXT    NOT NULL DEFAULT 'pending',
+                attempts      INTEGER NOT NULL DEFAULT 0,
+                available_at  INTEGER NOT NULL,
+                lease_until   INTEGER NOT NULL DEFAULT 0,
+                last_error    TEXT,
+                created_at    INTEGER NOT NULL
+            )
+        """)
+
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_channels_owner
+                ON channels(owner_id, channel_id)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_channels_bot
+                ON channels(bot_id, channel_id)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orders_status_channel
+                ON orders(status, channel_id, id)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orders_channel
+                ON orders(channel_id, id)
+        """)
+
+        # Не более одной открытой заявки на (канал, пользователь, тариф).
+        # Дубликаты, накопленные до появления индекса, закрываем,
+        # оставляя самую свежую заявку.
+        c.execute("""
+            UPDATE orders
+               SET status = 'cancelled'
+             WHERE status IN ('pending','awaiting')
+               AND id NOT IN (
+                SELECT MAX(id) FROM orders
+                 WHERE status IN ('pending','awaiting')
+                 GROUP BY channel_id, user_id, tariff_id
+               )
+        """)
+        c.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_open
+                ON orders(channel_id, user_id, tariff_id)
+             WHERE status IN ('pending','awaiting')
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tariffs_channel
+                ON tariffs(channel_id, id)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_subscriptions_user
+                ON subscriptions(user_id, expire_at, channel_id)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_subscriptions_expire
+                ON subscriptions(expire_at)
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_ready
+                ON outbox(status, available_at)
+        """)
+        # Для purge_jobs: удаление старых done/dead без просмотра всей таблицы
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_purge
+                ON outbox(status, created_at)
+        """)
+
 
 # -----------------------------
 # Каналы
 # -----------------------------
 
-def add_or_update_channel(channel_id: int, owner_id: int, title: str, payment_info: str) -> None:
+def add_or_update_channel(channel_id: int, owner_id: int, title: str, payment_info: str,
+                          bot_id: int = 0) -> bool:
     """
-    Вставляет или обновляет канал.
+    Вставляет или обновляет канал, закрепляя его за ботом bot_id.
+    Тарифы и подписки существующего канала сохраняются.
+    Возвращает False (запись не изменена), если канал сейчас удаляется
+    или уже подключён другим владельцем либо через другого бота.
     """
     with get_connection() as conn:
-        conn.execute("""
-            INSERT OR REPLACE INTO channels(
-                channel_id, owner_id, title, payment_info
-            ) VALUES (?, ?, ?, ?)
-        """, (channel_id, owner_id, title, payment_info))
+        row = conn.execute("""
+            INSERT INTO channels(
+                channel_id, owner_id, title, payment_info, bot_id
+            ) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(channel_id) DO UPDATE
+               SET owner_id     = excluded.owner_id,
+                   title        = excluded.title,
+                   payment_info = excluded.payment_info,
+                   bot_id       = excluded.bot_id
+             WHERE channels.deleted_at IS NULL
+               AND channels.owner_id = excluded.owner_id
+               AND channels.bot_id = excluded.bot_id
+            RETURNING channel_id
+        """, (channel_id, owner_id, title, payment_info, bot_id)).fetchone()
+    return row is not None
 
 
-def get_channel(channel_id: int) -> Optional[Dict[str, Any]]:
+def get_channel(channel_id: int, bot_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """
-    Возвращает запись из channels или None.
+    Возвращает запись из channels или None (в том числе для канала в процессе удаления).
+    При заданном bot_id — только если канал закреплён за этим ботом.
     """
+    cond, params = _bot_filter("bot_id", bot_id)
     with get_connection() as conn:
         row = conn.execute("""
-            SELECT channel_id, owner_id, title, payment_info
+            SELECT channel_id, owner_id, title, payment_info, bot_id
               FROM channels
              WHERE channel_id = ?
-        """, (channel_id,)).fetchone()
+               AND deleted_at IS NULL
+        """ + cond, (channel_id,) + params).fetchone()
     return dict(row) if row else None
 
 
-def list_channels_of_owner(owner_id: int) -> List[Dict[str, Any]]:
+def list_channels_of_owner(owner_id: int, bot_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Список всех каналов, принадлежащих owner_id.
     """
+    cond, params = _bot_filter("bot_id", bot_id)
     with get_connection() as conn:
         rows = conn.execute("""
             SELECT channel_id, owner_id, title
               FROM channels
              WHERE owner_id = ?
-        """, (owner_id,)).fetchall()
+               AND deleted_at IS NULL
+        """ + cond, (owner_id,) + params).fetchall()
     return [dict(r) for r in rows]
 
 
-def update_channel_payment_info(channel_id: int, payment_info: str) -> None:
+def page_channels_of_owner(
+    owner_id: int,
+    cursor: Optional[int] = None,
+    limit: int = config.PAGE_SIZE,
+    backward: bool = False,
+    bot_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
     """
-    Обновляет поле payment_info у указанного канала.
+    Страница каналов владельца, упорядоченная по channel_id.
+    cursor — channel_id граничной строки предыдущей страницы.
     """
+    cond, params = _bot_filter("bot_id", bot_id)
     with get_connection() as conn:
-        conn.execute("""
+        return _keyset_page(conn, """
+            SELECT channel_id, owner_id, title
+              FROM channels
+             WHERE owner_id = ?
+               AND deleted_at IS NULL
+        """ + cond, (owner_id,) + params, ("channel_id",),
+            None if cursor is None else (cursor,), limit, backward)
+
+
+def list_channel_ids(bot_id: Optional[int] = None) -> List[int]:
+    """
+    ID всех зарегистрированных каналов (при заданном bot_id — только его).
+    """
+    cond, params = _bot_filter("bot_id", bot_id)
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT channel_id
+              FROM channels
+             WHERE deleted_at IS NULL
+        """ + cond, params).fetchall()
+    return [r["channel_id"] for r in rows]
+
+
+def list_channel_titles(bot_id: Optional[int] = None) -> List[Tuple[int, str]]:
+    """
+    (channel_id, title) каналов бота — для индекса inline-поиска.
+    """
+    cond, params = _bot_filter("bot_id", bot_id)
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT channel_id, title
+              FROM channels
+             WHERE deleted_at IS NULL
+        """ + cond, params).fetchall()
+    return [(r["channel_id"], r["title"]) for r in rows]
+
+
+def update_channel_payment_info(channel_id: int, owner_id: int, bot_id: int, payment_info: str) -> bool:
+    """
+    Обновляет поле payment_info у канала владельца owner_id в боте bot_id.
+    Возвращает False, если такого канала нет или он удаляется.
+    """
+    with get_connection() as conn:
+        cur = conn.execute("""
             UPDATE channels
                SET payment_info = ?
-             WHERE channel_id = ?
-        """, (payment_info, channel_id))
+             WHERE channel_id = ? AND owner_id = ? AND bot_id = ?
+               AND deleted_at IS NULL
+        """, (payment_info, channel_id, owner_id, bot_id))
+    return cur.rowcount > 0
+
+
+# -----------------------------
+# Инвайт-ссылки (services/invite_pool.py)
+# -----------------------------
+
+def add_invite_link(channel_id: int, bot_id: int, invite_link: str, expire_at: int,
+                    issued: bool = False, issued_for: Optional[str] = None) -> bool:
+    """
+    Запоминает созданную ссылку: в пуле или (issued=True) уже выданную,
+    при необходимости — с ключом выдачи issued_for (см. claim_invite_link).
+    Возвращает False, если канала нет или он удаляется — ссылку надо отозвать.
+    """
+    with get_connection() as conn:
+        cur = conn.execute("""
+            INSERT INTO invite_links(invite_link, channel_id, bot_id, expire_at, issued_at, issued_for)
+            SELECT ?, ?, ?, ?, ?, ?
+             WHERE EXISTS(SELECT 1 FROM channels WHERE channel_id = ? AND deleted_at IS NULL)
+            ON CONFLICT(invite_link) DO UPDATE
+               SET expire_at = excluded.expire_at, issued_at = excluded.issued_at,
+                   issued_for = excluded.issued_for
+        """, (invite_link, channel_id, bot_id, expire_at, clock.now() if issued else None,
+              issued_for, channel_id))
+    return cur.rowcount > 0
+
+
+def claim_invite_link(channel_id: int, min_expire_at: int,
+                      issued_for: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """
+    Атомарно выдаёт ссылку из пула канала, действующую дольше min_expire_at
+    (самую старую из таких). Возвращает (invite_link, expire_at) или None.
+    issued_for — ключ выдачи (например, задача одобрения заявки): если
+    по нему ссылка уже выдана, повтор возвращает её же.
+    """
+    with get_connection() as conn:
+        if issued_for is not None:
+            row = conn.execute("""
+                SELECT invite_link, expire_at FROM invite_links
+                 WHERE issued_for = ? AND channel_id = ?
+            """, (issued_for, channel_id)).fetchone()
+            if row is not None:
+                return row["invite_link"], row["expire_at"]
+        row = conn.execute("""
+            UPDATE invite_links
+               SET issued_at = ?, issued_for = ?
+             WHERE invite_link = (
+                SELECT invite_link FROM invite_links
+                 WHERE channel_id = ? AND issued_at IS NULL AND expire_at > ?
+                 ORDER BY expire_at
+                 LIMIT 1
+             )
+            RETURNING invite_link, expire_at
+        """, (clock.now(), issued_for, channel_id, min_expire_at)).fetchone()
+    return (row["invite_link"], row["expire_at"]) if row else None
+
+
+def count_pooled_links(channel_id: int, min_expire_at: int) -> int:
+    """
+    Сколько ссылок канала в пуле действуют дольше min_expire_at.
+    """
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT COUNT(*) FROM invite_links
+             WHERE channel_id = ? AND issued_at IS NULL AND expire_at > ?
+        """, (channel_id, min_expire_at)).fetchone()[0]
 
 
-def delete_channel(channel_id: int) -> None:
+def take_stale_invite_links(bot_id: int, min_expire_at: int) -> List[Tuple[int, str]]:
     """
-    Удаляет канал (и каскадно все связанные тарифы, заказы, подписки).
+    Убирает из пула бота ссылки, истекающие к min_expire_at, и ссылки
+    каналов, которых больше нет; возвращает их (channel_id, invite_link)
+    для отзыва. Выданные ссылки забываются, когда истекают.
     """
     with get_connection() as conn:
+        rows = conn.execute("""
+            DELETE FROM invite_links
+             WHERE bot_id = ? AND issued_at IS NULL
+               AND (expire_at <= ? OR channel_id NOT IN (
+                    SELECT channel_id FROM channels WHERE deleted_at IS NULL
+               ))
+            RETURNING channel_id, invite_link
+        """, (bot_id, min_expire_at)).fetchall()
+        conn.execute("""
+            DELETE FROM invite_links
+             WHERE bot_id = ? AND issued_at IS NOT NULL AND expire_at <= ?
+        """, (bot_id, clock.now()))
+    return [(r["channel_id"], r["invite_link"]) for r in rows]
+
+
+# -----------------------------
+# Удаление канала (фоновый разбор порциями, services/teardown.py)
+# -----------------------------
+
+def start_channel_teardown(channel_id: int, owner_id: int, bot_id: int,
+                           message_id: Optional[int] = None) -> Optional[str]:
+    """
+    Помечает канал удаляемым (он сразу пропадает из списков, витрины
+    и покупок), отменяет открытые заявки и ставит канал в очередь разбора.
+    Возвращает название канала или None, если канал не найден
+    или не принадлежит owner_id.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        row = conn.execute("""
+            UPDATE channels
+               SET deleted_at = ?
+             WHERE channel_id = ? AND owner_id = ? AND bot_id = ?
+               AND deleted_at IS NULL
+            RETURNING title
+        """, (now, channel_id, owner_id, bot_id)).fetchone()
+        if row is None:
+            return None
         conn.execute("""
-            DELETE FROM channels
+            UPDATE orders
+               SET status = 'cancelled'
              WHERE channel_id = ?
+               AND status IN ('pending','awaiting')
         """, (channel_id,))
+        conn.execute("""
+            INSERT OR IGNORE INTO channel_teardowns(
+                channel_id, bot_id, owner_id, title, message_id, started_at, next_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (channel_id, bot_id, owner_id, row["title"], message_id, now, now))
+    return row["title"]
+
+
+def list_channel_teardowns() -> List[Dict[str, Any]]:
+    """
+    Незавершённые удаления каналов.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT channel_id, bot_id, owner_id, title, message_id,
+                   started_at, next_at, members, orders, reported_at
+              FROM channel_teardowns
+             ORDER BY started_at
+        """).fetchall()
+    return [dict(r) for r in rows]
+
+
+def revoke_channel_invite_links(channel_id: int) -> int:
+    """
+    Одной транзакцией забывает все ссылки канала (и в пуле, и выданные)
+    и ставит в outbox отзыв ещё действующих. Возвращает число отзываемых.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        rows = conn.execute("""
+            DELETE FROM invite_links
+             WHERE channel_id = ?
+            RETURNING invite_link, expire_at
+        """, (channel_id,)).fetchall()
+        live = [r["invite_link"] for r in rows if r["expire_at"] > now]
+        for link in live:
+            enqueue_job(conn, "revoke_link", f"revoke:{link}",
+                        {"channel_id": channel_id, "invite_link": link}, now)
+    return len(live)
+
+
+def teardown_members_chunk(channel_id: int, limit: int, rate: int) -> int:
+    """
+    Одной транзакцией удаляет до `limit` подписок канала и ставит в outbox
+    исключение и уведомление каждого участника. Задачи разносятся по времени:
+    не больше `rate` в секунду, после уже запланированных.
+    Возвращает число обработанных подписок.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        td = conn.execute("""
+            SELECT title, next_at FROM channel_teardowns WHERE channel_id = ?
+        """, (channel_id,)).fetchone()
+        if td is None:
+            return 0
+        rows = conn.execute("""
+            DELETE FROM subscriptions
+             WHERE rowid IN (
+                SELECT rowid FROM subscriptions
+                 WHERE channel_id = ?
+                 LIMIT ?
+             )
+            RETURNING user_id, expire_at
+        """, (channel_id, limit)).fetchall()
+        start = max(now, td["next_at"])
+        for i, r in enumerate(rows):
+            enqueue_job(conn, "channel_closed", f"closed:{channel_id}:{r['user_id']}:{r['expire_at']}",
+                        {"channel_id": channel_id, "user_id": r["user_id"],
+                         "expire_at": r["expire_at"], "title": td["title"]},
+                        now, available_at=start + i // rate)
+        conn.execute("""
+            UPDATE channel_teardowns
+               SET members = members + ?, next_at = ?
+             WHERE channel_id = ?
+        """, (len(rows), start + (len(rows) + rate - 1) // rate, channel_id))
+    return len(rows)
+
+
+def archive_orders_chunk(channel_id: int, limit: int) -> int:
+    """
+    Одной транзакцией переносит до `limit` заявок канала в orders_archive.
+    Возвращает число перенесённых заявок.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        rows = conn.execute("""
+            DELETE FROM orders
+             WHERE id IN (
+                SELECT id FROM orders
+                 WHERE channel_id = ?
+                 ORDER BY id
+                 LIMIT ?
+             )
+            RETURNING id, channel_id, user_id, tariff_id, status,
+                      proof_photo_id, rejection_reason, created_at
+        """, (channel_id, limit)).fetchall()
+        conn.executemany("""
+            INSERT OR REPLACE INTO orders_archive(
+                id, channel_id, user_id, tariff_id, status,
+                proof_photo_id, rejection_reason, created_at, archived_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [tuple(r) + (now,) for r in rows])
+        conn.execute("""
+            UPDATE channel_teardowns
+               SET orders = orders + ?
+             WHERE channel_id = ?
+        """, (len(rows), channel_id))
+    return len(rows)
+
+
+def finish_channel_teardown(channel_id: int) -> bool:
+    """
+    Удаляет тарифы и сам канал, если подписки и заявки уже разобраны.
+    Возвращает False, если разбирать ещё есть что.
+    """
+    with get_connection() as conn:
+        left = conn.execute("""
+            SELECT EXISTS(SELECT 1 FROM subscriptions WHERE channel_id = ?)
+                OR EXISTS(SELECT 1 FROM orders WHERE channel_id = ?)
+        """, (channel_id, channel_id)).fetchone()[0]
+        if left:
+            return False
+        td = conn.execute("""
+            DELETE FROM channel_teardowns
+             WHERE channel_id = ?
+            RETURNING members, orders
+        """, (channel_id,)).fetchone()
+        conn.execute("DELETE FROM tariffs WHERE channel_id = ?", (channel_id,))
+        conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+    if td is not None:
+        _emit(event_log.CHANNEL_DELETED, channel_id=channel_id,
+              members=td["members"], orders=td["orders"])
+    return True
+
+
+def mark_teardown_reported(channel_id: int, now: int) -> None:
+    """
+    Запоминает время последнего отчёта владельцу о ходе удаления.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE channel_teardowns SET reported_at = ? WHERE channel_id = ?
+        """, (now, channel_id))
 
 
 # -----------------------------
@@ -169,15 +829,35 @@ def list_tariffs(channel_id: int) -> List[Dict[str, Any]]:
     return [dict(r) for r in rows]
 
 
-def remove_tariff(tariff_id: int) -> None:
+def page_tariffs(
+    channel_id: int,
+    cursor: Optional[int] = None,
+    limit: int = config.PAGE_SIZE,
+    backward: bool = False,
+) -> Tuple[List[Dict[str, Any]], bool]:
     """
-    Удаляет тариф по ID.
+    Страница тарифов канала, упорядоченная по id.
     """
     with get_connection() as conn:
-        conn.execute("""
+        return _keyset_page(conn, """
+            SELECT id, channel_id, title, duration_days, price
+              FROM tariffs
+             WHERE channel_id = ?
+        """, (channel_id,), ("id",),
+            None if cursor is None else (cursor,), limit, backward)
+
+
+def remove_tariff(channel_id: int, tariff_id: int) -> bool:
+    """
+    Удаляет тариф по ID, если он принадлежит каналу channel_id.
+    Возвращает False, если такого тарифа у канала нет.
+    """
+    with get_connection() as conn:
+        cur = conn.execute("""
             DELETE FROM tariffs
-             WHERE id = ?
-        """, (tariff_id,))
+             WHERE id = ? AND channel_id = ?
+        """, (tariff_id, channel_id))
+    return cur.rowcount > 0
 
 
 def get_tariff(tariff_id: int) -> Optional[Dict[str, Any]]:
@@ -197,53 +877,264 @@ def get_tariff(tariff_id: int) -> Optional[Dict[str, Any]]:
 # Заказы
 # -----------------------------
 
-def create_order(channel_id: int, user_id: int, tariff_id: int) -> None:
+def create_order(channel_id: int, user_id: int, tariff_id: int) -> int:
+    """
+    Создаёт заявку в status='pending' или, если по этой паре
+    (канал, пользователь, тариф) уже есть открытая заявка, возвращает её.
+    Уникальность открытой заявки гарантирует частичный индекс
+    idx_orders_open, поэтому повторные нажатия не плодят строки.
+    Возвращает id заявки.
     """
-    Создаёт новую заявку в status='pending'.
+    select_open = """
+        SELECT id
+          FROM orders
+         WHERE channel_id=? AND user_id=? AND tariff_id=?
+           AND status IN ('pending','awaiting')
     """
+    key = (channel_id, user_id, tariff_id)
+    created = None
     with get_connection() as conn:
-        conn.execute("""
-            INSERT INTO orders(channel_id, user_id, tariff_id, status, created_at)
-            VALUES (?, ?, ?, 'pending', ?)
-        """, (channel_id, user_id, tariff_id, int(time.time())))
+        # Частый случай (повторное нажатие) обходится без записи
+        row = conn.execute(select_open, key).fetchone()
+        if row is None:
+            row = created = conn.execute("""
+                INSERT INTO orders(channel_id, user_id, tariff_id, status, created_at)
+                VALUES (?, ?, ?, 'pending', ?)
+                ON CONFLICT(channel_id, user_id, tariff_id)
+                    WHERE status IN ('pending','awaiting')
+                DO NOTHING
+                RETURNING id
+            """, key + (clock.now(),)).fetchone()
+        if row is None:
+            row = conn.execute(select_open, key).fetchone()
+    if created is not None:
+        _emit(event_log.ORDER_CREATED, order_id=created["id"], channel_id=channel_id,
+              user_id=user_id, tariff_id=tariff_id)
+    return row["id"]
 
 
-def update_order_proof(channel_id: int, user_id: int, tariff_id: int, proof_photo_id: str) -> None:
+def update_order_proof(channel_id: int, user_id: int, tariff_id: int, proof_photo_ids: List[str]) -> None:
     """
-    Сохраняет proof_photo_id и переводит заявку в 'awaiting'.
+    Сохраняет чеки (одно фото или альбом) и переводит открытую заявку в 'awaiting'
+    (повторно присланные чеки заменяют предыдущие).
     """
     with get_connection() as conn:
-        conn.execute("""
+        rows = conn.execute("""
             UPDATE orders
                SET proof_photo_id = ?, status = 'awaiting'
-             WHERE channel_id=? AND user_id=? AND tariff_id=? AND status='pending'
-        """, (proof_photo_id, channel_id, user_id, tariff_id))
+             WHERE channel_id=? AND user_id=? AND tariff_id=?
+               AND status IN ('pending','awaiting')
+            RETURNING id
+        """, (proof_photo_ids[0], channel_id, user_id, tariff_id)).fetchall()
+        for r in rows:
+            conn.execute("DELETE FROM order_proofs WHERE order_id = ?", (r["id"],))
+            conn.executemany("""
+                INSERT INTO order_proofs(order_id, position, file_id) VALUES (?, ?, ?)
+            """, [(r["id"], i, file_id) for i, file_id in enumerate(proof_photo_ids)])
+    for r in rows:
+        _emit(event_log.PROOF_SUBMITTED, order_id=r["id"], channel_id=channel_id,
+              user_id=user_id, tariff_id=tariff_id)
 
 
-def approve_order(channel_id: int, user_id: int, tariff_id: int) -> None:
+def approve_order(channel_id: int, user_id: int, tariff_id: int) -> Optional[Dict[str, Any]]:
     """
-    Переводит заявку в status='approved'.
+    Одной транзакцией переводит открытую заявку в status='approved',
+    выдаёт/продлевает подписку (upsert) и ставит в outbox уведомление пользователю.
+    Заявку «забирает» сам UPDATE, поэтому двойной клик или два владельца
+    одновременно не выдадут подписку дважды.
+    Возвращает тариф с новым expire_at или None, если одобрять нечего.
     """
+    now = clock.now()
+    events: List[Dict[str, Any]] = []
     with get_connection() as conn:
-        conn.execute("""
+        row = conn.execute("""
             UPDATE orders
                SET status = 'approved'
              WHERE channel_id=? AND user_id=? AND tariff_id=?
                AND status IN ('pending','awaiting')
-        """, (channel_id, user_id, tariff_id))
+               AND EXISTS (SELECT 1 FROM tariffs WHERE id = orders.tariff_id)
+            RETURNING id,
+                      (SELECT title FROM tariffs WHERE id = orders.tariff_id)         AS title,
+                      (SELECT duration_days FROM tariffs WHERE id = orders.tariff_id) AS duration_days
+        """, (channel_id, user_id, tariff_id)).fetchone()
+        if row is None:
+            return None
+
+        expire_at = _extend_subscription(conn, channel_id, user_id, row["duration_days"], now, events)
+        enqueue_job(conn, "approved", f"approved:{row['id']}", {
+            "order_id": row["id"],
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "tariff_title": row["title"],
+            "duration_days": row["duration_days"],
+        }, now)
+    _emit(event_log.ORDER_APPROVED, order_id=row["id"], channel_id=channel_id,
+          user_id=user_id, tariff_id=tariff_id)
+    _emit_all(events)
+    return {"id": tariff_id, "title": row["title"], "duration_days": row["duration_days"],
+            "expire_at": expire_at}
 
 
-def reject_order(channel_id: int, user_id: int, tariff_id: int, reason: str) -> None:
+def reject_order(channel_id: int, user_id: int, tariff_id: int, reason: str, notify: bool = False) -> None:
     """
     Отмечает заявку как rejected и сохраняет reason.
+    При notify=True ставит в outbox уведомление пользователю.
     """
+    now = clock.now()
     with get_connection() as conn:
-        conn.execute("""
+        rows = conn.execute("""
             UPDATE orders
                SET status = 'rejected', rejection_reason = ?
              WHERE channel_id=? AND user_id=? AND tariff_id=?
                AND status IN ('pending','awaiting')
-        """, (reason, channel_id, user_id, tariff_id))
+            RETURNING id
+        """, (reason, channel_id, user_id, tariff_id)).fetchall()
+        if notify and rows:
+            order_id = max(r["id"] for r in rows)
+            enqueue_job(conn, "rejected", f"rejected:{order_id}",
+                        {"channel_id": channel_id, "user_id": user_id, "reason": reason}, now)
+    for r in rows:
+        _emit(event_log.ORDER_REJECTED, order_id=r["id"], channel_id=channel_id,
+              user_id=user_id, tariff_id=tariff_id, notified=notify)
+
+
+# -----------------------------
+# Очередь проверки заявок
+# -----------------------------
+
+_PENDING_SELECT = """
+    SELECT o.id, o.channel_id, o.user_id, o.tariff_id, o.proof_photo_id,
+           c.owner_id,
+           c.bot_id,
+           c.title         AS channel_title,
+           t.title         AS tariff_title,
+           t.duration_days,
+           t.price
+      FROM orders   AS o
+      JOIN channels AS c ON c.channel_id = o.channel_id
+      JOIN tariffs  AS t ON t.id = o.tariff_id
+"""
+
+
+def list_pending_orders(owner_id: int, after_id: int = 0, limit: int = 10,
+                        bot_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Страница заявок в status='awaiting' по каналам владельца,
+    упорядоченная по id (keyset: id > after_id).
+    """
+    cond, params = _bot_filter("c.bot_id", bot_id)
+    with get_connection() as conn:
+        rows = conn.execute(_PENDING_SELECT + """
+             WHERE c.owner_id = ?
+               AND o.status = 'awaiting'
+               AND o.id > ?
+        """ + cond + """
+             ORDER BY o.id ASC
+             LIMIT ?
+        """, (owner_id, after_id) + params + (limit,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def get_order(order_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Заявка вместе с владельцем канала, параметрами тарифа
+    и всеми чеками (proof_photo_ids), или None.
+    """
+    with get_connection() as conn:
+        row = conn.execute(_PENDING_SELECT + """
+             WHERE o.id = ?
+        """, (order_id,)).fetchone()
+        if row is None:
+            return None
+        proofs = conn.execute("""
+            SELECT file_id FROM order_proofs WHERE order_id = ? ORDER BY position
+        """, (order_id,)).fetchall()
+    order = dict(row)
+    order["proof_photo_ids"] = [r["file_id"] for r in proofs] or [order["proof_photo_id"]]
+    return order
+
+
+def pending_counts_by_owner() -> List[Tuple[int, int, int, int]]:
+    """
+    Для каждого владельца с ожидающими заявками, отдельно по каждому боту:
+    (bot_id, owner_id, количество, max(order.id)).
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT c.bot_id, c.owner_id, COUNT(*) AS cnt, MAX(o.id) AS last_id
+              FROM orders   AS o
+              JOIN channels AS c ON c.channel_id = o.channel_id
+             WHERE o.status = 'awaiting'
+             GROUP BY c.bot_id, c.owner_id
+        """).fetchall()
+    return [(r["bot_id"], r["owner_id"], r["cnt"], r["last_id"]) for r in rows]
+
+
+def _take_pending(conn: sqlite3.Connection, owner_id: int, order_ids: List[int],
+                  status: str, reason: Optional[str], bot_id: Optional[int]) -> List[Dict[str, Any]]:
+    if not order_ids:
+        return []
+    cond, params = _bot_filter("c.bot_id", bot_id)
+    marks = ", ".join("?" * len(order_ids))
+    rows = conn.execute(_PENDING_SELECT + f"""
+         WHERE c.owner_id = ?
+           AND o.status = 'awaiting'
+           AND o.id IN ({marks})
+    """ + cond + """
+         ORDER BY o.id ASC
+    """, (owner_id, *order_ids) + params).fetchall()
+    conn.executemany("""
+        UPDATE orders
+           SET status = ?, rejection_reason = ?
+         WHERE id = ? AND status = 'awaiting'
+    """, [(status, reason, r["id"]) for r in rows])
+    return [dict(r) for r in rows]
+
+
+def approve_pending_orders(owner_id: int, order_ids: List[int],
+                           bot_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Одной транзакцией одобряет перечисленные ожидающие заявки владельца
+    и выдаёт/продлевает подписки. Возвращает одобренные заявки с expire_at.
+    """
+    now = clock.now()
+    events: List[Dict[str, Any]] = []
+    with get_connection() as conn:
+        orders = _take_pending(conn, owner_id, order_ids, "approved", None, bot_id)
+        for o in orders:
+            events.append({"event": event_log.ORDER_APPROVED, "order_id": o["id"],
+                           "channel_id": o["channel_id"], "user_id": o["user_id"],
+                           "tariff_id": o["tariff_id"]})
+            o["expire_at"] = _extend_subscription(
+                conn, o["channel_id"], o["user_id"], o["duration_days"], now, events
+            )
+            enqueue_job(conn, "approved", f"approved:{o['id']}", {
+                "order_id": o["id"],
+                "channel_id": o["channel_id"],
+                "user_id": o["user_id"],
+                "tariff_title": o["tariff_title"],
+                "duration_days": o["duration_days"],
+            }, now)
+    _emit_all(events)
+    return orders
+
+
+def reject_pending_orders(owner_id: int, order_ids: List[int], reason: str,
+                          bot_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Одной транзакцией отклоняет перечисленные ожидающие заявки владельца
+    и ставит в outbox уведомления пользователям.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        orders = _take_pending(conn, owner_id, order_ids, "rejected", reason, bot_id)
+        for o in orders:
+            enqueue_job(conn, "rejected", f"rejected:{o['id']}",
+                        {"channel_id": o["channel_id"], "user_id": o["user_id"], "reason": reason}, now)
+    for o in orders:
+        _emit(event_log.ORDER_REJECTED, order_id=o["id"], channel_id=o["channel_id"],
+              user_id=o["user_id"], tariff_id=o["tariff_id"], notified=True)
+    return orders
 
 
 # -----------------------------
@@ -255,39 +1146,95 @@ def add_subscription(channel_id: int, user_id: int, duration_days: int) -> None:
     Добавляет или продлевает подписку,
     сбрасывая reminded_1h в 0 при продлении.
     """
-    now = int(time.time())
+    events: List[Dict[str, Any]] = []
     with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT expire_at
-              FROM subscriptions
-             WHERE channel_id=? AND user_id=?
-        """, (channel_id, user_id))
-        row = cur.fetchone()
-
-        if row:
-            old = row["expire_at"]
-            base = old if old > now else now
-            new_expire = base + duration_days * 86400
-            cur.execute("""
-                UPDATE subscriptions
-                   SET expire_at   = ?, reminded_1h = 0
-                 WHERE channel_id = ? AND user_id = ?
-            """, (new_expire, channel_id, user_id))
-        else:
-            new_expire = now + duration_days * 86400
-            cur.execute("""
-                INSERT INTO subscriptions(
-                    channel_id, user_id, expire_at, reminded_1h
-                ) VALUES (?, ?, ?, 0)
-            """, (channel_id, user_id, new_expire))
+        _extend_subscription(conn, channel_id, user_id, duration_days, clock.now(), events)
+    _emit_all(events)
+
+
+def _extend_subscription(conn: sqlite3.Connection, channel_id: int, user_id: int,
+                         duration_days: int, now: int,
+                         events: Optional[List[Dict[str, Any]]] = None) -> int:
+    """
+    Продлевает подписку в рамках открытой транзакции conn одним upsert:
+    срок отсчитывается от max(expire_at, now), reminded_1h сбрасывается.
+    Событие для журнала дописывается в events: вызывающий пишет его
+    после фиксации транзакции. Возвращает новый expire_at.
+    """
+    duration = duration_days * 86400
+    new_expire = conn.execute("""
+        INSERT INTO subscriptions(channel_id, user_id, expire_at, reminded_1h)
+        VALUES (?, ?, ?, 0)
+        ON CONFLICT(channel_id, user_id) DO UPDATE
+           SET expire_at   = MAX(subscriptions.expire_at, ?) + ?,
+               reminded_1h = 0
+        RETURNING expire_at
+    """, (channel_id, user_id, now + duration, now, duration)).fetchone()["expire_at"]
+    if events is not None:
+        # Новая или уже истёкшая (но ещё не удалённая) подписка начинается заново
+        fresh = new_expire == now + duration
+        events.append({
+            "event": event_log.SUBSCRIPTION_GRANTED if fresh else event_log.SUBSCRIPTION_EXTENDED,
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "duration_days": duration_days,
+            "expire_at": new_expire,
+        })
+    return new_expire
+
+
+def extend_channel_subscriptions(channel_id: int, owner_id: int, bot_id: int, days: int,
+                                 rate: int = config.BULK_NOTIFY_RATE) -> Optional[int]:
+    """
+    Продлевает на `days` дней все активные подписки канала одной транзакцией:
+      1) один UPDATE по subscriptions канала (со сбросом reminded_1h);
+      2) один INSERT ... SELECT в outbox — уведомление каждому подписчику,
+         разнесённое по времени не быстрее `rate` в секунду, чтобы рассылка
+         не вытесняла остальные задачи outbox.
+    Возвращает число продлённых подписок или None, если канал не найден
+    или не принадлежит owner_id.
+    """
+    now = clock.now()
+    duration = days * 86400
+    with get_connection() as conn:
+        ch = conn.execute("""
+            SELECT title FROM channels
+             WHERE channel_id = ? AND owner_id = ? AND bot_id = ?
+               AND deleted_at IS NULL
+        """, (channel_id, owner_id, bot_id)).fetchone()
+        if ch is None:
+            return None
+        count = conn.execute("""
+            UPDATE subscriptions
+               SET expire_at   = expire_at + ?,
+                   reminded_1h = 0
+             WHERE channel_id = ?
+               AND expire_at >= ?
+        """, (duration, channel_id, now)).rowcount
+        # Продлённые подписки — ровно те, что теперь истекают не раньше now + duration;
+        # ключ по новому expire_at различает продления, сделанные в одну секунду
+        conn.execute("""
+            INSERT OR IGNORE INTO outbox(kind, payload, idem_key, available_at, created_at)
+            SELECT 'extended',
+                   json_object('channel_id', s.channel_id, 'user_id', s.user_id,
+                               'days', ?, 'expire_at', s.expire_at,
+                               'title', ?, 'bot_id', ?),
+                   'extended:' || s.channel_id || ':' || s.user_id || ':' || s.expire_at,
+                   ? + (ROW_NUMBER() OVER (ORDER BY s.user_id) - 1) / ?,
+                   ?
+              FROM subscriptions AS s
+             WHERE s.channel_id = ?
+               AND s.expire_at >= ?
+        """, (days, ch["title"], bot_id, now, rate, now, channel_id, now + duration))
+    _emit(event_log.SUBSCRIPTIONS_BULK_EXTENDED, channel_id=channel_id, days=days, count=count)
+    return count
 
 
 def get_expired_subscriptions() -> List[Tuple[int, int]]:
     """
     Подписки, у которых expire_at < now.
     """
-    now = int(time.time())
+    now = clock.now()
     with get_connection() as conn:
         rows = conn.execute("""
             SELECT channel_id, user_id
@@ -308,10 +1255,11 @@ def remove_subscription(channel_id: int, user_id: int) -> None:
         """, (channel_id, user_id))
 
 
-def list_user_subscriptions(user_id: int) -> List[Dict[str, Any]]:
+def list_user_subscriptions(user_id: int, bot_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Активные подписки пользователя (joined with channel titles).
     """
+    cond, params = _bot_filter("c.bot_id", bot_id)
     with get_connection() as conn:
         rows = conn.execute("""
             SELECT s.channel_id,
@@ -321,19 +1269,44 @@ def list_user_subscriptions(user_id: int) -> List[Dict[str, Any]]:
               JOIN channels      AS c
                 ON s.channel_id = c.channel_id
              WHERE s.user_id = ?
+        """ + cond + """
              ORDER BY s.expire_at ASC
-        """, (user_id,)).fetchall()
+        """, (user_id,) + params).fetchall()
     return [{"channel_id": r["channel_id"],
              "channel_title": r["channel_title"],
              "expire_at": r["expire_at"]}
             for r in rows]
 
 
+def page_user_subscriptions(
+    user_id: int,
+    cursor: Optional[Tuple[int, int]] = None,
+    limit: int = config.PAGE_SIZE,
+    backward: bool = False,
+    bot_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Страница подписок пользователя, упорядоченная по (expire_at, channel_id).
+    cursor — пара (expire_at, channel_id) граничной строки.
+    """
+    cond, params = _bot_filter("c.bot_id", bot_id)
+    with get_connection() as conn:
+        return _keyset_page(conn, """
+            SELECT s.channel_id,
+                   c.title     AS channel_title,
+                   s.expire_at
+              FROM subscriptions AS s
+              JOIN channels      AS c
+                ON s.channel_id = c.channel_id
+             WHERE s.user_id = ?
+        """ + cond, (user_id,) + params, ("s.expire_at", "s.channel_id"), cursor, limit, backward)
+
+
 def get_expiring_subscriptions_1h() -> List[Tuple[int, int, int]]:
     """
     Подписки с expire_at ∈ (now, now+1ч] и reminded_1h = 0.
     """
-    now = int(time.time())
+    now = clock.now()
     with get_connection() as conn:
         rows = conn.execute("""
             SELECT channel_id, user_id, expire_at
@@ -355,3 +1328,278 @@ def mark_subscription_reminded(channel_id: int, user_id: int) -> None:
                SET reminded_1h = 1
              WHERE channel_id = ? AND user_id = ?
         """, (channel_id, user_id))
+
+
+def expire_subscriptions(limit: int = 1000) -> int:
+    """
+    Одной транзакцией удаляет истёкшие подписки и ставит в outbox
+    задачи на исключение пользователей из каналов.
+    Возвращает число обработанных подписок.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        rows = conn.execute("""
+            DELETE FROM subscriptions
+             WHERE rowid IN (
+                SELECT rowid FROM subscriptions
+                 WHERE expire_at < ?
+                 LIMIT ?
+             )
+            RETURNING channel_id, user_id, expire_at,
+                      (SELECT bot_id FROM channels AS c
+                        WHERE c.channel_id = subscriptions.channel_id) AS bot_id
+        """, (now, limit)).fetchall()
+        for r in rows:
+            enqueue_job(conn, "kick", f"kick:{r['channel_id']}:{r['user_id']}:{r['expire_at']}",
+                        {"channel_id": r["channel_id"], "user_id": r["user_id"],
+                         "expire_at": r["expire_at"], "bot_id": r["bot_id"]}, now)
+    for r in rows:
+        _emit(event_log.SUBSCRIPTION_EXPIRED, channel_id=r["channel_id"],
+              user_id=r["user_id"], expire_at=r["expire_at"])
+    return len(rows)
+
+
+def claim_reminders(limit: int = 1000) -> int:
+    """
+    Одной транзакцией помечает reminded_1h = 1 у подписок, истекающих
+    в течение часа, и ставит в outbox задачи на отправку напоминаний.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        rows = conn.execute("""
+            UPDATE subscriptions
+               SET reminded_1h = 1
+             WHERE rowid IN (
+                SELECT rowid FROM subscriptions
+                 WHERE expire_at > ?
+                   AND expire_at <= ?
+                   AND reminded_1h = 0
+                 LIMIT ?
+             )
+            RETURNING channel_id, user_id, expire_at,
+                      (SELECT bot_id FROM channels AS c
+                        WHERE c.channel_id = subscriptions.channel_id) AS bot_id
+        """, (now, now + 3600, limit)).fetchall()
+        for r in rows:
+            enqueue_job(conn, "remind", f"remind:{r['channel_id']}:{r['user_id']}:{r['expire_at']}",
+                        {"channel_id": r["channel_id"], "user_id": r["user_id"],
+                         "expire_at": r["expire_at"], "bot_id": r["bot_id"]}, now)
+    return len(rows)
+
+
+def get_subscription_expire_at(channel_id: int, user_id: int) -> Optional[int]:
+    """
+    expire_at подписки или None, если подписки нет.
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT expire_at
+              FROM subscriptions
+             WHERE channel_id = ? AND user_id = ?
+        """, (channel_id, user_id)).fetchone()
+    return row["expire_at"] if row else None
+
+
+# -----------------------------
+# Outbox (побочные эффекты изменений состояния)
+# -----------------------------
+
+def enqueue_job(conn: sqlite3.Connection, kind: str, idem_key: str,
+                payload: Dict[str, Any], now: Optional[int] = None,
+                available_at: Optional[int] = None) -> None:
+    """
+    Ставит задачу в outbox в рамках открытой транзакции conn
+    (выполнить не раньше available_at, по умолчанию — сразу).
+    Повтор с тем же idem_key игнорируется. Если в payload есть channel_id,
+    добавляется bot_id канала — через этого бота задачу выполнит воркер.
+    """
+    now = clock.now() if now is None else now
+    if "channel_id" in payload and "bot_id" not in payload:
+        row = conn.execute("SELECT bot_id FROM channels WHERE channel_id = ?",
+                           (payload["channel_id"],)).fetchone()
+        if row is not None:
+            payload = dict(payload, bot_id=row["bot_id"])
+    conn.execute("""
+        INSERT OR IGNORE INTO outbox(kind, payload, idem_key, available_at, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (kind, json.dumps(payload), idem_key, now if available_at is None else available_at, now))
+
+
+def claim_job(lease: int) -> Optional[Dict[str, Any]]:
+    """
+    Атомарно берёт одну готовую задачу в аренду на `lease` секунд.
+    Задачи с истёкшей арендой (упавший воркер) снова становятся доступны.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        row = conn.execute("""
+            UPDATE outbox
+               SET lease_until = ?, attempts = attempts + 1
+             WHERE id = (
+                SELECT id FROM outbox
+                 WHERE status = 'pending'
+                   AND available_at <= ?
+                   AND lease_until <= ?
+                 ORDER BY available_at, id
+                 LIMIT 1
+             )
+            RETURNING id, kind, payload, idem_key, attempts
+        """, (now + lease, now, now)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def complete_job(job_id: int) -> None:
+    """
+    Помечает задачу выполненной.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE outbox
+               SET status = 'done', lease_until = 0
+             WHERE id = ?
+        """, (job_id,))
+
+
+def fail_job(job_id: int, error: str, retry_at: Optional[int]) -> None:
+    """
+    Записывает ошибку и откладывает задачу до retry_at,
+    либо переводит её в 'dead', если retry_at = None.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE outbox
+               SET status       = CASE WHEN ? IS NULL THEN 'dead' ELSE status END,
+                   available_at = COALESCE(?, available_at),
+                   lease_until  = 0,
+                   last_error   = ?
+             WHERE id = ?
+        """, (retry_at, retry_at, error, job_id))
+
+
+def release_job_leases() -> None:
+    """
+    Снимает аренду со всех незавершённых задач — при старте процесса
+    они сразу подхватываются воркерами, без ожидания истечения аренды.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE outbox
+               SET lease_until = 0
+             WHERE status = 'pending' AND lease_until > 0
+        """)
+
+
+def purge_jobs(older_than: int, dead_older_than: int) -> None:
+    """
+    Удаляет выполненные задачи, созданные раньше older_than,
+    и задачи, исчерпавшие попытки (dead), созданные раньше dead_older_than.
+    """
+    with get_connection() as conn:
+        conn.executemany("""
+            DELETE FROM outbox
+             WHERE status = ? AND created_at < ?
+        """, [("done", older_than), ("dead", dead_older_than)])
+
+
+# -----------------------------
+# Приём апдейтов (services/polling.py)
+# -----------------------------
+
+def get_update_offset(bot_id: int) -> Optional[int]:
+    """
+    Следующий offset для getUpdates или None, если бот ещё не опрашивался.
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT next_offset FROM update_offsets WHERE bot_id = ?
+        """, (bot_id,)).fetchone()
+    return row["next_offset"] if row else None
+
+
+def save_fetched_updates(bot_id: int, updates: List[Tuple[int, str]], next_offset: int) -> None:
+    """
+    Одной транзакцией сохраняет полученные апдейты (update_id, JSON) во входящие
+    и сдвигает offset. Вызывается до того, как следующий getUpdates
+    подтвердит апдейты в Telegram.
+    """
+    with get_connection() as conn:
+        conn.executemany("""
+            INSERT OR IGNORE INTO update_inbox(bot_id, update_id, payload) VALUES (?, ?, ?)
+        """, [(bot_id, update_id, payload) for update_id, payload in updates])
+        conn.execute("""
+            INSERT INTO update_offsets(bot_id, next_offset) VALUES (?, ?)
+            ON CONFLICT(bot_id) DO UPDATE
+               SET next_offset = MAX(update_offsets.next_offset, excluded.next_offset)
+        """, (bot_id, next_offset))
+
+
+def finish_update(bot_id: int, update_id: int) -> None:
+    """
+    Удаляет обработанный апдейт из входящих — сразу по завершении хендлера,
+    чтобы падение процесса не повторило его.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            DELETE FROM update_inbox WHERE bot_id = ? AND update_id = ?
+        """, (bot_id, update_id))
+
+
+def list_inbox_updates(bot_id: int, after_id: int = -1, limit: int = 100) -> List[Tuple[int, str]]:
+    """
+    Порция необработанных апдейтов бота с update_id > after_id по возрастанию.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT update_id, payload
+              FROM update_inbox
+             WHERE bot_id = ? AND update_id > ?
+             ORDER BY update_id
+             LIMIT ?
+        """, (bot_id, after_id, limit)).fetchall()
+    return [(r["update_id"], r["payload"]) for r in rows]
+
+
+# -----------------------------
+# Аренды процесса (services/handoff.py)
+# -----------------------------
+
+def acquire_lease(name: str, holder: str, ttl: int) -> bool:
+    """
+    Берёт или продлевает аренду name на ttl секунд. Удаётся, если аренда
+    свободна, истекла или уже принадлежит holder.
+    """
+    now = clock.now()
+    with get_connection() as conn:
+        row = conn.execute("""
+            INSERT INTO leases(name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+               SET holder = excluded.holder, expires_at = excluded.expires_at
+             WHERE leases.holder = excluded.holder OR leases.expires_at <= ?
+            RETURNING holder
+        """, (name, holder, now + ttl, now)).fetchone()
+    return row is not None
+
+
+def get_lease_holder(name: str) -> Optional[str]:
+    """
+    Текущий держатель действующей аренды или None.
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT holder FROM leases WHERE name = ? AND expires_at > ?
+        """, (name, clock.now())).fetchone()
+    return row["holder"] if row else None
+
+
+def release_lease(name: str, holder: str) -> None:
+    """
+    Освобождает аренду, если она всё ещё принадлежит holder.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            DELETE FROM leases WHERE name = ? AND holder = ?
+        """, (name, holder))
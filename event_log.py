@@ -0,0 +1,164 @@
+import atexit
+import clock
+import config
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Доменные события, которые пишутся в журнал
+ORDER_CREATED = "order_created"
+PROOF_SUBMITTED = "proof_submitted"
+ORDER_APPROVED = "order_approved"
+ORDER_REJECTED = "order_rejected"
+SUBSCRIPTION_GRANTED = "subscription_granted"
+SUBSCRIPTION_EXTENDED = "subscription_extended"
+SUBSCRIPTIONS_BULK_EXTENDED = "subscriptions_bulk_extended"
+SUBSCRIPTION_REMINDED = "subscription_reminded"
+SUBSCRIPTION_EXPIRED = "subscription_expired"
+MEMBER_REMOVED = "member_removed"
+CHANNEL_DELETED = "channel_deleted"
+
+
+class EventLogWriter(threading.Thread):
+    """
+    Фоновый поток, который пишет события в append-only JSONL-файл.
+
+    Запись буферизуется, fsync выполняется не чаще раза в fsync_interval
+    секунд. При превышении max_bytes текущий файл переименовывается
+    в <name>.<timestamp> (готовый сегмент для аналитики) и начинается новый;
+    из сегментов хранятся `keep` последних (0 — все).
+    """
+
+    def __init__(self, path: str, max_bytes: int, fsync_interval: float, queue_size: int,
+                 keep: int = config.EVENT_LOG_KEEP, name: str = "event-log") -> None:
+        super().__init__(name=name, daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.fsync_interval = fsync_interval
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._last_sync = time.monotonic()
+
+    def put(self, line: str) -> None:
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            try:
+                line = self.queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+            if line is None:
+                break
+            self._file.write(line)
+            # Забираем всё, что уже накопилось, одной пачкой
+            while True:
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is None:
+                    self._sync()
+                    self._file.close()
+                    return
+                self._file.write(line)
+
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        self._sync()
+        self._file.close()
+
+    def _sync(self) -> None:
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except (OSError, ValueError) as e:
+            logging.error(f"Event log fsync failed: {e}")
+        self._last_sync = time.monotonic()
+
+    def _rotate(self) -> None:
+        self._sync()
+        self._file.close()
+        segment = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        if os.path.exists(segment):
+            segment += f"-{time.monotonic_ns()}"
+        os.replace(self.path, segment)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        segments = sorted(glob.glob(f"{glob.escape(self.path)}.[0-9]*"))
+        stale = segments[:-self.keep] if self.keep > 0 else []
+        for segment in stale:
+            try:
+                os.remove(segment)
+            except OSError as e:
+                logging.error(f"Failed to remove event log segment {segment}: {e}")
+
+
+_writer: Optional[EventLogWriter] = None
+
+
+def start(
+    path: str = config.EVENT_LOG_PATH,
+    max_bytes: int = config.EVENT_LOG_MAX_BYTES,
+    fsync_interval: float = config.EVENT_LOG_FSYNC_INTERVAL,
+    queue_size: int = config.EVENT_LOG_QUEUE_SIZE,
+    keep: int = config.EVENT_LOG_KEEP,
+) -> None:
+    """
+    Запускает фоновую запись журнала. Пока журнал не запущен, emit() ничего не делает.
+    """
+    global _writer
+    if _writer is not None or not path:
+        return
+    _writer = EventLogWriter(path, max_bytes, fsync_interval, queue_size, keep)
+    _writer.start()
+    atexit.register(stop)
+
+
+def stop() -> None:
+    """
+    Дописывает очередь на диск и останавливает поток.
+    """
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def emit(event: str, **fields: Any) -> None:
+    """
+    Ставит событие в очередь на запись. Никогда не блокирует:
+    при переполненной очереди событие отбрасывается и учитывается в dropped.
+    """
+    if _writer is None:
+        return
+    record: Dict[str, Any] = {"ts": clock.now(), "event": event}
+    record.update(fields)
+    _writer.put(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def emit_all(events: Iterable[Dict[str, Any]]) -> None:
+    """
+    emit() для списка событий вида {"event": ..., поля...}.
+    """
+    for e in events:
+        emit(**e)
@@ -1,33 +1,52 @@
+import callbacks as cb
+import config
 import database
 import states
-import time
+import zlib
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from utils import fmt_card, fmt_field, make_keyboard
+from services.review_queue import send_order_for_review
+from services.storefront import Storefront
+from typing import Optional
+from utils import fmt_card, fmt_field, make_keyboard, nav_buttons
 
 router = Router()
+actions = cb.CallbackTable()
+actions.attach(router)
 
 # -----------------------------
 # Шаблоны и константы
 # -----------------------------
 
 BACK = ("⬅️ Назад", None)  # callback_data заполняется динамически
-CANCEL = ("❌ Отмена", "cancel_admin")
+CANCEL = ("❌ Отмена", cb.pack(cb.CANCEL_ADMIN))
 
+# Апдейты владельцев каналов обрабатываются в отдельной полосе
+# (middlewares/concurrency.py), чтобы всплеск покупок их не задерживал
+ADMIN_COMMANDS = {"/add_my_channel", "/my_channels", "/pending"}
+ADMIN_STATE_GROUPS = {
+    group.__full_group_name__
+    for group in (states.AddChannelState, states.AddTariffState,
+                  states.AdminRejectionState, states.UpdatePaymentState,
+                  states.ExtendSubscriptionsState)
+}
 
-# -----------------------------
-# Помощник для разбора callback_data вида "<cmd>_<channel>[_<item>]"
-# -----------------------------
-def parse_cd(data: str, prefix: str, parts: int = 1):
+
+def is_admin_update(update: types.Update, raw_state: Optional[str]) -> bool:
     """
-    Убирает префикс и разбивает по "_", возвращает список частей.
+    True для callback-кнопок этого роутера, команд владельца
+    и сообщений в состояниях FSM владельца.
     """
-    payload = data.removeprefix(prefix)
-    items = payload.split("_", parts)
-    if len(items) < parts:
-        raise ValueError
-    return items
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        return data.split(cb.SEP, 1)[0] in actions
+    if update.message is not None:
+        if raw_state and raw_state.split(":", 1)[0] in ADMIN_STATE_GROUPS:
+            return True
+        text = update.message.text or ""
+        return text.startswith("/") and text.split(maxsplit=1)[0].split("@", 1)[0] in ADMIN_COMMANDS
+    return False
 
 
 # -----------------------------
@@ -44,7 +63,7 @@ async def cmd_add_my_channel(message: types.Message, state: FSMContext):
         ]
     )
     kb = make_keyboard([
-        ("📡 Указать канал", "enter_admin_channel"),
+        ("📡 Указать канал", cb.pack(cb.ENTER_ADMIN_CHANNEL)),
         CANCEL
     ], row_width=1)
     await state.clear()
@@ -52,21 +71,21 @@ async def cmd_add_my_channel(message: types.Message, state: FSMContext):
     await state.set_state(states.AddChannelState.WAITING_USERNAME)
 
 
-@router.callback_query(F.data == "cancel_admin")
+@actions.register(cb.CANCEL_ADMIN)
 async def cancel_admin(callback: types.CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.message.delete()
     await callback.answer()
 
 
-@router.callback_query(F.data == "enter_admin_channel")
+@actions.register(cb.ENTER_ADMIN_CHANNEL)
 async def enter_admin_channel(callback: types.CallbackQuery, state: FSMContext):
     text = fmt_card(
         "Укажите канал",
         ["Отправьте @username, ссылку t.me/... или числовой ID канала."]
     )
     kb = make_keyboard([
-        ("⬅️ Назад", "add_my_channel"),
+        ("⬅️ Назад", cb.pack(cb.ADD_MY_CHANNEL)),
         CANCEL
     ], row_width=1)
     await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
@@ -101,7 +120,7 @@ async def process_channel_username(message: types.Message, state: FSMContext):
          "Отправьте реквизиты (номер карты, QIWI и т.п.)."]
     )
     kb = make_keyboard([
-        ("⬅️ Назад", "add_my_channel"),
+        ("⬅️ Назад", cb.pack(cb.ADD_MY_CHANNEL)),
         CANCEL
     ], row_width=1)
     await message.answer(text, reply_markup=kb, parse_mode="HTML")
@@ -109,15 +128,24 @@ async def process_channel_username(message: types.Message, state: FSMContext):
 
 
 @router.message(states.AddChannelState.WAITING_PAYMENT_INFO)
-async def process_payment_info(message: types.Message, state: FSMContext):
+async def process_payment_info(message: types.Message, state: FSMContext, storefront: Storefront):
     data = await state.get_data()
     channel_id = data["channel_id"]
-    database.add_or_update_channel(
+    saved = database.add_or_update_channel(
         channel_id,
         data["owner_id"],
         data["channel_title"],
-        message.text.strip()
+        message.text.strip(),
+        bot_id=message.bot.id
     )
+    if not saved:
+        await state.clear()
+        if database.get_channel(channel_id) is None:
+            text = "❗ Канал ещё удаляется. Добавьте его снова, когда придёт отчёт о завершении удаления."
+        else:
+            text = "🚫 Канал уже подключён другим владельцем или через другого бота."
+        return await message.answer(text, parse_mode="HTML")
+    storefront.set_title(channel_id, data["channel_title"])
 
     deep_link = f"https://t.me/{(await message.bot.me()).username}?start={channel_id}"
     text = fmt_card(
@@ -129,7 +157,7 @@ async def process_payment_info(message: types.Message, state: FSMContext):
         ]
     )
     kb = make_keyboard([
-        ("➡️ Меню канала", f"channel_menu_{channel_id}"),
+        ("➡️ Меню канала", cb.pack(cb.CHANNEL_MENU, channel_id)),
         CANCEL
     ], row_width=1)
 
@@ -140,24 +168,45 @@ async def process_payment_info(message: types.Message, state: FSMContext):
 # -----------------------------
 # Меню каналов
 # -----------------------------
-@router.message(Command("my_channels"))
-async def cmd_my_channels(message: types.Message):
-    owner_id = message.from_user.id
-    channels = database.list_channels_of_owner(owner_id)
+def render_channels(bot_id: int, owner_id: int, cursor: Optional[int] = None, backward: bool = False):
+    """
+    Страница списка каналов владельца в боте bot_id: текст и клавиатура.
+    """
+    channels, has_more = database.page_channels_of_owner(owner_id, cursor, backward=backward, bot_id=bot_id)
     if not channels:
-        return await message.answer("ℹ️ У вас нет зарегистрированных каналов.", parse_mode="HTML")
+        return "ℹ️ У вас нет зарегистрированных каналов.", None
 
     lines = [fmt_field("•", ch["title"], f"ID: <code>{ch['channel_id']}</code>") for ch in channels]
     text = fmt_card("Ваши каналы", lines)
-    kb = make_keyboard([(ch["title"], f"channel_menu_{ch['channel_id']}") for ch in channels], row_width=1)
+    buttons = [(ch["title"], cb.pack(cb.CHANNEL_MENU, ch["channel_id"])) for ch in channels]
+    buttons += nav_buttons(
+        channels, has_more, backward, cursor is None,
+        lambda back, ch: cb.pack(cb.CHANNELS_PAGE, int(back), ch["channel_id"])
+    )
+    return text, make_keyboard(buttons, row_width=1)
+
+
+@router.message(Command("my_channels"))
+async def cmd_my_channels(message: types.Message):
+    text, kb = render_channels(message.bot.id, message.from_user.id)
     await message.answer(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(F.data.startswith("channel_menu_"))
-async def channel_menu(callback: types.CallbackQuery, state: FSMContext):
+@actions.register(cb.CHANNELS_PAGE, arity=2)
+async def channels_page(callback: types.CallbackQuery, cd: cb.CallbackData):
+    backward, cursor = cd.args
+    text, kb = render_channels(callback.bot.id, callback.from_user.id, cursor, bool(backward))
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await callback.answer()
+
+
+@actions.register(cb.CHANNEL_MENU, arity=1)
+async def channel_menu(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
     await state.clear()
-    channel_id = int(parse_cd(callback.data, "channel_menu_")[0])
-    ch = database.get_channel(channel_id)
+    channel_id, = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
     payment = f"<code>{ch['payment_info'] or '—'}</code>"
     deep_link = f"https://t.me/{(await callback.bot.me()).username}?start={channel_id}"
 
@@ -169,11 +218,12 @@ async def channel_menu(callback: types.CallbackQuery, state: FSMContext):
     text = fmt_card("Меню канала", lines)
 
     kb = make_keyboard([
-        ("🔄 Обновить реквизиты", f"update_payment_info_{channel_id}"),
-        ("➕ Добавить тариф", f"add_tariff_{channel_id}"),
-        ("📄 Список тарифов", f"list_tariffs_{channel_id}"),
-        ("🗑 Удалить канал", f"del_channel_{channel_id}"),
-        ("❌ Закрыть", "close_menu"),
+        ("🔄 Обновить реквизиты", cb.pack(cb.UPDATE_PAYMENT_INFO, channel_id)),
+        ("➕ Добавить тариф", cb.pack(cb.ADD_TARIFF, channel_id)),
+        ("📄 Список тарифов", cb.pack(cb.LIST_TARIFFS, channel_id)),
+        ("🎁 Продлить всем", cb.pack(cb.EXTEND_SUBSCRIPTIONS, channel_id)),
+        ("🗑 Удалить канал", cb.pack(cb.DEL_CHANNEL, channel_id)),
+        ("❌ Закрыть", cb.pack(cb.CLOSE_MENU)),
     ], row_width=2)
 
     await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
@@ -183,15 +233,19 @@ async def channel_menu(callback: types.CallbackQuery, state: FSMContext):
 # -----------------------------
 # Обновление реквизитов
 # -----------------------------
-@router.callback_query(F.data.startswith("update_payment_info_"))
-async def update_payment_info_start(callback: types.CallbackQuery, state: FSMContext):
-    channel_id = int(parse_cd(callback.data, "update_payment_info_")[0])
+@actions.register(cb.UPDATE_PAYMENT_INFO, arity=1)
+async def update_payment_info_start(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
+    channel_id, = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
+
     await state.set_state(states.UpdatePaymentState.WAITING_NEW_PAYMENT_INFO)
     await state.update_data(channel_id=channel_id)
 
     text = fmt_card("Обновить реквизиты", ["Отправьте новые реквизиты для оплаты."])
     kb = make_keyboard([
-        ("⬅️ Назад", f"channel_menu_{channel_id}"),
+        ("⬅️ Назад", cb.pack(cb.CHANNEL_MENU, channel_id)),
         CANCEL
     ], row_width=1)
 
@@ -205,23 +259,86 @@ async def process_new_payment_info(message: types.Message, state: FSMContext):
     channel_id = data["channel_id"]
     new_info = message.text.strip()
 
-    database.update_channel_payment_info(channel_id, new_info)
+    if not database.update_channel_payment_info(channel_id, message.from_user.id, message.bot.id, new_info):
+        await state.clear()
+        return await message.answer("❗ Канал удалён, удаляется или недоступен.", parse_mode="HTML")
 
     text = fmt_card("Реквизиты обновлены", [f"Новые реквизиты: {new_info}"])
-    kb = make_keyboard([("⬅️ Назад в меню", f"channel_menu_{channel_id}")], row_width=1)
+    kb = make_keyboard([("⬅️ Назад в меню", cb.pack(cb.CHANNEL_MENU, channel_id))], row_width=1)
 
     await message.answer(text, reply_markup=kb, parse_mode="HTML")
     await state.clear()
 
 
+# -----------------------------
+# Продление всех подписок канала
+# -----------------------------
+@actions.register(cb.EXTEND_SUBSCRIPTIONS, arity=1)
+async def extend_subscriptions_start(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
+    channel_id, = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
+
+    await state.set_state(states.ExtendSubscriptionsState.WAITING_DAYS)
+    await state.update_data(channel_id=channel_id)
+
+    text = fmt_card("Продлить всем", [
+        f"Канал: <b>{ch['title']}</b>",
+        "На сколько дней продлить все активные подписки?"
+    ])
+    kb = make_keyboard([
+        ("⬅️ Назад", cb.pack(cb.CHANNEL_MENU, channel_id)),
+        CANCEL
+    ], row_width=1)
+
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.message(states.ExtendSubscriptionsState.WAITING_DAYS, F.text)
+async def process_extend_days(message: types.Message, state: FSMContext):
+    text = message.text.strip()
+    if not text.isdigit() or not 1 <= int(text) <= config.BULK_EXTEND_MAX_DAYS:
+        return await message.answer(
+            f"❗ Введите число дней от 1 до {config.BULK_EXTEND_MAX_DAYS}.", parse_mode="HTML"
+        )
+
+    data = await state.get_data()
+    channel_id = data["channel_id"]
+    days = int(text)
+    # Уведомления подписчикам разошлёт outbox с ограниченной скоростью
+    count = database.extend_channel_subscriptions(channel_id, message.from_user.id, message.bot.id, days)
+    await state.clear()
+    if count is None:
+        return await message.answer("🚫 Доступ запрещён", parse_mode="HTML")
+
+    text = fmt_card("Подписки продлены", [
+        f"Продлено подписок: <b>{count}</b> на {days} дн",
+        "Подписчики получат уведомления в ближайшее время."
+    ])
+    kb = make_keyboard([("⬅️ Назад в меню", cb.pack(cb.CHANNEL_MENU, channel_id))], row_width=1)
+    await message.answer(text, reply_markup=kb, parse_mode="HTML")
+
+
 # -----------------------------
 # Удаление канала
 # -----------------------------
-@router.callback_query(F.data.startswith("del_channel_"))
-async def del_channel(callback: types.CallbackQuery, state: FSMContext):
-    channel_id = int(parse_cd(callback.data, "del_channel_")[0])
-    database.delete_channel(channel_id)
-    await callback.message.edit_text("ℹ️ Канал удалён.", parse_mode="HTML")
+@actions.register(cb.DEL_CHANNEL, arity=1)
+async def del_channel(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext,
+                      storefront: Storefront):
+    channel_id, = cd.args
+    # Инвайт-ссылки, подписчики, заявки и сам канал разбираются в фоне (services/teardown.py)
+    title = database.start_channel_teardown(channel_id, callback.from_user.id, callback.bot.id,
+                                            callback.message.message_id)
+    if title is None:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
+    storefront.drop(channel_id)
+    text = fmt_card("Удаление канала…", [
+        f"Канал: <b>{title}</b>",
+        "Подписчики будут исключены и уведомлены, ход удаления появится в этом сообщении."
+    ])
+    await callback.message.edit_text(text, parse_mode="HTML")
     await callback.answer()
     await state.clear()
 
@@ -229,10 +346,10 @@ async def del_channel(callback: types.CallbackQuery, state: FSMContext):
 # -----------------------------
 # Управление тарифами
 # -----------------------------
-@router.callback_query(F.data.startswith("add_tariff_"))
-async def add_tariff_start(callback: types.CallbackQuery, state: FSMContext):
-    channel_id = int(parse_cd(callback.data, "add_tariff_")[0])
-    ch = database.get_channel(channel_id)
+@actions.register(cb.ADD_TARIFF, arity=1)
+async def add_tariff_start(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
+    channel_id, = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
     if not ch or ch["owner_id"] != callback.from_user.id:
         return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
@@ -241,7 +358,7 @@ async def add_tariff_start(callback: types.CallbackQuery, state: FSMContext):
 
     text = fmt_card("Добавить тариф", ["Введите название:"])
     kb = make_keyboard([
-        ("⬅️ Назад", f"channel_menu_{channel_id}"),
+        ("⬅️ Назад", cb.pack(cb.CHANNEL_MENU, channel_id)),
         CANCEL
     ], row_width=1)
 
@@ -257,7 +374,7 @@ async def add_tariff_title(message: types.Message, state: FSMContext):
 
     text = fmt_card("Добавить тариф", ["Введите длительность (дни):"])
     kb = make_keyboard([
-        ("⬅️ Назад", f"add_tariff_{data['channel_id']}"),
+        ("⬅️ Назад", cb.pack(cb.ADD_TARIFF, data["channel_id"])),
         CANCEL
     ], row_width=1)
 
@@ -275,7 +392,7 @@ async def add_tariff_duration(message: types.Message, state: FSMContext):
 
     text = fmt_card("Добавить тариф", ["Введите цену (₽):"])
     kb = make_keyboard([
-        ("⬅️ Назад", f"add_tariff_{data['channel_id']}"),
+        ("⬅️ Назад", cb.pack(cb.ADD_TARIFF, data["channel_id"])),
         CANCEL
     ], row_width=1)
 
@@ -284,7 +401,7 @@ async def add_tariff_duration(message: types.Message, state: FSMContext):
 
 
 @router.message(states.AddTariffState.WAITING_PRICE)
-async def add_tariff_price(message: types.Message, state: FSMContext):
+async def add_tariff_price(message: types.Message, state: FSMContext, storefront: Storefront):
     if not message.text.isdigit():
         return await message.answer("❗ Введите корректную цену.", parse_mode="HTML")
 
@@ -295,11 +412,12 @@ async def add_tariff_price(message: types.Message, state: FSMContext):
         data["duration_days"],
         int(message.text)
     )
+    storefront.invalidate(data["channel_id"])
 
     text = fmt_card("Добавить тариф",
                     [f"«{data['tariff_title']}» — {data['duration_days']} дн за {message.text}₽ добавлен."])
     kb = make_keyboard([
-        ("⬅️ Назад в меню", f"channel_menu_{data['channel_id']}"),
+        ("⬅️ Назад в меню", cb.pack(cb.CHANNEL_MENU, data["channel_id"])),
         CANCEL
     ], row_width=1)
 
@@ -307,14 +425,13 @@ async def add_tariff_price(message: types.Message, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(F.data.startswith("list_tariffs_"))
-async def list_tariffs(callback: types.CallbackQuery):
-    channel_id = int(parse_cd(callback.data, "list_tariffs_")[0])
-    ch = database.get_channel(channel_id)
+async def show_tariffs_page(callback: types.CallbackQuery, channel_id: int,
+                            cursor: Optional[int] = None, backward: bool = False):
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
     if not ch or ch["owner_id"] != callback.from_user.id:
         return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
-    tariffs = database.list_tariffs(channel_id)
+    tariffs, has_more = database.page_tariffs(channel_id, cursor, backward=backward)
     if not tariffs:
         return await callback.message.edit_text("ℹ️ Нет тарифов.", parse_mode="HTML")
 
@@ -322,79 +439,81 @@ async def list_tariffs(callback: types.CallbackQuery):
     text = fmt_card("Список тарифов", lines)
 
     kb = make_keyboard(
-        [(f"❌ Удалить «{t['title']}»", f"del_tariff_{channel_id}_{t['id']}") for t in tariffs] +
-        [("⬅️ Назад в меню", f"channel_menu_{channel_id}")],
+        [(f"❌ Удалить «{t['title']}»", cb.pack(cb.DEL_TARIFF, channel_id, t["id"])) for t in tariffs] +
+        nav_buttons(
+            tariffs, has_more, backward, cursor is None,
+            lambda back, t: cb.pack(cb.TARIFFS_PAGE, channel_id, int(back), t["id"])
+        ) +
+        [("⬅️ Назад в меню", cb.pack(cb.CHANNEL_MENU, channel_id))],
         row_width=1
     )
     await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("del_tariff_"))
-async def del_tariff(callback: types.CallbackQuery):
-    parts = parse_cd(callback.data, "del_tariff_", parts=2)
-    channel_id, tariff_id = map(int, parts)
-    ch = database.get_channel(channel_id)
+@actions.register(cb.LIST_TARIFFS, arity=1)
+async def list_tariffs(callback: types.CallbackQuery, cd: cb.CallbackData):
+    channel_id, = cd.args
+    await show_tariffs_page(callback, channel_id)
+
+
+@actions.register(cb.TARIFFS_PAGE, arity=3)
+async def tariffs_page(callback: types.CallbackQuery, cd: cb.CallbackData):
+    channel_id, backward, cursor = cd.args
+    await show_tariffs_page(callback, channel_id, cursor, bool(backward))
+
+
+@actions.register(cb.DEL_TARIFF, arity=2)
+async def del_tariff(callback: types.CallbackQuery, cd: cb.CallbackData, storefront: Storefront):
+    channel_id, tariff_id = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
     if not ch or ch["owner_id"] != callback.from_user.id:
         return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
-    database.remove_tariff(tariff_id)
+    if not database.remove_tariff(channel_id, tariff_id):
+        return await callback.answer("ℹ️ Тариф уже удалён", show_alert=True)
+    storefront.invalidate(channel_id)
     await callback.answer("✅ Тариф удалён", show_alert=True)
     # Обновляем список
-    await list_tariffs(callback)
+    await show_tariffs_page(callback, channel_id)
 
 
 # -----------------------------
 # Обработка заявок
 # -----------------------------
-@router.callback_query(F.data.startswith("approve_"))
-async def on_approve(callback: types.CallbackQuery):
-    try:
-        channel_id, user_id, tariff_id = map(int, parse_cd(callback.data, "approve_", parts=3))
-    except ValueError:
-        return await callback.answer("❗ Неверные параметры", show_alert=True)
-
-    database.approve_order(channel_id, user_id, tariff_id)
-    tariff = database.get_tariff(tariff_id)
-    database.add_subscription(channel_id, user_id, tariff["duration_days"])
-
-    invite = await callback.bot.create_chat_invite_link(
-        chat_id=channel_id,
-        expire_date=int(time.time()) + tariff["duration_days"] * 86400,
-        member_limit=1
-    )
+@actions.register(cb.APPROVE, arity=3)
+async def on_approve(callback: types.CallbackQuery, cd: cb.CallbackData):
+    channel_id, user_id, tariff_id = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
-    await callback.bot.send_message(
-        user_id,
-        fmt_card("Заявка одобрена", [
-            f"Тариф: <b>{tariff['title']}</b>",
-            f"Срок: {tariff['duration_days']} дн",
-            f"Ваша ссылка: {invite.invite_link}"
-        ]),
-        parse_mode="HTML"
-    )
+    # Уведомление с инвайт-ссылкой отправит воркер outbox
+    if database.approve_order(channel_id, user_id, tariff_id) is None:
+        await callback.answer("ℹ️ Заявка уже обработана", show_alert=True)
+        return await callback.message.delete()
     await callback.answer("✅ Заявка подтверждена", show_alert=True)
     await callback.message.delete()
 
 
-@router.callback_query(F.data.startswith("reject_silent_"))
-async def on_reject_silent(callback: types.CallbackQuery):
-    try:
-        channel_id, user_id, tariff_id = map(int, parse_cd(callback.data, "reject_silent_", parts=3))
-    except ValueError:
-        return await callback.answer("❗ Неверные параметры", show_alert=True)
+@actions.register(cb.REJECT_SILENT, arity=3)
+async def on_reject_silent(callback: types.CallbackQuery, cd: cb.CallbackData):
+    channel_id, user_id, tariff_id = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
     database.reject_order(channel_id, user_id, tariff_id, reason="Отклонено без оповещения")
     await callback.answer("✅ Заявка отклонена без оповещения", show_alert=True)
     await callback.message.delete()
 
 
-@router.callback_query(F.data.startswith("reject_") & ~F.data.startswith("reject_silent_"))
-async def on_reject(callback: types.CallbackQuery, state: FSMContext):
-    try:
-        channel_id, user_id, tariff_id = map(int, parse_cd(callback.data, "reject_", parts=3))
-    except ValueError:
-        return await callback.answer("❗ Неверные параметры", show_alert=True)
+@actions.register(cb.REJECT, arity=3)
+async def on_reject(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
+    channel_id, user_id, tariff_id = cd.args
+    ch = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not ch or ch["owner_id"] != callback.from_user.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
 
     await state.update_data(
         channel_id=channel_id,
@@ -406,7 +525,11 @@ async def on_reject(callback: types.CallbackQuery, state: FSMContext):
     text = fmt_card("Укажите причину отклонения", ["Напишите текст причины."])
     kb = make_keyboard([CANCEL], row_width=1)
 
-    await callback.message.edit_caption(text, parse_mode="HTML", reply_markup=kb)
+    # Карточка альбома — текстовое сообщение, одиночного чека — подпись к фото
+    if callback.message.photo:
+        await callback.message.edit_caption(caption=text, parse_mode="HTML", reply_markup=kb)
+    else:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
     await state.set_state(states.AdminRejectionState.WAITING_REASON)
     await callback.answer()
 
@@ -415,14 +538,9 @@ async def on_reject(callback: types.CallbackQuery, state: FSMContext):
 async def process_reject_reason(message: types.Message, state: FSMContext):
     data = await state.get_data()
     reason = message.text.strip()
-    database.reject_order(data["channel_id"], data["user_id"], data["tariff_id"], reason=reason)
+    # Уведомление пользователю отправит воркер outbox
+    database.reject_order(data["channel_id"], data["user_id"], data["tariff_id"], reason=reason, notify=True)
 
-    # Уведомляем пользователя
-    await message.bot.send_message(
-        data["user_id"],
-        fmt_card("Заявка отклонена", [f"Причина: {reason}"]),
-        parse_mode="HTML"
-    )
     # Удаляем админское сообщение
     await message.bot.delete_message(data["admin_chat_id"], data["admin_msg_id"])
 
@@ -430,6 +548,115 @@ async def process_reject_reason(message: types.Message, state: FSMContext):
     await state.clear()
 
 
+# -----------------------------
+# Очередь заявок (/pending)
+# -----------------------------
+BULK_REJECT_REASON = "Оплата не подтверждена"
+
+
+def _digest(order_ids) -> int:
+    """
+    Отпечаток списка заявок на странице: кнопки «все» действуют только
+    на те заявки, которые владелец видел.
+    """
+    return zlib.crc32(",".join(map(str, order_ids)).encode())
+
+
+def _visible_ids(bot_id: int, owner_id: int, after_id: int, last_id: int):
+    """
+    Ожидающие заявки, которые сейчас попали бы на страницу (after_id, last_id].
+    """
+    orders = database.list_pending_orders(owner_id, after_id, limit=config.REVIEW_PAGE_SIZE, bot_id=bot_id)
+    return [o["id"] for o in orders if o["id"] <= last_id]
+
+
+def render_pending(bot_id: int, owner_id: int, after_id: int):
+    """
+    Страница очереди в боте bot_id: текст и клавиатура для заявок с id > after_id.
+    """
+    orders = database.list_pending_orders(owner_id, after_id, limit=config.REVIEW_PAGE_SIZE, bot_id=bot_id)
+    if not orders:
+        return "ℹ️ Нет заявок на проверке.", None
+
+    last_id = orders[-1]["id"]
+    digest = _digest(o["id"] for o in orders)
+    lines = [
+        fmt_field(f"#{o['id']}", o["channel_title"],
+                  f"{o['tariff_title']} — {o['price']}₽, <code>{o['user_id']}</code>")
+        for o in orders
+    ]
+    buttons = [(f"🧾 #{o['id']}", cb.pack(cb.SHOW_PROOF, o["id"])) for o in orders]
+    buttons += [
+        ("✅ Одобрить все", cb.pack(cb.APPROVE_VISIBLE, after_id, last_id, digest)),
+        ("❌ Отклонить все", cb.pack(cb.REJECT_VISIBLE, after_id, last_id, digest)),
+    ]
+    if after_id:
+        buttons.append(("⏮ В начало", cb.pack(cb.PENDING_PAGE, 0)))
+    if len(orders) == config.REVIEW_PAGE_SIZE:
+        buttons.append(("➡️ Далее", cb.pack(cb.PENDING_PAGE, last_id)))
+    return fmt_card("Заявки на проверке", lines), make_keyboard(buttons, row_width=2)
+
+
+@router.message(Command("pending"))
+async def cmd_pending(message: types.Message):
+    text, kb = render_pending(message.bot.id, message.from_user.id, 0)
+    await message.answer(text, reply_markup=kb, parse_mode="HTML")
+
+
+@actions.register(cb.PENDING_PAGE, arity=1)
+async def pending_page(callback: types.CallbackQuery, cd: cb.CallbackData):
+    after_id, = cd.args
+    text, kb = render_pending(callback.bot.id, callback.from_user.id, after_id)
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await callback.answer()
+
+
+@actions.register(cb.SHOW_PROOF, arity=1)
+async def show_proof(callback: types.CallbackQuery, cd: cb.CallbackData):
+    order_id, = cd.args
+    order = database.get_order(order_id)
+    if not order or order["owner_id"] != callback.from_user.id or order["bot_id"] != callback.bot.id:
+        return await callback.answer("🚫 Доступ запрещён", show_alert=True)
+    if not order["proof_photo_id"]:
+        return await callback.answer("ℹ️ Чек не приложен", show_alert=True)
+
+    await send_order_for_review(callback.bot, order)
+    await callback.answer()
+
+
+async def _changed_page(callback: types.CallbackQuery, after_id: int) -> None:
+    await callback.answer("ℹ️ Список заявок изменился — проверьте его ещё раз.", show_alert=True)
+    text, kb = render_pending(callback.bot.id, callback.from_user.id, after_id)
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@actions.register(cb.APPROVE_VISIBLE, arity=3)
+async def approve_visible(callback: types.CallbackQuery, cd: cb.CallbackData):
+    after_id, last_id, digest = cd.args
+    order_ids = _visible_ids(callback.bot.id, callback.from_user.id, after_id, last_id)
+    if _digest(order_ids) != digest:
+        return await _changed_page(callback, after_id)
+    orders = database.approve_pending_orders(callback.from_user.id, order_ids, bot_id=callback.bot.id)
+
+    await callback.answer(f"✅ Одобрено заявок: {len(orders)}", show_alert=True)
+    text, kb = render_pending(callback.bot.id, callback.from_user.id, after_id)
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
+@actions.register(cb.REJECT_VISIBLE, arity=3)
+async def reject_visible(callback: types.CallbackQuery, cd: cb.CallbackData):
+    after_id, last_id, digest = cd.args
+    order_ids = _visible_ids(callback.bot.id, callback.from_user.id, after_id, last_id)
+    if _digest(order_ids) != digest:
+        return await _changed_page(callback, after_id)
+    orders = database.reject_pending_orders(callback.from_user.id, order_ids, BULK_REJECT_REASON,
+                                            bot_id=callback.bot.id)
+
+    await callback.answer(f"❌ Отклонено заявок: {len(orders)}", show_alert=True)
+    text, kb = render_pending(callback.bot.id, callback.from_user.id, after_id)
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+
+
 # -----------------------------
 # Получение ID
 # -----------------------------
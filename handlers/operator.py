@@ -0,0 +1,89 @@
+import asyncio
+import config
+import logging
+from aiogram import Bot, Router, types, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile
+from services.profiler import RuntimeProfiler
+from typing import List
+from utils import fmt_card
+
+# Команды оператора бота (OPERATOR_IDS): профилирование работающего процесса
+router = Router()
+router.message.filter(F.from_user.id.in_(config.OPERATOR_IDS))
+
+OPERATOR_COMMANDS = {"/profile", "/memsnap", "/slowcb"}
+
+
+def is_operator_update(update: types.Update) -> bool:
+    """
+    Команда оператора: обрабатывается в полосе владельцев, чтобы
+    её не сбросило при перегрузке — именно тогда она и нужна.
+    """
+    message = update.message
+    if message is None or message.from_user is None or message.from_user.id not in config.OPERATOR_IDS:
+        return False
+    text = message.text or ""
+    return text.startswith("/") and text.split(maxsplit=1)[0].split("@", 1)[0] in OPERATOR_COMMANDS
+
+
+def _pre(lines: List[str]) -> str:
+    return "<pre>" + "\n".join(lines).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;") + "</pre>"
+
+
+async def _send_cpu_profile(bot: Bot, chat_id: int, profiler: RuntimeProfiler, seconds: int) -> None:
+    try:
+        path, lines = await profiler.profile_cpu(seconds)
+    except Exception as e:
+        logging.error(f"[PROFILE] CPU profile failed: {e}")
+        await bot.send_message(chat_id, f"❗ Профилирование не удалось: {e}")
+        return
+    await bot.send_message(chat_id, fmt_card("CPU-профиль", [_pre(lines)]), parse_mode="HTML")
+    await bot.send_document(chat_id, FSInputFile(path))
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject, profiler: RuntimeProfiler):
+    """
+    /profile [сек] — выборочный CPU-профиль event loop за заданное время
+    (по умолчанию 30 с). Результат приходит отдельным сообщением
+    (доля выборок: на вершине стека, со вложенными вызовами) и файлом .folded.
+    """
+    arg = (command.args or "").strip()
+    if arg and not arg.isdigit():
+        return await message.answer("❗ Использование: /profile [секунд]")
+    if profiler.cpu_running:
+        return await message.answer("ℹ️ Профилирование уже идёт.")
+    seconds = max(1, min(int(arg or 30), profiler.max_seconds))
+    asyncio.create_task(_send_cpu_profile(message.bot, message.chat.id, profiler, seconds))
+    await message.answer(f"⏱ Профилирую {seconds} с…")
+
+
+@router.message(Command("memsnap"))
+async def cmd_memsnap(message: types.Message, command: CommandObject, profiler: RuntimeProfiler):
+    """
+    /memsnap — снимок памяти и сравнение с предыдущим; /memsnap stop — выключить tracemalloc.
+    """
+    if (command.args or "").strip() == "stop":
+        profiler.memory_stop()
+        return await message.answer("✅ tracemalloc выключен.")
+    lines = profiler.memory_snapshot()
+    if lines is None:
+        return await message.answer("✅ tracemalloc включён, базовый снимок снят. "
+                                    "Повторите /memsnap, чтобы увидеть прирост.")
+    await message.answer(fmt_card("Прирост памяти", [_pre(lines)]), parse_mode="HTML")
+
+
+@router.message(Command("slowcb"))
+async def cmd_slowcb(message: types.Message, command: CommandObject, profiler: RuntimeProfiler):
+    """
+    /slowcb <мс> — логировать шаги event loop дольше порога; /slowcb off — выключить.
+    """
+    arg = (command.args or "").strip()
+    if arg == "off":
+        profiler.slow_callbacks(None)
+        return await message.answer("✅ Отладочный режим event loop выключен.")
+    if not arg.isdigit():
+        return await message.answer("❗ Использование: /slowcb <мс> | off")
+    profiler.slow_callbacks(int(arg) / 1000)
+    await message.answer(f"✅ Шаги event loop дольше {arg} мс пишутся в лог (logger asyncio).")
@@ -1,26 +1,20 @@
+import callbacks as cb
+import config
 import database
 import states
 from aiogram import Router, types, F
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from datetime import datetime, timezone, timedelta
-from utils import fmt_card, fmt_field, make_keyboard
+from services.albums import AlbumCollector
+from services.review_queue import send_order_for_review
+from services.storefront import Storefront
+from typing import Optional, Tuple
+from utils import fmt_card, fmt_field, make_keyboard, nav_buttons
 
 router = Router()
-
-
-# -----------------------------
-# Помощник для разбора callback_data
-# -----------------------------
-def parse_cd(data: str, prefix: str, parts: int = 1) -> list[str]:
-    """
-    Убирает префикс и разбивает строку по '_' не более чем на parts элементов.
-    """
-    payload = data.removeprefix(prefix)
-    items = payload.split("_", parts)
-    if len(items) < parts:
-        raise ValueError(f"Bad callback_data: {data}")
-    return items
+actions = cb.CallbackTable()
+actions.attach(router)
 
 
 # -----------------------------
@@ -55,12 +49,12 @@ async def cmd_start(message: types.Message, state: FSMContext):
         ]
     )
     kb = make_keyboard([
-        ("➕ Добавить канал", "start_add_channel"),
+        ("➕ Добавить канал", cb.pack(cb.START_ADD_CHANNEL)),
     ], row_width=1)
     await message.answer(text, parse_mode="HTML", reply_markup=kb)
 
 
-@router.callback_query(F.data == "start_add_channel")
+@actions.register(cb.START_ADD_CHANNEL)
 async def start_add_channel(callback: types.CallbackQuery):
     await callback.answer()
     await callback.message.answer(
@@ -73,11 +67,11 @@ async def start_add_channel(callback: types.CallbackQuery):
 # -----------------------------
 # Ввод ID вручную
 # -----------------------------
-@router.callback_query(F.data == "enter_channel")
+@actions.register(cb.ENTER_CHANNEL)
 async def enter_channel(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     text = fmt_card("Ввод ID канала", ["Пожалуйста, отправьте числовой ID канала."])
-    kb = make_keyboard([("⬅️ Назад", "start")], row_width=1)
+    kb = make_keyboard([("⬅️ Назад", cb.pack(cb.START))], row_width=1)
     await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
     await state.set_state(states.UserOrderState.WAITING_CHANNEL_ID)
 
@@ -96,7 +90,7 @@ async def process_channel_id(message: types.Message, state: FSMContext):
 # Показ тарифов
 # -----------------------------
 async def show_tariffs_for_channel(message: types.Message, channel_id: int):
-    channel = database.get_channel(channel_id)
+    channel = database.get_channel(channel_id, bot_id=message.bot.id)
     if not channel:
         return await message.answer("❗ Канал не найден. Проверьте ID.", parse_mode="HTML")
 
@@ -107,16 +101,15 @@ async def show_tariffs_for_channel(message: types.Message, channel_id: int):
     lines = [fmt_field("💎", t["title"], f"{t['duration_days']} дн — {t['price']}₽") for t in tariffs]
     text = fmt_card(f"Тарифы «{channel['title']}»", lines)
     kb = make_keyboard(
-        [(t["title"], f"buy_{channel_id}_{t['id']}") for t in tariffs],
+        [(t["title"], cb.pack(cb.BUY, channel_id, t["id"])) for t in tariffs],
         row_width=1
     )
     await message.answer(text, parse_mode="HTML", reply_markup=kb)
 
 
-@router.callback_query(F.data.startswith("back_to_tariffs_"))
-async def back_to_tariffs(callback: types.CallbackQuery):
-    # Извлекаем channel_id
-    channel_id = int(callback.data.removeprefix("back_to_tariffs_"))
+@actions.register(cb.BACK_TO_TARIFFS, arity=1)
+async def back_to_tariffs(callback: types.CallbackQuery, cd: cb.CallbackData):
+    channel_id, = cd.args
 
     # Убираем «часики» и удаляем текущее сообщение
     await callback.answer()
@@ -127,22 +120,28 @@ async def back_to_tariffs(callback: types.CallbackQuery):
     await show_tariffs_for_channel(callback.message, channel_id)
 
 
+# -----------------------------
+# Inline-витрина: @bot <название канала>
+# -----------------------------
+@router.inline_query()
+async def inline_storefront(query: types.InlineQuery, storefront: Storefront):
+    results = await storefront.search(query.bot, query.query)
+    await query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=False)
+
+
 # -----------------------------
 # Покупка тарифа
 # -----------------------------
-@router.callback_query(F.data.startswith("buy_"))
-async def callback_buy(callback: types.CallbackQuery, state: FSMContext):
-    try:
-        channel_str, tariff_str = parse_cd(callback.data, prefix="buy_", parts=2)
-        channel_id = int(channel_str)
-        tariff_id = int(tariff_str)
-    except Exception:
-        return await callback.answer("❗ Ошибка данных", show_alert=True)
+@actions.register(cb.BUY, arity=2)
+async def callback_buy(callback: types.CallbackQuery, cd: cb.CallbackData, state: FSMContext):
+    channel_id, tariff_id = cd.args
 
     user_id = callback.from_user.id
+    channel = database.get_channel(channel_id, bot_id=callback.bot.id)
+    if not channel:
+        return await callback.answer("❗ Канал не найден.", show_alert=True)
     database.create_order(channel_id, user_id, tariff_id)
 
-    channel = database.get_channel(channel_id)
     tariff = database.get_tariff(tariff_id)
     lines = [
         f"Реквизиты: <code>{channel['payment_info']}</code>",
@@ -154,7 +153,7 @@ async def callback_buy(callback: types.CallbackQuery, state: FSMContext):
         "После оплаты отправьте скриншот чека."
     ]
     text = fmt_card("Оплата", lines)
-    kb = make_keyboard([("⬅️ Назад", f"back_to_tariffs_{channel_id}")], row_width=1)
+    kb = make_keyboard([("⬅️ Назад", cb.pack(cb.BACK_TO_TARIFFS, channel_id))], row_width=1)
 
     await callback.message.answer(text, parse_mode="HTML", reply_markup=kb)
     await callback.answer()
@@ -166,37 +165,45 @@ async def callback_buy(callback: types.CallbackQuery, state: FSMContext):
 # Приём скриншота
 # -----------------------------
 @router.message(states.UserOrderState.WAITING_SCREENSHOT, F.photo)
-async def receive_screenshot(message: types.Message, state: FSMContext):
+async def receive_screenshot(message: types.Message, state: FSMContext, albums: AlbumCollector):
+    # Альбом чеков приходит отдельными апдейтами: обрабатываем его целиком один раз
+    album = await albums.collect(message)
+    if album is None:
+        return
+
     data = await state.get_data()
     channel_id = data["channel_id"]
     tariff_id = data["tariff_id"]
     user_id = message.from_user.id
-    photo = message.photo[-1].file_id
+    photos = [m.photo[-1].file_id for m in album]
 
-    database.update_order_proof(channel_id, user_id, tariff_id, proof_photo_id=photo)
-
-    channel = database.get_channel(channel_id)
+    # Канал могли удалить (или убрать тариф), пока пользователь оплачивал
+    channel = database.get_channel(channel_id, bot_id=message.bot.id)
     tariff = database.get_tariff(tariff_id)
-    owner_id = channel["owner_id"]
-    mention = (f"@{message.from_user.username}"
-               if message.from_user.username
-               else f"<a href='tg://user?id={user_id}'>Пользователь</a>")
+    if channel is None or tariff is None:
+        await state.clear()
+        return await message.answer("❗ Канал или тариф больше недоступен, заявка отменена.", parse_mode="HTML")
+
+    database.update_order_proof(channel_id, user_id, tariff_id, photos)
+
+    # В режиме очереди владелец увидит заявку в дайджесте или /pending
+    if not config.REVIEW_QUEUE_MODE:
+        mention = (f"@{message.from_user.username}"
+                   if message.from_user.username
+                   else None)
+        order = {
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "tariff_id": tariff_id,
+            "proof_photo_id": photos[0],
+            "proof_photo_ids": photos,
+            "owner_id": channel["owner_id"],
+            "tariff_title": tariff["title"],
+            "duration_days": tariff["duration_days"],
+            "price": tariff["price"],
+        }
+        await send_order_for_review(message.bot, order, mention)
 
-    lines = [
-        f"Заявка от {mention} (ID: <code>{user_id}</code>)",
-        fmt_field("📦", "Тариф", tariff["title"]),
-        fmt_field("⏳", "Срок", f"{tariff['duration_days']} дн"),
-        fmt_field("💰", "Цена", f"{tariff['price']}₽"),
-    ]
-    text = fmt_card("Новая заявка", lines)
-    kb = make_keyboard([
-        ("✅ Подтвердить", f"approve_{channel_id}_{user_id}_{tariff_id}"),
-        ("❌ Отклонить", f"reject_{channel_id}_{user_id}_{tariff_id}"),
-        ("🙊 Без оповещения", f"reject_silent_{channel_id}_{user_id}_{tariff_id}")
-    ], row_width=1)
-
-    await message.bot.send_photo(owner_id, photo, caption=text,
-                                 parse_mode="HTML", reply_markup=kb)
     await message.answer("✅ Ваш чек отправлен на проверку.", parse_mode="HTML")
     await state.clear()
 
@@ -213,12 +220,14 @@ async def cmd_cancel(message: types.Message, state: FSMContext):
 # -----------------------------
 # /me — Личный кабинет
 # -----------------------------
-@router.message(Command("me"))
-async def cmd_me(message: types.Message):
-    user_id = message.from_user.id
-    subs = database.list_user_subscriptions(user_id)
+def render_subscriptions(bot_id: int, user_id: int, cursor: Optional[Tuple[int, int]] = None,
+                         backward: bool = False):
+    """
+    Страница личного кабинета в боте bot_id: текст и клавиатура навигации.
+    """
+    subs, has_more = database.page_user_subscriptions(user_id, cursor, backward=backward, bot_id=bot_id)
     if not subs:
-        return await message.answer("ℹ️ У вас нет активных подписок.", parse_mode="HTML")
+        return "ℹ️ У вас нет активных подписок.", None
 
     now_ts = int(datetime.now(tz=timezone.utc).timestamp())
     lines = []
@@ -236,4 +245,23 @@ async def cmd_me(message: types.Message):
                                f"до {exp_dt.strftime('%d.%m.%Y %H:%M')} ({rem})"))
 
     text = fmt_card("Ваши подписки", lines)
-    await message.answer(text, parse_mode="HTML")
+    nav = nav_buttons(
+        subs, has_more, backward, cursor is None,
+        lambda back, s: cb.pack(cb.SUBSCRIPTIONS_PAGE, int(back), s["expire_at"], s["channel_id"])
+    )
+    return text, make_keyboard(nav, row_width=2) if nav else None
+
+
+@router.message(Command("me"))
+async def cmd_me(message: types.Message):
+    text, kb = render_subscriptions(message.bot.id, message.from_user.id)
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
+
+
+@actions.register(cb.SUBSCRIPTIONS_PAGE, arity=3)
+async def subscriptions_page(callback: types.CallbackQuery, cd: cb.CallbackData):
+    backward, expire_at, channel_id = cd.args
+    text, kb = render_subscriptions(callback.bot.id, callback.from_user.id, (expire_at, channel_id),
+                                    bool(backward))
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+    await callback.answer()
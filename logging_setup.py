@@ -0,0 +1,176 @@
+import asyncio
+import atexit
+import config
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from collections import Counter
+from typing import Any, Dict, Optional
+
+# Стабильные имена полей структурированных записей
+FIELDS = ("action", "channel_id", "user_id", "latency", "count")
+# Чужие логгеры с записью на каждый апдейт: прореживаются так же, как sampled=True
+HIGH_VOLUME_LOGGERS = {"aiogram.event": "update_handled"}
+
+
+def log_fields(
+    action: str,
+    channel_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    latency: Optional[float] = None,
+    sampled: bool = False,
+) -> Dict[str, Any]:
+    """
+    Значение для extra= в logging.*: поля структурированной записи.
+    sampled=True помечает массовые события (по одному на пользователя),
+    которые прореживаются SamplingFilter и учитываются в агрегатах.
+    """
+    extra: Dict[str, Any] = {"action": action, "sampled": sampled}
+    if channel_id is not None:
+        extra["channel_id"] = channel_id
+    if user_id is not None:
+        extra["user_id"] = user_id
+    if latency is not None:
+        extra["latency"] = round(latency, 4)
+    return extra
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна запись — одна строка JSON: ts, level, logger, msg и заданные поля из FIELDS.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                out[name] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает каждую `every`-ю запись с sampled=True (или из HIGH_VOLUME_LOGGERS)
+    по каждому action, остальные только считает. Записи уровня WARNING
+    и выше не прореживаются.
+    """
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self.counts: Counter = Counter()
+        self.latency: Counter = Counter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, "sampled", False):
+            action = getattr(record, "action", "")
+        elif record.name in HIGH_VOLUME_LOGGERS:
+            action = HIGH_VOLUME_LOGGERS[record.name]
+        else:
+            return True
+        self.counts[action] += 1
+        self.latency[action] += getattr(record, "latency", 0) or 0
+        return self.counts[action] % self.every == 1 or self.every == 1
+
+    def drain(self) -> Dict[str, Any]:
+        """
+        Возвращает {action: (число, средняя latency)} за период и обнуляет счётчики.
+        """
+        out = {a: (n, self.latency[a] / n) for a, n in self.counts.items()}
+        self.counts.clear()
+        self.latency.clear()
+        return out
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не вклеивает traceback в текст сообщения,
+    а передаёт его в exc_text — форматтер слушателя выводит его отдельным полем.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_sampler: Optional[SamplingFilter] = None
+
+
+def setup_logging(
+    level: str = config.LOG_LEVEL,
+    fmt: str = config.LOG_FORMAT,
+    path: str = config.LOG_PATH,
+    error_path: str = config.LOG_ERROR_PATH,
+    sample_every: int = config.LOG_SAMPLE_EVERY,
+) -> logging.handlers.QueueListener:
+    """
+    Настраивает корневой логгер: записи уходят в очередь (QueueHandler),
+    а пишет их фоновый поток QueueListener, так что event loop
+    не блокируется на вводе-выводе. Ошибки при заданном error_path
+    дополнительно пишутся в отдельный файл.
+    """
+    global _sampler
+    if fmt == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    handlers = [logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()]
+    if error_path:
+        errors = logging.FileHandler(error_path, encoding="utf-8")
+        errors.setLevel(logging.ERROR)
+        handlers.append(errors)
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    _sampler = SamplingFilter(sample_every)
+    queue_handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+async def report_log_aggregates(interval: int = config.LOG_AGGREGATE_INTERVAL) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд пишет по каждому прореживаемому
+    action число событий за период и среднюю latency.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if _sampler is None:
+            continue
+        for action, (count, latency) in _sampler.drain().items():
+            logging.info(
+                f"[LOG] {action}: {count} events in {interval}s",
+                extra={"action": f"{action}.aggregate", "latency": round(latency, 4), "count": count},
+            )
@@ -0,0 +1,115 @@
+import asyncio
+import config
+import logging
+import time
+from aiogram import BaseMiddleware, types
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+AdminPredicate = Callable[[types.Update, Optional[str]], bool]
+
+
+class Lane:
+    """
+    Полоса обработки: не больше `limit` хендлеров одновременно
+    и не больше `max_queue` апдейтов в ожидании.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(limit)
+        self.stats: Dict[str, Any] = {
+            "running": 0,
+            "waiting": 0,
+            "max_waiting": 0,
+            "admitted": 0,
+            "handled": 0,
+            "shed": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: ограничивает число одновременно
+    выполняемых хендлеров.
+
+    Апдейты владельцев каналов (admin_lane) идут в свою полосу, поэтому
+    одобрение заявок не ждёт за тысячами /start и покупок. Если очередь
+    полосы переполнена, апдейт сбрасывается сразу: callback получает
+    короткий ответ «попробуйте ещё раз», остальное молча отбрасывается.
+    Вешается до UnitOfWorkMiddleware, чтобы ожидающие апдейты
+    не держали соединение с БД.
+    """
+
+    def __init__(
+        self,
+        admin_lane: AdminPredicate,
+        user_limit: int = config.CONCURRENCY_USER,
+        admin_limit: int = config.CONCURRENCY_ADMIN,
+        user_queue: int = config.CONCURRENCY_USER_QUEUE,
+        admin_queue: int = config.CONCURRENCY_ADMIN_QUEUE,
+    ) -> None:
+        self.admin_lane = admin_lane
+        self.lanes = {
+            "user": Lane("user", user_limit, user_queue),
+            "admin": Lane("admin", admin_limit, admin_queue),
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        is_admin = isinstance(event, types.Update) and self.admin_lane(event, data.get("raw_state"))
+        lane = self.lanes["admin" if is_admin else "user"]
+        stats = lane.stats
+
+        if stats["waiting"] >= lane.max_queue and lane.semaphore.locked():
+            stats["shed"] += 1
+            if isinstance(event, types.Update) and event.callback_query is not None:
+                await event.callback_query.answer("⏳ Бот перегружен, попробуйте ещё раз через минуту.")
+            return None
+
+        t = time.perf_counter()
+        stats["waiting"] += 1
+        stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            stats["waiting"] -= 1
+        wait = time.perf_counter() - t
+        stats["admitted"] += 1
+        stats["wait_total"] += wait
+        stats["wait_max"] = max(stats["wait_max"], wait)
+
+        stats["running"] += 1
+        try:
+            return await handler(event, data)
+        finally:
+            stats["running"] -= 1
+            stats["handled"] += 1
+            lane.semaphore.release()
+
+
+async def report_dispatch_metrics(limiter: ConcurrencyMiddleware,
+                                  interval: int = config.CONCURRENCY_METRICS_INTERVAL) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд пишет в лог глубину очередей,
+    время ожидания и число сброшенных апдейтов по полосам.
+    Пиковые значения и суммы обнуляются после каждого отчёта.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for lane in limiter.lanes.values():
+            s = lane.stats
+            avg_wait = s["wait_total"] / s["admitted"] if s["admitted"] else 0.0
+            logging.info(
+                f"[DISPATCH] {lane.name}: running={s['running']}/{lane.limit} waiting={s['waiting']} "
+                f"max_waiting={s['max_waiting']} handled={s['handled']} shed={s['shed']} "
+                f"avg_wait={avg_wait * 1000:.1f}ms max_wait={s['wait_max'] * 1000:.1f}ms"
+            )
+            s.update(max_waiting=s["waiting"], admitted=0, handled=0, shed=0, wait_total=0.0, wait_max=0.0)
@@ -0,0 +1,67 @@
+import atexit
+import config
+import json
+import logging
+import re
+from aiogram import BaseMiddleware, types
+from event_log import EventLogWriter
+from typing import Any, Awaitable, Callable, Dict
+
+# Поля с персональными данными, которые заменяются заглушкой
+PERSONAL_FIELDS = {"first_name", "last_name", "username", "phone_number", "bio"}
+# Поля со свободным текстом пользователя (inline-запрос — query)
+TEXT_FIELDS = {"text", "caption", "query"}
+# Текст, который сохраняется как есть: команды и числовые ID (нужны для маршрутизации)
+KEEP_TEXT = re.compile(r"^(/\S+(\s+-?\d+)?|-?\d+)$")
+
+
+def anonymise(value: Any) -> Any:
+    """
+    Обезличивает апдейт: имена и username заменяются заглушкой,
+    произвольный текст (сообщения, подписи, inline-запросы) — строкой той же длины. Числовые ID, команды
+    и callback_data сохраняются, чтобы апдейты можно было проиграть
+    против копии БД.
+    """
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if key in PERSONAL_FIELDS and isinstance(item, str):
+                out[key] = "anon"
+            elif key in TEXT_FIELDS and isinstance(item, str) and not KEEP_TEXT.match(item):
+                out[key] = "x" * len(item)
+            else:
+                out[key] = anonymise(item)
+        return out
+    if isinstance(value, list):
+        return [anonymise(item) for item in value]
+    return value
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: дописывает каждый входящий апдейт
+    (обезличенный) строкой JSON в файл для tools/replay_updates.py.
+    На диск пишет фоновый поток (EventLogWriter, как у журнала событий),
+    так что запись не добавляет задержку к обработке апдейта.
+    """
+
+    def __init__(self, path: str, max_bytes: int = config.RECORD_UPDATES_MAX_BYTES,
+                 keep: int = config.RECORD_UPDATES_KEEP) -> None:
+        self.path = path
+        self._writer = EventLogWriter(path, max_bytes, config.EVENT_LOG_FSYNC_INTERVAL,
+                                      config.EVENT_LOG_QUEUE_SIZE, keep, name="update-recorder")
+        self._writer.start()
+        atexit.register(self._writer.stop)
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            raw = event.model_dump(mode="json", exclude_none=True, by_alias=True)
+            self._writer.put(json.dumps(anonymise(raw), ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.error(f"Failed to record update: {e}")
+        return await handler(event, data)
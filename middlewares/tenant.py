@@ -0,0 +1,30 @@
+import logging
+from aiogram import BaseMiddleware, types
+from services.tenants import Tenants
+from typing import Any, Awaitable, Callable, Dict
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: по боту, получившему апдейт, находит
+    его тенанта и передаёт хендлерам tenant, invite_pool и storefront
+    этого бота. Апдейты от незарегистрированных ботов отбрасываются.
+    """
+
+    def __init__(self, tenants: Tenants) -> None:
+        self.tenants = tenants
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        tenant = self.tenants.find(data["bot"].id)
+        if tenant is None:
+            logging.warning(f"Update for unknown bot {data['bot'].id} dropped")
+            return None
+        data["tenant"] = tenant
+        data["invite_pool"] = tenant.invite_pool
+        data["storefront"] = tenant.storefront
+        return await handler(event, data)
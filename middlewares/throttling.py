@@ -0,0 +1,122 @@
+import callbacks as cb
+import config
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware, types
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class TokenBucketTable:
+    """
+    Компактная таблица токен-бакетов по ключу (user_id, action).
+
+    Запись хранит [токены, время обновления, флаг «уже предупреждён»].
+    Бакет, не трогавшийся дольше времени полного восстановления, ничем
+    не отличается от нового, поэтому такие записи вытесняются; сверх
+    max_keys вытесняются самые старые. Память ограничена max_keys.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.ttl = burst / rate if rate > 0 else float("inf")
+        self._buckets: "OrderedDict[Tuple[int, str], List[Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def consume(self, key: Tuple[int, str], now: Optional[float] = None) -> Tuple[bool, bool]:
+        """
+        Пытается забрать один токен.
+        Возвращает (разрешено, первый ли это отказ подряд).
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now, False]
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, False
+
+        first = not bucket[2]
+        bucket[2] = True
+        return False, first
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if len(buckets) < self.max_keys and now - bucket[1] < self.ttl:
+                break
+            del buckets[key]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту сообщений и нажатий кнопок от одного пользователя.
+
+    Экземпляр вешается на роутер (или несколько роутеров с общим лимитом);
+    у роутера владельцев свой экземпляр с более щедрым лимитом.
+    Отброшенный callback получает короткий ответ (кнопка перестаёт
+    «крутиться»), на сообщения отвечаем только при первом отказе подряд.
+    Альбом (сообщения с общим media_group_id) считается одним действием.
+    """
+
+    def __init__(
+        self,
+        rate: float = config.THROTTLE_RATE,
+        burst: int = config.THROTTLE_BURST,
+        max_keys: int = config.THROTTLE_MAX_KEYS,
+    ) -> None:
+        self.table = TokenBucketTable(rate, burst, max_keys)
+        self.max_keys = max_keys
+        # media_group_id альбомов, первое сообщение которых уже пропущено
+        self._albums: "OrderedDict[str, None]" = OrderedDict()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        album = event.media_group_id if isinstance(event, types.Message) else None
+        if album is not None and album in self._albums:
+            return await handler(event, data)
+
+        allowed, first = self.table.consume((user.id, self._action(event)))
+        if allowed:
+            if album is not None:
+                self._albums[album] = None
+                if len(self._albums) > self.max_keys:
+                    self._albums.popitem(last=False)
+            return await handler(event, data)
+
+        if isinstance(event, types.CallbackQuery):
+            await event.answer("⏳ Слишком часто, попробуйте позже.")
+        elif first and isinstance(event, types.Message):
+            await event.answer("⏳ Слишком много сообщений, подождите немного.")
+        return None
+
+    @staticmethod
+    def _action(event: types.TelegramObject) -> str:
+        if isinstance(event, types.CallbackQuery):
+            return "cb:" + (event.data or "").split(cb.SEP, 1)[0]
+        if isinstance(event, types.Message):
+            if event.text and event.text.startswith("/"):
+                return event.text.split(maxsplit=1)[0]
+            return event.content_type
+        return type(event).__name__
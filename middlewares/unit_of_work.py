@@ -0,0 +1,62 @@
+import database
+from aiogram import BaseMiddleware, Bot, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from typing import Any, Awaitable, Callable, Dict
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: одно соединение на апдейт. Все вызовы
+    database.* из хендлеров идут через общее соединение (оно же доступно
+    хендлерам как аргумент db). Транзакция фиксируется в конце апдейта
+    и перед каждым запросом к Bot API; исключение откатывает только
+    изменения после последнего такого запроса, поэтому хендлеры
+    делают записи в БД до отправки ответа пользователю.
+
+    На сессию бота, который обрабатывает апдейт, при первом апдейте
+    вешается CommitBeforeRequestMiddleware: без неё транзакция держала бы
+    блокировку БД на время запросов к Bot API.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        bot = data.get("bot")
+        if bot is not None:
+            ensure_commit_before_request(bot)
+        with database.unit_of_work() as unit:
+            data["db"] = unit.conn
+            return await handler(event, data)
+
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot API: перед каждым запросом фиксирует изменения
+    текущей единицы работы. Блокировка SQLite не держится, пока ждём сеть
+    (иначе другие апдейты и воркеры outbox упирались бы в неё),
+    а пользователь никогда не видит сообщение о ещё не зафиксированном
+    изменении. Цена — границы транзакции: изменения до запроса уже
+    не откатываются при ошибке после него.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        database.commit_pending()
+        return await make_request(bot, method)
+
+
+def ensure_commit_before_request(bot: Bot) -> None:
+    """
+    Вешает CommitBeforeRequestMiddleware на сессию бота, если её там ещё нет.
+    """
+    if not any(isinstance(m, CommitBeforeRequestMiddleware) for m in bot.session.middleware):
+        bot.session.middleware(CommitBeforeRequestMiddleware())
@@ -0,0 +1,43 @@
+import asyncio
+import config
+from aiogram import types
+from typing import Dict, List, Optional, Tuple
+
+
+class AlbumCollector:
+    """
+    Сборщик альбомов: Telegram присылает каждое фото альбома
+    (общий media_group_id) отдельным апдейтом.
+
+    Первое сообщение альбома ждёт, пока остальные не перестанут приходить
+    `window` секунд, и получает весь альбом; остальные сообщения только
+    добавляются к нему. Так альбом обрабатывается хендлером один раз.
+    """
+
+    def __init__(self, window: float = config.MEDIA_GROUP_WINDOW) -> None:
+        self.window = window
+        # (chat_id, media_group_id) -> сообщения альбома
+        self._albums: Dict[Tuple[int, str], List[types.Message]] = {}
+
+    async def collect(self, message: types.Message) -> Optional[List[types.Message]]:
+        """
+        Одиночное сообщение — сразу [message]. Первое сообщение альбома —
+        все его сообщения по порядку. Остальные сообщения альбома — None.
+        """
+        if message.media_group_id is None:
+            return [message]
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            album.append(message)
+            return None
+
+        album = self._albums[key] = [message]
+        try:
+            seen = 0
+            while len(album) != seen:
+                seen = len(album)
+                await asyncio.sleep(self.window)
+        finally:
+            del self._albums[key]
+        return sorted(album, key=lambda m: m.message_id)
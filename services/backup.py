@@ -0,0 +1,110 @@
+import asyncio
+import config
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from services.handoff import stopping, sweep
+from typing import Optional
+
+SNAPSHOT_PREFIX = "bot-"
+SNAPSHOT_SUFFIX = ".db.gz"
+
+
+async def run_backups(interval: int = config.BACKUP_INTERVAL) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд снимает онлайн-копию БД.
+    Ошибка одного снимка не останавливает расписание.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if stopping():
+            return
+        try:
+            with sweep():
+                await backup_once()
+        except Exception as e:
+            logging.error(f"[BACKUP] Snapshot failed: {e}")
+
+
+async def backup_once(
+    directory: str = config.BACKUP_DIR,
+    keep: int = config.BACKUP_KEEP,
+) -> Optional[str]:
+    """
+    Снимает согласованную копию БД без остановки бота:
+      1) sqlite3 backup API копирует всю БД за один шаг в одной транзакции
+         чтения: в режиме WAL она не мешает записи, а копирование
+         по частям начиналось бы заново после каждой чужой записи;
+      2) копия проверяется PRAGMA integrity_check;
+      3) сжимается в <directory>/bot-<timestamp>.db.gz;
+      4) старые снимки сверх `keep` удаляются.
+    Блокирующая работа идёт в отдельном потоке, event loop не простаивает.
+    Возвращает путь к снимку или None, если копия не прошла проверку.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    raw = os.path.join(directory, f".{SNAPSHOT_PREFIX}{stamp}.db")
+    target = os.path.join(directory, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+
+    t = time.perf_counter()
+    try:
+        await asyncio.to_thread(_copy, raw)
+        copied = time.perf_counter() - t
+
+        status = await asyncio.to_thread(_integrity_check, raw)
+        if status != "ok":
+            logging.error(f"[BACKUP] Integrity check failed for {stamp}: {status}")
+            return None
+
+        raw_size = os.path.getsize(raw)
+        await asyncio.to_thread(_compress, raw, target)
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+    removed = _apply_retention(directory, keep)
+    logging.info(
+        f"[BACKUP] {target}: {raw_size / 1024:.0f} KiB -> {os.path.getsize(target) / 1024:.0f} KiB, "
+        f"copy {copied:.2f}s, total {time.perf_counter() - t:.2f}s, "
+        f"removed {removed} old"
+    )
+    return target
+
+
+def _copy(path: str) -> None:
+    src = sqlite3.connect(config.DATABASE_NAME, timeout=config.DB_BUSY_TIMEOUT / 1000)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _integrity_check(path: str) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "; ".join(r[0] for r in rows)
+
+
+def _compress(src: str, dst: str) -> None:
+    tmp = dst + ".part"
+    with open(src, "rb") as f_in, gzip.open(tmp, "wb", compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    os.replace(tmp, dst)
+
+
+def _apply_retention(directory: str, keep: int) -> int:
+    snapshots = sorted(glob.glob(os.path.join(directory, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")))
+    stale = snapshots[:-keep] if keep > 0 else []
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
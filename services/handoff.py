@@ -0,0 +1,137 @@
+import asyncio
+import config
+import database
+import logging
+import os
+import socket
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, Optional
+
+# Имя этого процесса в таблице аренд
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+POLLING_LEASE = "polling"
+SCHEDULER_LEASE = "scheduler"
+
+
+class Lease:
+    """
+    Аренда в БД, которой владеет ровно один процесс.
+
+    Держатель продлевает её каждые ttl/3 секунд; при штатной остановке
+    она освобождается сразу, при падении — истекает через ttl.
+    Так новый процесс при деплое запускается заранее и подхватывает
+    работу, как только старый её отдал.
+    """
+
+    def __init__(self, name: str, holder: str = HOLDER, ttl: int = config.LEASE_TTL) -> None:
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    async def acquire(self, stop: asyncio.Event, interval: float = config.LEASE_POLL_INTERVAL) -> bool:
+        """
+        Ждёт аренду, проверяя её каждые `interval` секунд.
+        Возвращает False, если до её получения пришёл сигнал stop.
+        """
+        waiting = False
+        while not stop.is_set():
+            if database.acquire_lease(self.name, self.holder, self.ttl):
+                if waiting:
+                    logging.info(f"[HANDOFF] Lease {self.name} taken over by {self.holder}")
+                return True
+            if not waiting:
+                logging.info(f"[HANDOFF] Waiting for lease {self.name} held by "
+                             f"{database.get_lease_holder(self.name)}")
+                waiting = True
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def keep(self, stop: asyncio.Event) -> None:
+        """
+        Фоновая задача держателя: продлевает аренду. Если её перехватил
+        другой процесс (этот не успел продлить), взводит stop.
+        """
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            if not database.acquire_lease(self.name, self.holder, self.ttl):
+                logging.error(f"[HANDOFF] Lease {self.name} lost to {database.get_lease_holder(self.name)}")
+                stop.set()
+                return
+
+    def release(self) -> None:
+        database.release_lease(self.name, self.holder)
+        logging.info(f"[HANDOFF] Lease {self.name} released by {self.holder}")
+
+
+# Число обходов, выполняющихся сейчас; при остановке новые не начинаются
+_busy = 0
+_stopping = False
+_idle = asyncio.Event()
+
+
+def stopping() -> bool:
+    """
+    True, если планировщик останавливается: фоновая задача должна
+    завершиться, не начиная новый обход.
+    """
+    return _stopping
+
+
+@contextmanager
+def sweep() -> Iterator[None]:
+    """
+    Отмечает обход фоновой задачи. При остановке планировщика начатые
+    обходы дорабатывают; новые задачи не начинают, проверяя stopping().
+    """
+    global _busy
+    _busy += 1
+    try:
+        yield
+    finally:
+        _busy -= 1
+        if _busy == 0:
+            _idle.set()
+
+
+class Scheduler:
+    """
+    Фоновые задачи (обход подписок, outbox, разбор каналов, дайджесты,
+    бэкапы) под арендой SCHEDULER_LEASE: в каждый момент их выполняет
+    один процесс. Пулы инвайт-ссылок сюда не входят: они работают в каждом
+    процессе, потому что одобрение заявки берёт ссылку из пула своего бота.
+    """
+
+    def __init__(self, jobs: Callable[[], List[Awaitable[None]]], lease: Optional[Lease] = None) -> None:
+        self.jobs = jobs
+        self.lease = lease or Lease(SCHEDULER_LEASE)
+
+    async def run(self, stop: asyncio.Event, drain_timeout: float = config.SCHEDULER_DRAIN_TIMEOUT) -> None:
+        """
+        Ждёт аренду, запускает задачи и выполняет их до сигнала stop.
+        Затем даёт начатым обходам drain_timeout секунд, отменяет задачи,
+        ожидающие следующего обхода, и освобождает аренду.
+        """
+        global _stopping
+        if not await self.lease.acquire(stop):
+            return
+        keeper = asyncio.create_task(self.lease.keep(stop))
+        tasks = [asyncio.create_task(job) for job in self.jobs()]
+        try:
+            await stop.wait()
+        finally:
+            _stopping = True
+            if _busy:
+                _idle.clear()
+                try:
+                    await asyncio.wait_for(_idle.wait(), drain_timeout)
+                except asyncio.TimeoutError:
+                    logging.warning(f"[HANDOFF] {_busy} background sweeps cut off after {drain_timeout}s")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            keeper.cancel()
+            self.lease.release()
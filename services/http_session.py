@@ -0,0 +1,141 @@
+import asyncio
+import config
+import logging
+from aiogram import Bot, __version__
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import ClientError, ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from typing import Any, Dict, Optional, cast
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """
+    Общая HTTP-сессия Bot API с настраиваемым пулом соединений,
+    таймаутами по методам и счётчиками для мониторинга.
+
+    Долгий опрос getUpdates идёт через отдельный коннектор
+    (по соединению на каждого бота), чтобы он не занимал пул,
+    нужный для ban/unban/send.
+    """
+
+    def __init__(
+        self,
+        limit: int = config.HTTP_POOL_SIZE,
+        limit_per_host: int = config.HTTP_LIMIT_PER_HOST,
+        keepalive_timeout: float = config.HTTP_KEEPALIVE,
+        dns_ttl: int = config.HTTP_DNS_TTL,
+        timeout: int = config.HTTP_TIMEOUT,
+        method_timeouts: Optional[Dict[str, int]] = None,
+        polling_connections: int = 1,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_ttl,
+        )
+        self._polling_connector_init = {**self._connector_init, "limit": polling_connections,
+                                       "limit_per_host": polling_connections}
+        self._polling_session: Optional[ClientSession] = None
+        self.method_timeouts = config.HTTP_METHOD_TIMEOUTS if method_timeouts is None else method_timeouts
+
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+        }
+
+    def _trace_config(self) -> TraceConfig:
+        trace = TraceConfig()
+
+        async def on_create(session, ctx, params) -> None:
+            self.stats["connections_created"] += 1
+
+        async def on_reuse(session, ctx, params) -> None:
+            self.stats["connections_reused"] += 1
+
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    async def create_session(self) -> ClientSession:
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+                trace_configs=[self._trace_config()],
+            )
+            self._should_reset_connector = False
+        return self._session
+
+    async def create_polling_session(self) -> ClientSession:
+        if self._polling_session is None or self._polling_session.closed:
+            self._polling_session = ClientSession(
+                connector=self._connector_type(**self._polling_connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+            )
+        return self._polling_session
+
+    async def close(self) -> None:
+        if self._polling_session is not None and not self._polling_session.closed:
+            await self._polling_session.close()
+        await super().close()
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        if isinstance(method, GetUpdates):
+            session = await self.create_polling_session()
+        else:
+            session = await self.create_session()
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__, self.timeout)
+
+        url = self.api.api_url(token=bot.token, method=method.__api_method__)
+        form = self.build_form_data(bot=bot, method=method)
+
+        stats = self.stats
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            async with session.post(url, data=form, timeout=timeout) as resp:
+                raw_result = await resp.text()
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise TelegramNetworkError(method=method, message="Request timeout error")
+        except ClientError as e:
+            stats["errors"] += 1
+            raise TelegramNetworkError(method=method, message=f"{type(e).__name__}: {e}")
+        finally:
+            stats["in_flight"] -= 1
+
+        response = self.check_response(
+            bot=bot, method=method, status_code=resp.status, content=raw_result
+        )
+        return cast(TelegramType, response.result)
+
+
+async def report_http_metrics(session: TunedAiohttpSession,
+                              interval: int = config.HTTP_METRICS_INTERVAL) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд пишет в лог счётчики сессии.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        s = dict(session.stats)
+        total = s["connections_created"] + s["connections_reused"]
+        reuse = s["connections_reused"] / total if total else 0.0
+        logging.info(f"[HTTP] {s} reuse_ratio={reuse:.2f}")
@@ -0,0 +1,111 @@
+import asyncio
+import clock
+import config
+import database
+import logging
+from aiogram import Bot
+from typing import Optional, Set, Tuple
+
+
+class InviteLinkPool:
+    """
+    Пул заранее созданных одноразовых инвайт-ссылок для каждого канала.
+
+    Одобрение заявки забирает готовую ссылку из пула вместо того,
+    чтобы ждать create_chat_invite_link. Пул пополняется в фоне,
+    ссылки с истекающим сроком выводятся из оборота и отзываются.
+    Пул хранится в БД (invite_links): рестарт или деплой не оставляет
+    созданных ссылок неотозванными, а выданные помнятся до истечения,
+    чтобы удаление канала могло их отозвать.
+
+    Ссылка действует `ttl` секунд с момента создания и выдаётся, только
+    пока до её истечения остаётся не меньше `min_ttl`. Срок подписки
+    от срока ссылки не зависит: его отслеживает обход подписок.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        size: int = config.INVITE_POOL_SIZE,
+        ttl: int = config.INVITE_LINK_TTL,
+        min_ttl: int = config.INVITE_LINK_MIN_TTL,
+    ) -> None:
+        self.bot = bot
+        self.size = size
+        self.ttl = ttl
+        self.min_ttl = min_ttl
+        self._refilling: Set[int] = set()
+
+    async def take(self, channel_id: int, issued_for: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Возвращает свежую одноразовую ссылку на канал и время её истечения.
+        Если пул пуст — создаёт ссылку напрямую. Повторный вызов с тем же
+        issued_for (ключ задачи одобрения) возвращает ту же ссылку.
+        """
+        claimed = database.claim_invite_link(channel_id, clock.now() + self.min_ttl, issued_for)
+        self.schedule_refill(channel_id)
+        if claimed is not None:
+            return claimed
+        link, expire_at = await self._create(channel_id)
+        if not database.add_invite_link(channel_id, self.bot.id, link, expire_at,
+                                        issued=True, issued_for=issued_for):
+            await self._revoke(channel_id, link)
+            raise RuntimeError(f"Channel {channel_id} is being deleted")
+        return link, expire_at
+
+    def schedule_refill(self, channel_id: int) -> None:
+        """
+        Запускает пополнение пула канала, если оно ещё не идёт.
+        """
+        if channel_id in self._refilling:
+            return
+        self._refilling.add(channel_id)
+        asyncio.create_task(self._refill(channel_id))
+
+    async def run(self, interval: int = config.INVITE_POOL_INTERVAL) -> None:
+        """
+        Фоновая задача: каждые `interval` секунд выводит из оборота
+        истекающие ссылки (и ссылки каналов, которых больше нет)
+        и пополняет пулы всех каналов. Ошибка одного прохода
+        не останавливает задачу.
+        """
+        while True:
+            try:
+                deadline = clock.now() + self.min_ttl
+                for channel_id, link in database.take_stale_invite_links(self.bot.id, deadline):
+                    await self._revoke(channel_id, link)
+
+                for channel_id in database.list_channel_ids(self.bot.id):
+                    self.schedule_refill(channel_id)
+            except Exception as e:
+                logging.error(f"Invite pool pass failed for bot {self.bot.id}: {e}")
+
+            await clock.sleep(interval)
+
+    async def _refill(self, channel_id: int) -> None:
+        try:
+            while database.count_pooled_links(channel_id, clock.now() + self.min_ttl) < self.size:
+                link, expire_at = await self._create(channel_id)
+                # Канал могли удалить, пока создавалась ссылка
+                if not database.add_invite_link(channel_id, self.bot.id, link, expire_at):
+                    await self._revoke(channel_id, link)
+                    return
+        except Exception as e:
+            logging.error(f"Failed to refill invite pool for channel {channel_id}: {e}")
+        finally:
+            self._refilling.discard(channel_id)
+
+    async def _create(self, channel_id: int) -> Tuple[str, int]:
+        expire_at = clock.now() + self.ttl
+        invite = await self.bot.create_chat_invite_link(
+            chat_id=channel_id,
+            expire_date=expire_at,
+            member_limit=1
+        )
+        return invite.invite_link, expire_at
+
+    async def _revoke(self, channel_id: int, link: str) -> None:
+        try:
+            await self.bot.revoke_chat_invite_link(chat_id=channel_id, invite_link=link)
+        except Exception as e:
+            logging.error(f"Failed to revoke invite link for channel {channel_id}: {e}")
@@ -0,0 +1,166 @@
+import asyncio
+import clock
+import config
+import database
+import event_log
+import logging
+import time
+from aiogram import Bot
+from logging_setup import log_fields
+from typing import Any, Awaitable, Callable, Dict, Optional
+from services.handoff import stopping, sweep
+from services.invite_pool import InviteLinkPool
+from services.review_queue import notify_approved, notify_rejected
+from services.subscriptions import remove_member, send_1h_notice, send_extension_notice
+from services.teardown import send_channel_closed_notice
+from services.tenants import Tenants
+
+JobHandler = Callable[[Bot, InviteLinkPool, Dict[str, Any]], Awaitable[None]]
+
+
+async def _kick(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    # Пользователь мог продлить подписку, пока задача ждала в очереди
+    expire_at = database.get_subscription_expire_at(p["channel_id"], p["user_id"])
+    if expire_at is not None and expire_at > clock.now():
+        return
+    await remove_member(bot, p["channel_id"], p["user_id"])
+    event_log.emit(event_log.MEMBER_REMOVED, channel_id=p["channel_id"], user_id=p["user_id"],
+                   expire_at=p["expire_at"])
+
+
+async def _remind(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    # Подписку могли продлить, пока задача ждала в очереди
+    if database.get_subscription_expire_at(p["channel_id"], p["user_id"]) != p["expire_at"]:
+        return
+    await send_1h_notice(bot, p["channel_id"], p["user_id"], p["expire_at"])
+    event_log.emit(event_log.SUBSCRIPTION_REMINDED, channel_id=p["channel_id"], user_id=p["user_id"],
+                   expire_at=p["expire_at"])
+
+
+async def _extended(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    await send_extension_notice(bot, p["user_id"], p["title"], p["days"], p["expire_at"])
+
+
+async def _closed(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    # Канал удаляется владельцем: подписка уже снята, исключаем без проверки срока
+    await remove_member(bot, p["channel_id"], p["user_id"])
+    event_log.emit(event_log.MEMBER_REMOVED, channel_id=p["channel_id"], user_id=p["user_id"],
+                   expire_at=p["expire_at"])
+    await send_channel_closed_notice(bot, p["user_id"], p["title"])
+
+
+async def _approved(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    tariff = {"title": p["tariff_title"], "duration_days": p["duration_days"]}
+    # Повтор задачи выдаёт ту же ссылку (у задач до появления order_id ключа нет)
+    issued_for = f"approved:{p['order_id']}" if "order_id" in p else None
+    await notify_approved(bot, invite_pool, p["user_id"], p["channel_id"], tariff, issued_for)
+
+
+async def _rejected(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    await notify_rejected(bot, p["user_id"], p["reason"])
+
+
+async def _revoke_link(bot: Bot, invite_pool: InviteLinkPool, p: Dict[str, Any]) -> None:
+    # Канал удаляется: ещё не использованная ссылка не должна впускать в него
+    await bot.revoke_chat_invite_link(chat_id=p["channel_id"], invite_link=p["invite_link"])
+
+
+HANDLERS: Dict[str, JobHandler] = {
+    "kick": _kick,
+    "remind": _remind,
+    "approved": _approved,
+    "rejected": _rejected,
+    "channel_closed": _closed,
+    "extended": _extended,
+    "revoke_link": _revoke_link,
+}
+
+
+def backoff(attempts: int) -> int:
+    """
+    Задержка перед повтором: 5с, 10с, 20с ... но не больше часа.
+    """
+    return min(5 * 2 ** (attempts - 1), 3600)
+
+
+async def run_job(tenants: Tenants, job: Dict[str, Any]) -> None:
+    """
+    Выполняет одну задачу через бота её канала (payload.bot_id)
+    и фиксирует результат в outbox.
+    """
+    p = job["payload"]
+    t = time.perf_counter()
+    try:
+        tenant = tenants.get(p.get("bot_id"))
+        if tenant is None:
+            # Токен бота убран из BOT_TOKENS: задача ждёт повторов, пока его не вернут
+            raise LookupError(f"bot {p.get('bot_id')} is not running in this process")
+        await HANDLERS[job["kind"]](tenant.bot, tenant.invite_pool, p)
+    except Exception as e:
+        retry_at: Optional[int] = None
+        if job["attempts"] < config.OUTBOX_MAX_ATTEMPTS:
+            retry_at = clock.now() + backoff(job["attempts"])
+        logging.error(
+            f"Outbox job {job['idem_key']} failed (attempt {job['attempts']}): {e}",
+            extra=log_fields(job["kind"], p.get("channel_id"), p.get("user_id"), time.perf_counter() - t),
+        )
+        database.fail_job(job["id"], str(e), retry_at)
+    else:
+        database.complete_job(job["id"])
+        # По записи на пользователя: прореживается, в сводке учитывается каждая
+        logging.info(
+            f"Outbox job {job['idem_key']} done",
+            extra=log_fields(job["kind"], p.get("channel_id"), p.get("user_id"),
+                             time.perf_counter() - t, sampled=True),
+        )
+
+
+class RateLimiter:
+    """
+    Темп отправки, общий для всех воркеров: не больше `rate` задач
+    в секунду на каждого бота, сколько бы воркеров ни работало
+    (лимит Telegram на рассылку — около 30 сообщений в секунду на бота).
+    """
+
+    def __init__(self, rate: float = config.OUTBOX_RATE) -> None:
+        self.interval = 1 / rate
+        # bot_id -> время следующего свободного слота (time.monotonic)
+        self._next: Dict[Optional[int], float] = {}
+
+    async def wait(self, bot_id: Optional[int]) -> None:
+        """
+        Занимает ближайший свободный слот бота и ждёт его.
+        """
+        now = time.monotonic()
+        slot = max(now, self._next.get(bot_id, 0.0))
+        self._next[bot_id] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def worker(tenants: Tenants, limiter: RateLimiter) -> None:
+    """
+    Один воркер: берёт задачи всех ботов в аренду и выполняет их
+    в темпе общего для воркеров limiter.
+    """
+    while not stopping():
+        with sweep():
+            job = database.claim_job(config.OUTBOX_LEASE)
+            if job is not None:
+                await limiter.wait(job["payload"].get("bot_id"))
+                await run_job(tenants, job)
+        if job is None:
+            await asyncio.sleep(config.OUTBOX_POLL_INTERVAL)
+
+
+async def run_outbox(tenants: Tenants, workers: int = config.OUTBOX_WORKERS) -> None:
+    """
+    Запускает пул воркеров outbox. Аренды задач, оставшиеся от предыдущего
+    процесса, снимаются сразу, чтобы после рестарта работа продолжилась
+    без ожидания их истечения. Это безопасно и при деплое без простоя:
+    outbox запускается только под арендой планировщика, а прежний процесс
+    отдаёт её, лишь остановив своих воркеров.
+    """
+    database.release_job_leases()
+    limiter = RateLimiter()
+    await asyncio.gather(*(worker(tenants, limiter) for _ in range(workers)))
@@ -0,0 +1,197 @@
+import asyncio
+import config
+import database
+import json
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.dispatcher import DEFAULT_BACKOFF_CONFIG
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set
+
+AdminLane = Callable[[Update], bool]
+
+
+class UpdatePoller:
+    """
+    Long polling одного бота с offset, сохранённым в БД.
+
+    Полученная порция апдейтов вместе с новым offset пишется во входящие
+    (update_inbox) до того, как следующий getUpdates подтвердит её в Telegram,
+    а каждый апдейт удаляется оттуда, как только его хендлер завершился.
+    Поэтому рестарт не теряет ни полученных, ни недообработанных апдейтов
+    и не повторяет обработанных: при старте сначала
+    порциями обрабатываются входящие, затем опрос продолжается
+    с сохранённого offset.
+
+    Апдейты полосы владельцев (admin_lane) запускаются сразу, остальные —
+    не больше max_in_flight одновременно; лишние ждут в памяти (они уже
+    во входящих), а опрос продолжается, так что одобрение заявок
+    не застревает за очередью покупателей.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        allowed_updates: List[str],
+        timeout: int = config.POLLING_TIMEOUT,
+        batch: int = config.POLLING_BATCH,
+        max_in_flight: int = config.POLLING_MAX_IN_FLIGHT,
+        max_backlog: int = config.POLLING_MAX_BACKLOG,
+        admin_lane: Optional[AdminLane] = None,
+    ) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.allowed_updates = allowed_updates
+        self.timeout = timeout
+        self.batch = batch
+        self.max_in_flight = max_in_flight
+        self.max_backlog = max_backlog
+        self.admin_lane = admin_lane
+        self._tasks: Set[asyncio.Task] = set()
+        self._user_in_flight = 0
+        self._backlog: Deque[Update] = deque()
+        self._room = asyncio.Event()
+
+    async def run(self) -> None:
+        """
+        Обрабатывает входящие, оставшиеся от прошлого запуска, и опрашивает
+        Telegram до отмены. Догоняющий поток после простоя идёт в обработку
+        порциями по max_in_flight и не упирается в сброс апдейтов при
+        перегрузке; опрос приостанавливается, только если в памяти ждут
+        max_backlog апдейтов.
+        """
+        await self.catch_up()
+        offset = database.get_update_offset(self.bot.id)
+        backoff = Backoff(config=DEFAULT_BACKOFF_CONFIG)
+        get_updates = GetUpdates(offset=offset, limit=self.batch, timeout=self.timeout,
+                                 allowed_updates=self.allowed_updates)
+        while True:
+            while len(self._backlog) >= self.max_backlog:
+                self._room.clear()
+                await self._room.wait()
+            try:
+                updates = await self.bot(get_updates, request_timeout=self.bot.session.timeout + self.timeout)
+            except Exception as e:
+                logging.error(f"[POLLING] Bot {self.bot.id}: failed to fetch updates: {e}")
+                await backoff.asleep()
+                continue
+            backoff.reset()
+
+            if not updates:
+                continue
+            get_updates.offset = updates[-1].update_id + 1
+            database.save_fetched_updates(
+                self.bot.id,
+                [(u.update_id, u.model_dump_json(exclude_none=True, by_alias=True)) for u in updates],
+                get_updates.offset,
+            )
+            for update in updates:
+                self._dispatch(update)
+
+    async def catch_up(self) -> int:
+        """
+        Порциями по `batch` обрабатывает апдейты, полученные, но не обработанные
+        до рестарта. Возвращает их число.
+        """
+        after_id, total = -1, 0
+        while True:
+            rows = database.list_inbox_updates(self.bot.id, after_id, self.batch)
+            if not rows:
+                break
+            for _, payload in rows:
+                self._spawn(Update.model_validate(json.loads(payload), context={"bot": self.bot}))
+            await asyncio.wait(self._tasks)
+            after_id = rows[-1][0]
+            total += len(rows)
+        if total:
+            logging.info(f"[POLLING] Bot {self.bot.id}: caught up {total} updates left from the previous run")
+        return total
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Ждёт завершения начатых хендлеров не дольше timeout. Незавершённые
+        и ещё не начатые остаются во входящих до следующего запуска.
+        Возвращает их число.
+        """
+        waiting = len(self._backlog)
+        self._backlog.clear()
+        pending: Set[asyncio.Task] = set()
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        return waiting + len(pending)
+
+    def _dispatch(self, update: Update) -> None:
+        """
+        Запускает апдейт владельца сразу, апдейт пользователя — если
+        в его полосе есть место, иначе ставит в очередь.
+        """
+        if self.admin_lane is not None and self.admin_lane(update):
+            self._spawn(update)
+        elif self._user_in_flight < self.max_in_flight:
+            self._spawn_user(update)
+        else:
+            self._backlog.append(update)
+
+    def _spawn(self, update: Update) -> asyncio.Task:
+        task = asyncio.create_task(self._handle(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _spawn_user(self, update: Update) -> None:
+        self._user_in_flight += 1
+        self._spawn(update).add_done_callback(self._user_done)
+
+    def _user_done(self, task: asyncio.Task) -> None:
+        self._user_in_flight -= 1
+        if self._backlog and not task.cancelled():
+            self._spawn_user(self._backlog.popleft())
+            self._room.set()
+
+    async def _handle(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"[POLLING] Bot {self.bot.id}: update {update.update_id} failed: {e}")
+        database.finish_update(self.bot.id, update.update_id)
+
+
+async def run_polling(dp: Dispatcher, bots: List[Bot], stop: asyncio.Event,
+                      drain_timeout: float = config.POLLING_DRAIN_TIMEOUT) -> None:
+    """
+    Опрашивает всех ботов до сигнала stop (или падения опроса), затем
+    прекращает получать апдейты и даёт начатым хендлерам drain_timeout секунд.
+    allowed_updates вычисляется по зарегистрированным роутерам: Telegram
+    присылает только типы апдейтов, которые бот обрабатывает. Полоса
+    владельцев определяется тем же предикатом, что и в ConcurrencyMiddleware
+    (без состояния FSM: сообщения в диалогах владельца идут общей полосой).
+    """
+    allowed = dp.resolve_used_update_types()
+    logging.info(f"[POLLING] Allowed updates: {', '.join(allowed)}")
+    limiter = dp.workflow_data.get("concurrency")
+    admin_lane = (lambda update: limiter.admin_lane(update, None)) if limiter is not None else None
+    pollers = [UpdatePoller(dp, bot, allowed, admin_lane=admin_lane) for bot in bots]
+
+    tasks = [asyncio.create_task(p.run()) for p in pollers]
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait([stopper, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopper.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for poller in pollers:
+            left = await poller.drain(drain_timeout)
+            if left:
+                logging.warning(f"[POLLING] Bot {poller.bot.id}: {left} updates left for the next run")
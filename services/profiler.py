@@ -0,0 +1,138 @@
+import asyncio
+import config
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class RuntimeProfiler:
+    """
+    Профилирование работающего процесса по команде оператора.
+
+    Пока ничего не включено, накладных расходов нет: выборка стеков,
+    tracemalloc и отладочный режим event loop запускаются только по запросу
+    и сами выключаются (CPU-профиль — по истечении заданного времени).
+    CPU-профиль выборочный: под нагрузкой он не замедляет каждый вызов,
+    как трассирующий cProfile.
+    """
+
+    def __init__(self, directory: str = config.PROFILE_DIR,
+                 max_seconds: int = config.PROFILE_MAX_SECONDS,
+                 sample_interval: float = config.PROFILE_SAMPLE_INTERVAL) -> None:
+        self.directory = directory
+        self.max_seconds = max_seconds
+        self.sample_interval = sample_interval
+        self._cpu: Optional[threading.Event] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def cpu_running(self) -> bool:
+        return self._cpu is not None
+
+    async def profile_cpu(self, seconds: int, top: int = 15) -> Tuple[str, List[str]]:
+        """
+        Снимает выборочный CPU-профиль event loop за `seconds` секунд
+        (не больше max_seconds): фоновый поток каждые sample_interval секунд
+        читает стек потока event loop (sys._current_frames), сам код
+        не трассируется. Возвращает путь к .folded (свёрнутые стеки
+        для flamegraph.pl / speedscope) и строки с функциями, чаще всего
+        оказывавшимися на вершине стека (доля выборок: своя, со вложенными).
+        """
+        if self._cpu is not None:
+            raise RuntimeError("CPU profile is already running")
+        seconds = max(1, min(seconds, self.max_seconds))
+        stop = threading.Event()
+        stacks: Counter = Counter()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stacks, stop),
+                                   name="cpu-sampler", daemon=True)
+        self._cpu = stop
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+            self._cpu = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"cpu-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+        total = sum(stacks.values()) or 1
+        inclusive: Counter = Counter()
+        leaf: Counter = Counter()
+        for stack, count in stacks.items():
+            for frame in set(stack):
+                inclusive[frame] += count
+            leaf[stack[-1]] += count
+        lines = [f"samples: {total}, interval {self.sample_interval * 1000:.1f} ms"]
+        lines += [
+            f"{count / total:6.1%} {inclusive[frame] / total:6.1%} {frame}"
+            for frame, count in leaf.most_common(top)
+        ]
+        return path, lines
+
+    def _sample(self, thread_id: int, stacks: Counter, stop: threading.Event) -> None:
+        while not stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                stacks[tuple(reversed(stack))] += 1
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Одинаковые фильтры у базового и последующих снимков, иначе сравнение перекошено
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+    def memory_snapshot(self, top: int = 15) -> Optional[List[str]]:
+        """
+        Первый вызов включает tracemalloc и запоминает базовый снимок (возвращает None).
+        Следующие сравнивают новый снимок с предыдущим и возвращают
+        строки кода с наибольшим приростом памяти.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(config.TRACEMALLOC_FRAMES)
+            self._snapshot = self._take_snapshot()
+            return None
+        snapshot = self._take_snapshot()
+        diff = snapshot.compare_to(self._snapshot, "lineno") if self._snapshot else []
+        self._snapshot = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB"]
+        for stat in diff[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7} "
+                         f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        return lines
+
+    def memory_stop(self) -> None:
+        """
+        Выключает tracemalloc и забывает базовый снимок.
+        """
+        tracemalloc.stop()
+        self._snapshot = None
+
+    @staticmethod
+    def slow_callbacks(threshold: Optional[float]) -> None:
+        """
+        threshold (сек) — включает отладочный режим event loop: asyncio пишет
+        в лог предупреждение о каждом шаге дольше threshold. None — выключает.
+        """
+        loop = asyncio.get_running_loop()
+        if threshold is None:
+            loop.set_debug(False)
+        else:
+            loop.slow_callback_duration = threshold
+            loop.set_debug(True)
@@ -0,0 +1,112 @@
+import asyncio
+import callbacks as cb
+import config
+import database
+import logging
+import time
+from aiogram import Bot
+from aiogram.types import InputMediaPhoto
+from typing import Any, Dict, Optional, Tuple
+from services.handoff import stopping, sweep
+from services.invite_pool import InviteLinkPool
+from services.tenants import Tenants
+from utils import fmt_card, fmt_field, make_keyboard
+
+MEDIA_GROUP_MAX = 10  # лимит Telegram на число элементов альбома
+
+
+def order_card(order: Dict[str, Any], mention: Optional[str] = None) -> str:
+    """
+    Текст карточки заявки для владельца канала.
+    """
+    user_id = order["user_id"]
+    mention = mention or f"<a href='tg://user?id={user_id}'>Пользователь</a>"
+    lines = [
+        f"Заявка от {mention} (ID: <code>{user_id}</code>)",
+        fmt_field("📦", "Тариф", order["tariff_title"]),
+        fmt_field("⏳", "Срок", f"{order['duration_days']} дн"),
+        fmt_field("💰", "Цена", f"{order['price']}₽"),
+    ]
+    return fmt_card("Новая заявка", lines)
+
+
+async def send_order_for_review(bot: Bot, order: Dict[str, Any], mention: Optional[str] = None) -> None:
+    """
+    Отправляет владельцу канала чек с кнопками подтверждения/отклонения.
+    Несколько чеков (альбом) уходят одним send_media_group,
+    карточка с кнопками — отдельным сообщением.
+    """
+    args = (order["channel_id"], order["user_id"], order["tariff_id"])
+    kb = make_keyboard([
+        ("✅ Подтвердить", cb.pack(cb.APPROVE, *args)),
+        ("❌ Отклонить", cb.pack(cb.REJECT, *args)),
+        ("🙊 Без оповещения", cb.pack(cb.REJECT_SILENT, *args))
+    ], row_width=1)
+    photos = order.get("proof_photo_ids") or [order["proof_photo_id"]]
+    if len(photos) == 1:
+        await bot.send_photo(order["owner_id"], photos[0],
+                             caption=order_card(order, mention),
+                             parse_mode="HTML", reply_markup=kb)
+        return
+    await bot.send_media_group(order["owner_id"], [InputMediaPhoto(media=p) for p in photos[:MEDIA_GROUP_MAX]])
+    await bot.send_message(order["owner_id"], order_card(order, mention),
+                           parse_mode="HTML", reply_markup=kb)
+
+
+async def notify_approved(bot: Bot, invite_pool: InviteLinkPool, user_id: int,
+                          channel_id: int, tariff: Dict[str, Any], issued_for: Optional[str] = None) -> None:
+    """
+    Сообщает пользователю об одобрении заявки и выдаёт инвайт-ссылку
+    (по ключу issued_for — одну и ту же при повторах).
+    """
+    invite_link, link_expire_at = await invite_pool.take(channel_id, issued_for)
+    await bot.send_message(
+        user_id,
+        fmt_card("Заявка одобрена", [
+            f"Тариф: <b>{tariff['title']}</b>",
+            f"Срок: {tariff['duration_days']} дн",
+            f"Ваша ссылка: {invite_link}",
+            f"Ссылка действует до {time.strftime('%d.%m.%Y %H:%M', time.localtime(link_expire_at))}"
+        ]),
+        parse_mode="HTML"
+    )
+
+
+async def notify_rejected(bot: Bot, user_id: int, reason: str) -> None:
+    """
+    Сообщает пользователю об отклонении заявки.
+    """
+    await bot.send_message(
+        user_id,
+        fmt_card("Заявка отклонена", [f"Причина: {reason}"]),
+        parse_mode="HTML"
+    )
+
+
+async def send_pending_digests(tenants: Tenants, interval: int = config.REVIEW_DIGEST_INTERVAL) -> None:
+    """
+    Фоновая задача режима очереди: раз в `interval` секунд сообщает
+    владельцам о числе ожидающих заявок, если появились новые.
+    Дайджест приходит от того бота, к которому привязаны каналы.
+    """
+    # (bot_id, owner_id) -> max(order.id) на момент дайджеста
+    notified: Dict[Tuple[int, int], int] = {}
+    while not stopping():
+        with sweep():
+            for bot_id, owner_id, count, last_id in database.pending_counts_by_owner():
+                tenant = tenants.find(bot_id)
+                if tenant is None or notified.get((bot_id, owner_id), 0) >= last_id:
+                    continue
+                kb = make_keyboard([("📥 Открыть очередь", cb.pack(cb.PENDING_PAGE, 0))], row_width=1)
+                try:
+                    await tenant.bot.send_message(
+                        owner_id,
+                        fmt_card("Заявки на проверке", [f"Ожидают решения: <b>{count}</b>"]),
+                        parse_mode="HTML", reply_markup=kb
+                    )
+                    notified[(bot_id, owner_id)] = last_id
+                except Exception as e:
+                    logging.error(f"Failed to send pending digest to {owner_id}: {e}")
+                await asyncio.sleep(config.NOTIFY_PACE)
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,125 @@
+import bisect
+import config
+import database
+from aiogram import Bot
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent,
+)
+from typing import Dict, List, Optional, Tuple
+from utils import fmt_card, fmt_field
+
+
+class Storefront:
+    """
+    Витрина для inline-режима (@bot <канал>).
+
+    Поиск идёт по индексу названий каналов в памяти: отсортированный
+    список (начало слова названия в нижнем регистре, channel_id), так что
+    совпадение по префиксу — это bisect плюс короткий проход.
+    Готовые карточки каналов кешируются и сбрасываются при изменении
+    тарифов или названия, поэтому ввод запроса не обращается к БД.
+    При заданном bot_id в индекс попадают только каналы этого бота.
+    """
+
+    def __init__(self, bot_id: Optional[int] = None, limit: int = config.INLINE_RESULTS_LIMIT) -> None:
+        self.bot_id = bot_id
+        self.limit = limit
+        self._index: List[Tuple[str, int]] = []
+        self._titles: Dict[int, str] = {}
+        # channel_id -> готовая карточка (None — у канала нет тарифов)
+        self._results: Dict[int, Optional[InlineQueryResultArticle]] = {}
+        self._loaded = False
+
+    @staticmethod
+    def _keys(title: str) -> List[str]:
+        words = title.casefold().split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _load(self) -> None:
+        for channel_id, title in database.list_channel_titles(self.bot_id):
+            self._titles[channel_id] = title
+            self._index.extend((key, channel_id) for key in self._keys(title))
+        self._index.sort()
+        self._loaded = True
+
+    def set_title(self, channel_id: int, title: str) -> None:
+        """
+        Добавляет канал в индекс или обновляет его название.
+        """
+        if not self._loaded:
+            return
+        self.drop(channel_id)
+        self._titles[channel_id] = title
+        for key in self._keys(title):
+            bisect.insort(self._index, (key, channel_id))
+
+    def invalidate(self, channel_id: int) -> None:
+        """
+        Сбрасывает карточку канала (тарифы изменились).
+        """
+        self._results.pop(channel_id, None)
+
+    def drop(self, channel_id: int) -> None:
+        """
+        Убирает канал из индекса и кеша.
+        """
+        self._results.pop(channel_id, None)
+        if self._titles.pop(channel_id, None) is not None:
+            self._index = [entry for entry in self._index if entry[1] != channel_id]
+
+    def match(self, query: str) -> List[int]:
+        """
+        ID каналов, название которых (или слово в нём) начинается с query;
+        числовой запрос дополнительно сверяется с ID канала.
+        """
+        if not self._loaded:
+            self._load()
+        query = " ".join(query.casefold().split())
+        found: List[int] = []
+        if query.lstrip("-").isdigit() and int(query) in self._titles:
+            found.append(int(query))
+        if not query:
+            return found
+        i = bisect.bisect_left(self._index, (query, -(1 << 63)))
+        while i < len(self._index) and len(found) < self.limit:
+            key, channel_id = self._index[i]
+            if not key.startswith(query):
+                break
+            if channel_id not in found:
+                found.append(channel_id)
+            i += 1
+        return found
+
+    async def search(self, bot: Bot, query: str) -> List[InlineQueryResultArticle]:
+        """
+        Карточки каналов, подходящих под запрос.
+        """
+        results = []
+        for channel_id in self.match(query):
+            if channel_id not in self._results:
+                self._results[channel_id] = await self._build(bot, channel_id)
+            card = self._results[channel_id]
+            if card is not None:
+                results.append(card)
+        return results
+
+    async def _build(self, bot: Bot, channel_id: int) -> Optional[InlineQueryResultArticle]:
+        tariffs = database.list_tariffs(channel_id)
+        if not tariffs:
+            return None
+        title = self._titles[channel_id]
+        lines = [fmt_field("💎", t["title"], f"{t['duration_days']} дн — {t['price']}₽") for t in tariffs]
+        deep_link = f"https://t.me/{(await bot.me()).username}?start={channel_id}"
+        kb = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="💳 Оформить подписку", url=deep_link)]
+        ])
+        cheapest = min(t["price"] for t in tariffs)
+        return InlineQueryResultArticle(
+            id=str(channel_id),
+            title=title,
+            description=f"Тарифов: {len(tariffs)}, от {cheapest}₽",
+            input_message_content=InputTextMessageContent(
+                message_text=fmt_card(f"Тарифы «{title}»", lines), parse_mode="HTML"
+            ),
+            reply_markup=kb,
+        )
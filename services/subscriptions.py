@@ -1,40 +1,65 @@
 import asyncio
+import clock
+import config
 import database
-import logging
 import time
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import Tuple, List
+from services.handoff import stopping, sweep
+from typing import Tuple
 
+SWEEP_BATCH = 1000
 
-async def check_subscriptions(bot: Bot, interval: int = 60) -> None:
+
+async def check_subscriptions(interval: int = 60) -> None:
+    """
+    Фоновая задача, которая каждые `interval` секунд выполняет sweep_once().
+    Один обход на процесс покрывает подписки всех ботов; сами вызовы
+    Bot API выполняют воркеры outbox (services/outbox.py) через бота канала,
+    поэтому падение процесса посреди обхода ничего не теряет и не дублирует.
+    """
+    while not stopping():
+        with sweep():
+            await sweep_once()
+        await clock.sleep(interval)
+
+
+async def sweep_once(batch: int = SWEEP_BATCH) -> Tuple[int, int]:
     """
-    Фоновая задача, которая каждые `interval` секунд:
-      1) Удаляет полностью истёкшие подписки (бан + разбан).
-      2) Отправляет напоминания за 1 час до окончания подписки.
+    Один обход подписок:
+      1) Удаляет полностью истёкшие подписки и ставит в outbox их исключение.
+      2) Ставит в outbox напоминания за 1 час до окончания подписки.
+    Возвращает (число истёкших, число напоминаний).
     """
+    expired = reminded = 0
+
+    # 1) Истёкшие подписки — порциями, чтобы не держать блокировку записи
     while True:
-        now = int(time.time())
+        n = database.expire_subscriptions(batch)
+        expired += n
+        if n < batch:
+            break
+        await asyncio.sleep(0)
 
-        # 1) Удаляем полностью истёкшие подписки
-        expired: List[Tuple[int, int]] = database.get_expired_subscriptions()
-        for channel_id, user_id in expired:
-            try:
-                await bot.ban_chat_member(chat_id=channel_id, user_id=user_id, revoke_messages=False)
-                await bot.unban_chat_member(chat_id=channel_id, user_id=user_id)
-                logging.info(f"[Expired] Removed user {user_id} from channel {channel_id}")
-            except Exception as e:
-                logging.error(f"Failed to remove user {user_id} from channel {channel_id}: {e}")
-            finally:
-                database.remove_subscription(channel_id, user_id)
+    # 2) Напоминания за 1 час до окончания (если ещё не отправляли)
+    while True:
+        n = database.claim_reminders(batch)
+        reminded += n
+        if n < batch:
+            break
+        await asyncio.sleep(0)
 
-        # 2) Отправляем напоминания за 1 час до окончания (если ещё не отправляли)
-        soon: List[Tuple[int, int, int]] = database.get_expiring_subscriptions_1h()
-        for channel_id, user_id, expire_at in soon:
-            await send_1h_notice(bot, channel_id, user_id, expire_at)
-            database.mark_subscription_reminded(channel_id, user_id)
+    database.purge_jobs(clock.now() - config.OUTBOX_RETENTION, clock.now() - config.OUTBOX_DEAD_RETENTION)
+    return expired, reminded
 
-        await asyncio.sleep(interval)
+
+async def remove_member(bot: Bot, channel_id: int, user_id: int) -> None:
+    """
+    Исключает пользователя из канала (бан + разбан, чтобы он мог вернуться
+    по новой ссылке). Ошибки пробрасываются — задачу повторит outbox.
+    """
+    await bot.ban_chat_member(chat_id=channel_id, user_id=user_id, revoke_messages=False)
+    await bot.unban_chat_member(chat_id=channel_id, user_id=user_id)
 
 
 async def send_1h_notice(bot: Bot, channel_id: int, user_id: int, expire_at: int) -> None:
@@ -64,8 +89,16 @@ async def send_1h_notice(bot: Bot, channel_id: int, user_id: int, expire_at: int
         [InlineKeyboardButton(text="🔄 Продлить подписку", url=deep_link)]
     ])
 
-    try:
-        await bot.send_message(chat_id=user_id, text=text, parse_mode="HTML", reply_markup=kb)
-        logging.info(f"[Reminder 1h] Sent reminder to user {user_id} for channel {channel_id}")
-    except Exception as e:
-        logging.error(f"Failed to send 1h reminder to {user_id} for channel {channel_id}: {e}")
+    await bot.send_message(chat_id=user_id, text=text, parse_mode="HTML", reply_markup=kb)
+
+
+async def send_extension_notice(bot: Bot, user_id: int, title: str, days: int, expire_at: int) -> None:
+    """
+    Сообщает подписчику, что владелец продлил его подписку на канал на `days` дней.
+    """
+    dt_str = time.strftime("%d.%m.%Y %H:%M", time.localtime(expire_at))
+    text = (
+        f"🎁 Ваша подписка на канал «{title}» продлена на {days} дн.\n"
+        f"📅 <b>Новая дата окончания:</b> {dt_str}"
+    )
+    await bot.send_message(chat_id=user_id, text=text, parse_mode="HTML")
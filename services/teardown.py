@@ -0,0 +1,112 @@
+import asyncio
+import clock
+import config
+import database
+import logging
+from aiogram import Bot
+from typing import Any, Dict
+from services.handoff import stopping, sweep
+from services.tenants import Tenants
+from utils import fmt_card
+
+
+async def run_teardowns(tenants: Tenants, interval: int = config.TEARDOWN_INTERVAL) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд продвигает каждое незавершённое
+    удаление канала на один шаг. Состояние разбора хранится в БД, поэтому
+    после рестарта он продолжается с того места, где остановился.
+    """
+    while not stopping():
+        with sweep():
+            for td in database.list_channel_teardowns():
+                try:
+                    await teardown_step(tenants, td)
+                except Exception as e:
+                    logging.error(f"[TEARDOWN] Channel {td['channel_id']} step failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def teardown_step(
+    tenants: Tenants,
+    td: Dict[str, Any],
+    chunk: int = config.TEARDOWN_CHUNK,
+    rate: int = config.TEARDOWN_RATE,
+) -> bool:
+    """
+    Один шаг разбора канала:
+      1) пока есть подписки — порция участников ставится в outbox
+         (исключение + уведомление) с расписанием не быстрее `rate` в секунду,
+         но не дальше чем на одну порцию вперёд, чтобы outbox не раздувался;
+      2) затем заявки порциями переносятся в orders_archive;
+      3) когда все исключения наступили по расписанию — удаляются тарифы и канал.
+    Каждая порция — отдельная короткая транзакция.
+    Возвращает True, если канал удалён полностью.
+    """
+    channel_id = td["channel_id"]
+    td = dict(td)
+    now = clock.now()
+
+    # Выданные, но не использованные ссылки (и созданные уже после начала
+    # удаления одобрениями из очереди) отзываются на каждом шаге
+    database.revoke_channel_invite_links(channel_id)
+
+    if td["next_at"] > now + chunk // rate:
+        return False
+    n = database.teardown_members_chunk(channel_id, chunk, rate)
+    if n:
+        td["members"] += n
+        await _report(tenants, td, done=False)
+        return False
+
+    while True:
+        n = database.archive_orders_chunk(channel_id, chunk)
+        td["orders"] += n
+        if n < chunk:
+            break
+        await asyncio.sleep(0)
+
+    if td["next_at"] > clock.now() or not database.finish_channel_teardown(channel_id):
+        await _report(tenants, td, done=False)
+        return False
+
+    logging.info(f"[TEARDOWN] Channel {channel_id} deleted: {td['members']} members, {td['orders']} orders archived")
+    await _report(tenants, td, done=True)
+    return True
+
+
+async def _report(tenants: Tenants, td: Dict[str, Any], done: bool) -> None:
+    """
+    Обновляет у владельца сообщение о ходе удаления
+    (не чаще TEARDOWN_REPORT_INTERVAL, итог — всегда).
+    """
+    tenant = tenants.find(td["bot_id"])
+    now = clock.now()
+    if tenant is None or td["message_id"] is None:
+        return
+    if not done and now - td["reported_at"] < config.TEARDOWN_REPORT_INTERVAL:
+        return
+    lines = [
+        f"Канал: <b>{td['title']}</b>",
+        f"Участников к исключению: {td['members']}",
+        f"Заявок в архиве: {td['orders']}",
+    ]
+    try:
+        await tenant.bot.edit_message_text(
+            fmt_card("Канал удалён" if done else "Удаление канала…", lines),
+            chat_id=td["owner_id"], message_id=td["message_id"], parse_mode="HTML"
+        )
+    except Exception as e:
+        logging.warning(f"[TEARDOWN] Failed to report progress for channel {td['channel_id']}: {e}")
+    if not done:
+        database.mark_teardown_reported(td["channel_id"], now)
+
+
+async def send_channel_closed_notice(bot: Bot, user_id: int, title: str) -> None:
+    """
+    Сообщает участнику, что канал удалён владельцем и подписка прекращена.
+    """
+    await bot.send_message(
+        user_id,
+        fmt_card("Канал закрыт", [f"Канал «{title}» удалён владельцем, подписка прекращена."]),
+        parse_mode="HTML"
+    )
@@ -0,0 +1,64 @@
+from aiogram import Bot
+from typing import Dict, Iterator, List, Optional
+from services.invite_pool import InviteLinkPool
+from services.storefront import Storefront
+
+
+class Tenant:
+    """
+    Один бот в процессе и его состояние в памяти:
+    пул инвайт-ссылок и inline-витрина по его каналам.
+    """
+
+    def __init__(self, bot: Bot, invite_pool: InviteLinkPool, storefront: Storefront) -> None:
+        self.bot = bot
+        self.invite_pool = invite_pool
+        self.storefront = storefront
+
+    @property
+    def bot_id(self) -> int:
+        return self.bot.id
+
+
+class Tenants:
+    """
+    Реестр ботов процесса по bot_id. Первый добавленный бот — бот
+    по умолчанию: через него выполняются задачи outbox без bot_id
+    (поставленные до поддержки нескольких ботов).
+    """
+
+    def __init__(self) -> None:
+        self._by_id: Dict[int, Tenant] = {}
+        self.default: Optional[Tenant] = None
+
+    def add(self, bot: Bot, invite_pool: Optional[InviteLinkPool] = None) -> Tenant:
+        """
+        Регистрирует бота; пул ссылок по умолчанию создаётся для него же.
+        """
+        tenant = Tenant(bot, invite_pool or InviteLinkPool(bot), Storefront(bot.id))
+        self._by_id[bot.id] = tenant
+        if self.default is None:
+            self.default = tenant
+        return tenant
+
+    def get(self, bot_id: Optional[int]) -> Optional[Tenant]:
+        """
+        Тенант по bot_id (None — бот по умолчанию).
+        Для бота, не запущенного в этом процессе, — None.
+        """
+        if bot_id is None:
+            return self.default
+        return self._by_id.get(bot_id)
+
+    def find(self, bot_id: int) -> Optional[Tenant]:
+        return self._by_id.get(bot_id)
+
+    @property
+    def bots(self) -> List[Bot]:
+        return [t.bot for t in self._by_id.values()]
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
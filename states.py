@@ -23,3 +23,7 @@ class AdminRejectionState(StatesGroup):
 
 class UpdatePaymentState(StatesGroup):
     WAITING_NEW_PAYMENT_INFO = State()
+
+
+class ExtendSubscriptionsState(StatesGroup):
+    WAITING_DAYS = State()  # Ожидаем число дней продления для всех подписчиков
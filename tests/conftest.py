@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "1:test")
+
+import config  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Чистая БД во временном каталоге с выполненным init_db().
+    """
+    monkeypatch.setattr(config, "DATABASE_NAME", str(tmp_path / "test.db"))
+    database.init_db()
+    return database
@@ -0,0 +1,56 @@
+import clock
+import pytest
+
+T0 = 1_000_000
+DAY = 86400
+
+
+@pytest.fixture
+def shop(db):
+    clock.use(clock.VirtualClock(T0))
+    db.add_or_update_channel(-100, 1, "c", "pay", bot_id=10)
+    db.add_tariff(-100, "month", 30, 100)
+    yield db
+    clock.use(clock.SystemClock())
+
+
+def _jobs(db, kind):
+    with db.get_connection() as conn:
+        return [r["idem_key"] for r in conn.execute(
+            "SELECT idem_key FROM outbox WHERE kind = ? ORDER BY id", (kind,))]
+
+
+def _awaiting_order(db, user_id):
+    order_id = db.create_order(-100, user_id, 1)
+    db.update_order_proof(-100, user_id, 1, ["photo"])
+    return order_id
+
+
+def test_second_approve_is_a_noop(shop):
+    order_id = _awaiting_order(shop, 7)
+
+    first = shop.approve_order(-100, 7, 1)
+    assert first["expire_at"] == T0 + 30 * DAY
+    assert shop.approve_order(-100, 7, 1) is None
+
+    assert shop.get_subscription_expire_at(-100, 7) == T0 + 30 * DAY
+    assert _jobs(shop, "approved") == [f"approved:{order_id}"]
+
+
+def test_single_and_bulk_approve_do_not_double_grant(shop):
+    order_id = _awaiting_order(shop, 7)
+
+    assert [o["id"] for o in shop.approve_pending_orders(1, [order_id], bot_id=10)] == [order_id]
+    assert shop.approve_order(-100, 7, 1) is None
+    assert shop.approve_pending_orders(1, [order_id], bot_id=10) == []
+
+    assert shop.get_subscription_expire_at(-100, 7) == T0 + 30 * DAY
+    assert _jobs(shop, "approved") == [f"approved:{order_id}"]
+
+
+def test_new_order_extends_active_subscription(shop):
+    _awaiting_order(shop, 7)
+    shop.approve_order(-100, 7, 1)
+    _awaiting_order(shop, 7)
+    assert shop.approve_order(-100, 7, 1)["expire_at"] == T0 + 60 * DAY
+    assert len(_jobs(shop, "approved")) == 2
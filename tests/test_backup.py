@@ -0,0 +1,54 @@
+import asyncio
+import gzip
+import sqlite3
+import threading
+
+import config
+from services.backup import backup_once
+
+
+def test_backup_finishes_under_concurrent_writes(db, tmp_path):
+    with db.get_connection() as conn:
+        conn.execute("CREATE TABLE filler (id INTEGER PRIMARY KEY, data BLOB)")
+        conn.executemany("INSERT INTO filler(data) VALUES (?)", [(b"x" * 200,)] * 50000)
+
+    stop = threading.Event()
+    writes = []
+
+    def writer():
+        conn = sqlite3.connect(config.DATABASE_NAME, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO filler(data) VALUES (x'00')")
+            conn.commit()
+            writes.append(1)
+            stop.wait(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        target = asyncio.run(asyncio.wait_for(backup_once(str(tmp_path / "backups"), keep=2), 60))
+    finally:
+        stop.set()
+        thread.join()
+
+    assert target is not None and writes
+    raw = tmp_path / "restored.db"
+    with gzip.open(target, "rb") as f:
+        raw.write_bytes(f.read())
+    conn = sqlite3.connect(raw)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM filler").fetchone()[0] >= 50000
+    finally:
+        conn.close()
+
+
+def test_retention_keeps_last_snapshots(db, tmp_path):
+    directory = str(tmp_path / "backups")
+    for stamp in ("20260101-000000", "20260102-000000", "20260103-000000"):
+        (tmp_path / "backups").mkdir(exist_ok=True)
+        (tmp_path / "backups" / f"bot-{stamp}.db.gz").write_bytes(b"")
+    asyncio.run(backup_once(directory, keep=2))
+    names = sorted(p.name for p in (tmp_path / "backups").iterdir())
+    assert len(names) == 2 and "bot-20260103-000000.db.gz" in names
@@ -0,0 +1,57 @@
+import json
+
+import clock
+import pytest
+
+T0 = 1_000_000
+DAY = 86400
+
+
+@pytest.fixture
+def channel(db):
+    virtual = clock.VirtualClock(T0)
+    clock.use(virtual)
+    db.add_or_update_channel(-100, 1, "c", "pay", bot_id=10)
+    for user_id in (1, 2, 3):
+        db.add_subscription(-100, user_id, 30)
+    virtual.advance(10 * DAY)
+    db.add_subscription(-100, 4, 5)  # истекает раньше первых трёх
+    virtual.advance(6 * DAY)  # подписка 4 уже истекла
+    yield db
+    clock.use(clock.SystemClock())
+
+
+def _notices(db):
+    with db.get_connection() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT idem_key, payload, available_at FROM outbox WHERE kind = 'extended' ORDER BY id")]
+
+
+def test_extends_only_active_subscriptions(channel):
+    assert channel.extend_channel_subscriptions(-100, 1, 10, 7, rate=2) == 3
+    assert channel.get_subscription_expire_at(-100, 1) == T0 + 37 * DAY
+    assert channel.get_subscription_expire_at(-100, 4) == T0 + 15 * DAY
+
+    notices = _notices(channel)
+    assert [json.loads(n["payload"])["user_id"] for n in notices] == [1, 2, 3]
+    assert notices[0]["idem_key"] == f"extended:-100:1:{T0 + 37 * DAY}"
+
+
+def test_notices_are_paced_by_rate(channel):
+    now = clock.now()
+    channel.extend_channel_subscriptions(-100, 1, 10, 7, rate=2)
+    assert [n["available_at"] for n in _notices(channel)] == [now, now, now + 1]
+
+
+def test_repeated_extension_in_the_same_second_notifies_again(channel):
+    channel.extend_channel_subscriptions(-100, 1, 10, 7)
+    channel.extend_channel_subscriptions(-100, 1, 10, 7)
+    assert channel.get_subscription_expire_at(-100, 1) == T0 + 44 * DAY
+    assert len(_notices(channel)) == 6
+
+
+def test_only_owner_through_its_bot_can_extend(channel):
+    assert channel.extend_channel_subscriptions(-100, 2, 10, 7) is None
+    assert channel.extend_channel_subscriptions(-100, 1, 11, 7) is None
+    assert channel.get_subscription_expire_at(-100, 1) == T0 + 30 * DAY
+    assert _notices(channel) == []
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from aiogram import types
+
+import callbacks as cb
+
+
+def _callback(data):
+    return types.CallbackQuery(
+        id="1",
+        from_user=types.User(id=1, is_bot=False, first_name="u"),
+        chat_instance="c",
+        data=data,
+    )
+
+
+@pytest.mark.parametrize("value", [0, 1, 35, 36, -1, -1001234567890, 2 ** 40])
+def test_int_roundtrip(value):
+    assert cb.unpack(cb.pack(cb.BUY, value)).args == (value,)
+
+
+def test_pack_is_base36():
+    assert cb.pack(cb.APPROVE, 35, 36, -36) == "a:z:10:-10"
+
+
+def test_pack_without_args():
+    data = cb.pack(cb.START)
+    assert data == "s"
+    assert cb.unpack(data) == cb.CallbackData("s", ())
+
+
+def test_pack_rejects_long_data():
+    with pytest.raises(ValueError):
+        cb.pack(cb.APPROVE, *([2 ** 60] * 6))
+
+
+def test_unpack_rejects_garbage():
+    with pytest.raises(ValueError):
+        cb.unpack("a:!")
+
+
+def test_table_dispatches_by_tag_with_arity():
+    table = cb.CallbackTable()
+    calls = []
+
+    @table.register(cb.APPROVE, arity=2)
+    async def approve(callback, cd):
+        calls.append(cd)
+
+    assert cb.APPROVE in table
+    assert table.resolve(cb.APPROVE) is approve
+    assert table.resolve(cb.REJECT) is None
+
+    assert table._match(_callback("r:1")) is False
+    assert table._match(_callback(None)) is False
+    assert table._match(_callback("a:1")) == {"cd": None}
+    assert table._match(_callback("a:1:x!")) == {"cd": None}
+
+    match = table._match(_callback("a:1:z"))
+    assert match == {"cd": cb.CallbackData("a", (1, 35))}
+    asyncio.run(table._dispatch(_callback("a:1:z"), **match))
+    assert calls == [cb.CallbackData("a", (1, 35))]
+
+
+def test_table_rejects_duplicate_tag():
+    table = cb.CallbackTable()
+    table.register(cb.BUY, arity=1)(lambda callback, cd: None)
+    with pytest.raises(ValueError):
+        table.register(cb.BUY, arity=2)(lambda callback, cd: None)
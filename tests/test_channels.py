@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import callbacks as cb
+from handlers import admin
+
+OWNER, BOT = 1, 10
+
+
+@pytest.fixture
+def channels(db):
+    db.add_or_update_channel(-100, OWNER, "mine", "pay", bot_id=BOT)
+    db.add_or_update_channel(-200, OWNER + 1, "other", "theirs", bot_id=BOT)
+    db.add_tariff(-100, "t", 30, 100)
+    db.add_tariff(-200, "t", 30, 100)
+    return db
+
+
+def test_payment_info_is_scoped_to_owner_and_bot(channels):
+    assert not channels.update_channel_payment_info(-200, OWNER, BOT, "hijack")
+    assert not channels.update_channel_payment_info(-100, OWNER, BOT + 1, "hijack")
+    assert channels.get_channel(-200)["payment_info"] == "theirs"
+    assert channels.update_channel_payment_info(-100, OWNER, BOT, "new")
+    assert channels.get_channel(-100)["payment_info"] == "new"
+
+
+def test_remove_tariff_requires_its_channel(channels):
+    foreign = channels.list_tariffs(-200)[0]["id"]
+    assert not channels.remove_tariff(-100, foreign)
+    assert len(channels.list_tariffs(-200)) == 1
+    assert channels.remove_tariff(-200, foreign)
+    assert channels.list_tariffs(-200) == []
+
+
+def test_payment_info_callback_for_foreign_channel_is_denied(channels):
+    class State:
+        async def set_state(self, value):
+            raise AssertionError("state must not change")
+
+    alerts = []
+
+    async def answer(text=None, **kwargs):
+        alerts.append(text)
+
+    callback = SimpleNamespace(bot=SimpleNamespace(id=BOT), from_user=SimpleNamespace(id=OWNER), answer=answer)
+    asyncio.run(admin.update_payment_info_start(callback, cb.unpack(cb.pack(cb.UPDATE_PAYMENT_INFO, -200)), State()))
+    assert alerts == ["🚫 Доступ запрещён"]
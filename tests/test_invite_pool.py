@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import clock
+import database
+from services.invite_pool import InviteLinkPool
+
+T0 = 1_000_000
+BOT = 10
+
+
+class FakeBot:
+    id = BOT
+
+    def __init__(self):
+        self.created = 0
+        self.revoked = []
+
+    async def create_chat_invite_link(self, chat_id, expire_date, member_limit):
+        self.created += 1
+        return SimpleNamespace(invite_link=f"https://t.me/+new{self.created}")
+
+    async def revoke_chat_invite_link(self, chat_id, invite_link):
+        self.revoked.append(invite_link)
+
+
+@pytest.fixture
+def pool(db):
+    clock.use(clock.VirtualClock(T0))
+    db.add_or_update_channel(-100, 1, "c", "pay", bot_id=BOT)
+    yield InviteLinkPool(FakeBot(), size=0, ttl=86400, min_ttl=3600)
+    clock.use(clock.SystemClock())
+
+
+def test_retry_of_the_same_approval_gets_the_same_link(pool):
+    for i in range(3):
+        database.add_invite_link(-100, BOT, f"https://t.me/+pool{i}", T0 + 86400 - i)
+
+    async def scenario():
+        first = await pool.take(-100, "approved:1")
+        again = await pool.take(-100, "approved:1")
+        other = await pool.take(-100, "approved:2")
+        return first, again, other
+
+    first, again, other = asyncio.run(scenario())
+    assert first == again == ("https://t.me/+pool2", T0 + 86400 - 2)
+    assert other[0] != first[0]
+    assert database.count_pooled_links(-100, T0) == 1
+
+
+def test_directly_created_link_is_keyed_too(pool):
+    async def scenario():
+        return await pool.take(-100, "approved:1"), await pool.take(-100, "approved:1")
+
+    first, again = asyncio.run(scenario())
+    assert first == again == ("https://t.me/+new1", T0 + 86400)
+    assert pool.bot.created == 1
+
+
+def test_run_survives_a_failed_pass(pool, monkeypatch):
+    calls = []
+
+    def flaky(bot_id, min_expire_at):
+        calls.append(min_expire_at)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return []
+
+    monkeypatch.setattr(database, "take_stale_invite_links", flaky)
+
+    async def scenario():
+        task = asyncio.create_task(pool.run(interval=60))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert len(calls) > 2
+    assert calls[:2] == [T0 + 3600, T0 + 60 + 3600]
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE t (a INTEGER, b INTEGER, grp INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                     [(a, b, 1) for a in range(3) for b in range(3)] + [(9, 9, 2)])
+    yield conn
+    conn.close()
+
+
+def _page(conn, cursor, limit, backward=False):
+    rows, more = database._keyset_page(conn, "SELECT a, b FROM t WHERE grp = ?", (1,),
+                                       ("a", "b"), cursor, limit, backward)
+    return [(r["a"], r["b"]) for r in rows], more
+
+
+def test_forward_walks_composite_key_without_gaps(conn):
+    seen, cursor, more = [], None, True
+    while more:
+        rows, more = _page(conn, cursor, 4)
+        seen += rows
+        cursor = rows[-1]
+    assert seen == [(a, b) for a in range(3) for b in range(3)]
+
+
+def test_forward_has_more_flag(conn):
+    assert _page(conn, None, 9) == ([(a, b) for a in range(3) for b in range(3)], False)
+    assert _page(conn, None, 8)[1] is True
+    assert _page(conn, (2, 2), 4) == ([], False)
+
+
+def test_backward_returns_ascending_rows_before_cursor(conn):
+    assert _page(conn, (1, 1), 3, backward=True) == ([(0, 1), (0, 2), (1, 0)], True)
+    assert _page(conn, (0, 2), 3, backward=True) == ([(0, 0), (0, 1)], False)
+
+
+def test_page_tariffs_cursor_roundtrip(db):
+    db.add_or_update_channel(-100, 1, "c", "pay")
+    for i in range(5):
+        db.add_tariff(-100, f"t{i}", 30, 100)
+    first, more = db.page_tariffs(-100, limit=2)
+    assert more and [t["title"] for t in first] == ["t0", "t1"]
+    second, more = db.page_tariffs(-100, cursor=first[-1]["id"], limit=2)
+    assert more and [t["title"] for t in second] == ["t2", "t3"]
+    back, more = db.page_tariffs(-100, cursor=second[0]["id"], limit=2, backward=True)
+    assert back == first and more is False
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+import config
+import database
+
+# Схема БД до первых миграций (исходная версия init_db)
+LEGACY_SCHEMA = """
+    CREATE TABLE channels (
+        channel_id    INTEGER PRIMARY KEY,
+        owner_id      INTEGER NOT NULL,
+        title         TEXT    NOT NULL,
+        payment_info  TEXT
+    );
+    CREATE TABLE tariffs (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel_id     INTEGER NOT NULL,
+        title          TEXT    NOT NULL,
+        duration_days  INTEGER NOT NULL,
+        price          INTEGER NOT NULL
+    );
+    CREATE TABLE orders (
+        id                INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel_id        INTEGER NOT NULL,
+        user_id           INTEGER NOT NULL,
+        tariff_id         INTEGER NOT NULL,
+        status            TEXT    NOT NULL,
+        proof_photo_id    TEXT,
+        rejection_reason  TEXT,
+        created_at        INTEGER NOT NULL
+    );
+    CREATE TABLE subscriptions (
+        channel_id    INTEGER NOT NULL,
+        user_id       INTEGER NOT NULL,
+        expire_at     INTEGER NOT NULL,
+        reminded_1h   INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(channel_id, user_id)
+    );
+"""
+
+
+@pytest.fixture
+def legacy(tmp_path, monkeypatch):
+    """
+    Файл БД со старой схемой; возвращает открытое на него соединение.
+    """
+    path = str(tmp_path / "legacy.db")
+    monkeypatch.setattr(config, "DATABASE_NAME", path)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO channels VALUES (-100, 1, 'c', 'pay')")
+    conn.execute("INSERT INTO tariffs(channel_id, title, duration_days, price) VALUES (-100, 't', 30, 100)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _orders(conn):
+    return conn.execute("SELECT id, user_id, status FROM orders ORDER BY id").fetchall()
+
+
+def test_duplicate_open_orders_are_cancelled_before_unique_index(legacy):
+    legacy.executemany(
+        "INSERT INTO orders(channel_id, user_id, tariff_id, status, created_at) VALUES (-100, ?, 1, ?, 0)",
+        [(7, "pending"), (7, "awaiting"), (7, "pending"), (7, "approved"), (8, "pending")],
+    )
+    legacy.commit()
+
+    database.init_db()
+
+    assert _orders(legacy) == [
+        (1, 7, "cancelled"),
+        (2, 7, "cancelled"),
+        (3, 7, "pending"),
+        (4, 7, "approved"),
+        (5, 8, "pending"),
+    ]
+    index = legacy.execute("SELECT name FROM sqlite_master WHERE name = 'idx_orders_open'").fetchone()
+    assert index is not None
+    with pytest.raises(sqlite3.IntegrityError):
+        legacy.execute("INSERT INTO orders(channel_id, user_id, tariff_id, status, created_at) "
+                       "VALUES (-100, 7, 1, 'awaiting', 0)")
+
+
+def test_init_db_is_repeatable(legacy):
+    database.init_db()
+    database.init_db()
+    assert database.get_channel(-100)["title"] == "c"
+
+
+def test_channels_without_bot_are_backfilled(legacy):
+    database.init_db(default_bot_id=777)
+
+    assert legacy.execute("SELECT bot_id, deleted_at FROM channels").fetchall() == [(777, None)]
+    assert database.list_channel_ids(777) == [-100]
+
+
+def test_backfill_keeps_assigned_bots(legacy):
+    database.init_db()
+    database.add_or_update_channel(-200, 2, "other", "pay", bot_id=555)
+
+    database.init_db(default_bot_id=777)
+
+    rows = legacy.execute("SELECT channel_id, bot_id FROM channels ORDER BY channel_id").fetchall()
+    assert rows == [(-200, 555), (-100, 777)]
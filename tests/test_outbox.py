@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+
+import clock
+import config
+from services.outbox import RateLimiter, backoff, run_job
+from services.tenants import Tenants
+
+T0 = 1_000_000
+
+
+@pytest.fixture
+def vclock():
+    virtual = clock.VirtualClock(T0)
+    clock.use(virtual)
+    yield virtual
+    clock.use(clock.SystemClock())
+
+
+def _enqueue(db, idem_key, available_at=None, **payload):
+    with db.get_connection() as conn:
+        db.enqueue_job(conn, "kick", idem_key, payload, available_at=available_at)
+
+
+def _status(db):
+    with db.get_connection() as conn:
+        return [tuple(r) for r in conn.execute(
+            "SELECT idem_key, status, attempts, available_at FROM outbox ORDER BY id")]
+
+
+def test_enqueue_is_idempotent(db, vclock):
+    _enqueue(db, "kick:1", user_id=1)
+    _enqueue(db, "kick:1", user_id=2)
+    assert _status(db) == [("kick:1", "pending", 0, T0)]
+    assert db.claim_job(60)["payload"] == {"user_id": 1}
+
+
+def test_claim_waits_for_available_at(db, vclock):
+    _enqueue(db, "later", available_at=T0 + 30)
+    assert db.claim_job(60) is None
+    vclock.advance(30)
+    assert db.claim_job(60)["idem_key"] == "later"
+
+
+def test_lease_hides_job_until_it_expires(db, vclock):
+    _enqueue(db, "j")
+    job = db.claim_job(60)
+    assert job["attempts"] == 1
+    assert db.claim_job(60) is None
+    vclock.advance(60)
+    again = db.claim_job(60)
+    assert again["id"] == job["id"] and again["attempts"] == 2
+
+
+def test_release_job_leases_frees_claimed_jobs(db, vclock):
+    _enqueue(db, "j")
+    db.claim_job(60)
+    db.release_job_leases()
+    assert db.claim_job(60) is not None
+
+
+def test_complete_and_dead_jobs_are_not_claimed(db, vclock):
+    _enqueue(db, "done")
+    _enqueue(db, "dead")
+    db.complete_job(db.claim_job(60)["id"])
+    db.fail_job(db.claim_job(60)["id"], "boom", None)
+    vclock.advance(3600)
+    assert db.claim_job(60) is None
+    assert [s[:2] for s in _status(db)] == [("done", "done"), ("dead", "dead")]
+
+
+def test_purge_keeps_dead_jobs_longer(db, vclock):
+    _enqueue(db, "done")
+    _enqueue(db, "dead")
+    db.complete_job(db.claim_job(60)["id"])
+    db.fail_job(db.claim_job(60)["id"], "boom", None)
+    db.purge_jobs(T0 + 1, T0)
+    assert [s[0] for s in _status(db)] == ["dead"]
+    db.purge_jobs(T0 + 1, T0 + 1)
+    assert _status(db) == []
+
+
+def test_backoff_doubles_and_is_capped():
+    assert [backoff(n) for n in (1, 2, 3, 4)] == [5, 10, 20, 40]
+    assert backoff(30) == 3600
+
+
+def test_failed_job_is_retried_with_backoff_then_dead(db, vclock):
+    # Бот задачи не запущен в процессе — выполнение падает
+    _enqueue(db, "j", bot_id=42)
+    tenants = Tenants()
+    for attempt in range(1, config.OUTBOX_MAX_ATTEMPTS):
+        job = db.claim_job(60)
+        assert job["attempts"] == attempt
+        asyncio.run(run_job(tenants, job))
+        assert _status(db) == [("j", "pending", attempt, clock.now() + backoff(attempt))]
+        vclock.advance(backoff(attempt))
+    asyncio.run(run_job(tenants, db.claim_job(60)))
+    assert _status(db)[0][1] == "dead"
+
+
+def test_rate_limiter_is_shared_per_bot():
+    limiter = RateLimiter(rate=50)
+
+    async def burst():
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.wait(1) for _ in range(3)), limiter.wait(2))
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(burst())
+    assert 2 * limiter.interval - 0.005 <= elapsed < 3 * limiter.interval + 0.05
+    assert limiter._next[2] < limiter._next[1]
+
+
+def test_purge_uses_index(db):
+    with db.get_connection() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN DELETE FROM outbox WHERE status = ? AND created_at < ?",
+                            ("done", T0)).fetchall()
+    assert any("idx_outbox_purge" in row["detail"] for row in plan)
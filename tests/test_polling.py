@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.types import Update
+
+from services.polling import UpdatePoller
+
+BOT = 10
+USER = {"id": 7, "is_bot": False, "first_name": "u"}
+
+
+def _message(update_id):
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": 7, "type": "private"},
+        "from": USER, "text": "/start"}})
+
+
+def _callback(update_id):
+    return Update.model_validate({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": USER, "chat_instance": "c", "data": "a:1"}})
+
+
+class FakeBot:
+    id = BOT
+    session = SimpleNamespace(timeout=1)
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    async def __call__(self, method, request_timeout=None):
+        if self.batches:
+            return self.batches.pop(0)
+        await asyncio.sleep(3600)
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.admin_done = asyncio.Event()
+        self.handled = []
+
+    async def feed_update(self, bot, update):
+        if update.callback_query is None:
+            await self.release.wait()
+        else:
+            self.admin_done.set()
+        self.handled.append(update.update_id)
+
+
+def test_admin_update_passes_saturated_user_lane(db):
+    async def scenario():
+        dp = FakeDispatcher()
+        bot = FakeBot([[_message(1), _message(2), _message(3)], [_callback(4)]])
+        poller = UpdatePoller(dp, bot, [], max_in_flight=2,
+                              admin_lane=lambda update: update.callback_query is not None)
+        task = asyncio.create_task(poller.run())
+
+        await asyncio.wait_for(dp.admin_done.wait(), 1)
+        assert poller._user_in_flight == 2
+        assert [u.update_id for u in poller._backlog] == [3]
+
+        dp.release.set()
+        for _ in range(100):
+            if len(dp.handled) == 4:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return dp.handled
+
+    handled = asyncio.run(scenario())
+    assert handled[0] == 4 and sorted(handled) == [1, 2, 3, 4]
+    assert db.list_inbox_updates(BOT, -1, 10) == []
+    assert db.get_update_offset(BOT) == 5
+
+
+def test_drain_leaves_waiting_updates_in_inbox(db):
+    async def scenario():
+        dp = FakeDispatcher()
+        bot = FakeBot([[_message(1), _message(2)]])
+        poller = UpdatePoller(dp, bot, [], max_in_flight=1)
+        task = asyncio.create_task(poller.run())
+        for _ in range(100):
+            if poller._backlog:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await poller.drain(0.05)
+
+    assert asyncio.run(scenario()) == 2
+    assert [row[0] for row in db.list_inbox_updates(BOT, -1, 10)] == [1, 2]
+
+
+class RecordingBot(FakeBot):
+    def __init__(self, batches):
+        super().__init__(batches)
+        self.offsets = []
+
+    async def __call__(self, method, request_timeout=None):
+        self.offsets.append(method.offset)
+        return await super().__call__(method, request_timeout)
+
+
+def test_restart_resumes_inbox_and_offset(db):
+    # Прошлый запуск получил апдейты 1..3, но успел обработать только 2
+    db.save_fetched_updates(BOT, [(i, _message(i).model_dump_json(exclude_none=True, by_alias=True))
+                                  for i in (1, 2, 3)], 4)
+    db.finish_update(BOT, 2)
+
+    async def scenario():
+        dp = FakeDispatcher()
+        dp.release.set()
+        bot = RecordingBot([])
+        poller = UpdatePoller(dp, bot, [])
+        task = asyncio.create_task(poller.run())
+        for _ in range(100):
+            if bot.offsets:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return dp.handled, bot.offsets
+
+    handled, offsets = asyncio.run(scenario())
+    assert sorted(handled) == [1, 3]
+    assert offsets == [4]
+    assert db.list_inbox_updates(BOT) == []
+
+
+def test_failed_handler_is_not_repeated(db):
+    class Failing(FakeDispatcher):
+        async def feed_update(self, bot, update):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        poller = UpdatePoller(Failing(), FakeBot([[_message(1)]]), [])
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert db.list_inbox_updates(BOT) == []
+    assert db.get_update_offset(BOT) == 2
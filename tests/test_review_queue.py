@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import callbacks as cb
+from handlers import admin
+
+OWNER, BOT = 1, 10
+
+
+class FakeCallback:
+    def __init__(self, data):
+        self.data = data
+        self.bot = SimpleNamespace(id=BOT)
+        self.from_user = SimpleNamespace(id=OWNER)
+        self.message = self
+        self.alerts = []
+
+    async def answer(self, text=None, **kwargs):
+        self.alerts.append(text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+
+
+@pytest.fixture
+def channel(db):
+    db.add_or_update_channel(-100, OWNER, "c", "pay", bot_id=BOT)
+    db.add_tariff(-100, "t", 30, 100)
+    return db
+
+
+def _order(db, user_id, proof=True):
+    order_id = db.create_order(-100, user_id, 1)
+    if proof:
+        db.update_order_proof(-100, user_id, 1, [f"photo{user_id}"])
+    return order_id
+
+
+def _press(button_data):
+    callback = FakeCallback(button_data)
+    cd = cb.unpack(button_data)
+    handler = admin.approve_visible if cd.action == cb.APPROVE_VISIBLE else admin.reject_visible
+    asyncio.run(handler(callback, cd))
+    return callback
+
+
+def _buttons(kb):
+    return {b.text: b.callback_data for row in kb.inline_keyboard for b in row}
+
+
+def _status(db, order_id):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()["status"]
+
+
+def test_approve_all_touches_only_visible_orders(channel):
+    hidden = _order(channel, 7, proof=False)
+    shown = _order(channel, 8)
+    _, kb = admin.render_pending(BOT, OWNER, 0)
+
+    # Чек к заявке с меньшим id пришёл после показа страницы
+    channel.update_order_proof(-100, 7, 1, ["late"])
+    callback = _press(_buttons(kb)["✅ Одобрить все"])
+
+    assert _status(channel, hidden) == "awaiting"
+    assert _status(channel, shown) == "awaiting"
+    assert "изменился" in callback.alerts[0]
+
+    _, kb = admin.render_pending(BOT, OWNER, 0)
+    _press(_buttons(kb)["✅ Одобрить все"])
+    assert _status(channel, hidden) == _status(channel, shown) == "approved"
+
+
+def test_reject_all_matches_rendered_page(channel):
+    first, second = _order(channel, 7), _order(channel, 8)
+    _, kb = admin.render_pending(BOT, OWNER, 0)
+    callback = _press(_buttons(kb)["❌ Отклонить все"])
+
+    assert callback.alerts == ["❌ Отклонено заявок: 2"]
+    assert _status(channel, first) == _status(channel, second) == "rejected"
+
+
+def test_bulk_approve_skips_foreign_ids(channel):
+    order_id = _order(channel, 7)
+    assert channel.approve_pending_orders(OWNER + 1, [order_id], bot_id=BOT) == []
+    assert channel.approve_pending_orders(OWNER, [order_id], bot_id=BOT + 1) == []
+    assert [o["id"] for o in channel.approve_pending_orders(OWNER, [order_id], bot_id=BOT)] == [order_id]
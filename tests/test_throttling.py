@@ -0,0 +1,58 @@
+import config
+from middlewares.throttling import TokenBucketTable
+
+KEY = (1, "cb:b")
+
+
+def test_burst_then_refill():
+    table = TokenBucketTable(rate=1.0, burst=3, max_keys=100)
+    assert [table.consume(KEY, now=0.0) for _ in range(3)] == [(True, False)] * 3
+    assert table.consume(KEY, now=0.0) == (False, True)
+    assert table.consume(KEY, now=0.5) == (False, False)
+    assert table.consume(KEY, now=1.0) == (True, False)
+    assert table.consume(KEY, now=1.0) == (False, True)
+
+
+def test_refill_is_capped_by_burst():
+    table = TokenBucketTable(rate=1.0, burst=2, max_keys=100)
+    table.consume(KEY, now=0.0)
+    table.consume(KEY, now=1.0)
+    allowed = [table.consume(KEY, now=1.5)[0] for _ in range(3)]
+    assert allowed == [True, False, False]
+
+
+def test_keys_are_independent():
+    table = TokenBucketTable(rate=1.0, burst=1, max_keys=100)
+    assert table.consume((1, "a"), now=0.0)[0]
+    assert not table.consume((1, "a"), now=0.0)[0]
+    assert table.consume((1, "b"), now=0.0)[0]
+    assert table.consume((2, "a"), now=0.0)[0]
+
+
+def test_idle_buckets_expire_after_full_refill():
+    table = TokenBucketTable(rate=0.5, burst=2, max_keys=100)  # ttl = 4s
+    table.consume((1, "a"), now=0.0)
+    table.consume((2, "a"), now=3.0)
+    assert len(table) == 2
+    table.consume((3, "a"), now=4.0)
+    assert len(table) == 2
+    assert (1, "a") not in table._buckets
+
+
+def test_lru_eviction_over_max_keys():
+    table = TokenBucketTable(rate=0.001, burst=5, max_keys=3)
+    for user in (1, 2, 3):
+        table.consume((user, "a"), now=0.0)
+    table.consume((1, "a"), now=0.0)  # 1 снова самый свежий
+    table.consume((4, "a"), now=0.0)
+    assert len(table) == 3
+    assert set(table._buckets) == {(1, "a"), (3, "a"), (4, "a")}
+
+
+def test_owner_limit_allows_working_through_a_backlog():
+    owner = TokenBucketTable(config.THROTTLE_OWNER_RATE, config.THROTTLE_OWNER_BURST, 100)
+    buyer = TokenBucketTable(config.THROTTLE_RATE, config.THROTTLE_BURST, 100)
+    # 60 нажатий «одобрить» за 6 секунд
+    clicks = [i * 0.1 for i in range(60)]
+    assert all(owner.consume((1, "cb:a"), now=t)[0] for t in clicks)
+    assert sum(buyer.consume((1, "cb:a"), now=t)[0] for t in clicks) < 10
@@ -0,0 +1,286 @@
+"""
+Офлайн-проигрывание записанных апдейтов для профилирования хендлеров.
+
+Апдейты, записанные UpdateRecorderMiddleware (RECORD_UPDATES_PATH), подаются
+в dp.feed_update как можно быстрее — против копии БД и Bot с заглушкой
+вместо HTTP-сессии, так что Telegram не затрагивается. По каждому хендлеру
+печатаются число вызовов, CPU-время, время в database.* и (с --alloc)
+объём выделенной памяти. Подряд идущие апдейты одного альбома подаются
+одновременно, как они приходят вживую, и собираются AlbumCollector
+с тем же окном MEDIA_GROUP_WINDOW (--album-window).
+
+Запуск из корня репозитория:
+    python -m tools.replay_updates updates.jsonl --db bot.db
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import config
+import database
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import (
+    Chat, ChatFullInfo, ChatInviteLink, ChatMemberAdministrator, Message, TelegramObject, Update, User,
+)
+
+
+class StubSession(BaseSession):
+    """
+    Сессия-заглушка: отвечает на любой метод правдоподобным объектом без сети.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._me = User(id=1, is_bot=True, first_name="Replay", username="replay_bot")
+        self._message_id = 0
+
+    def _message(self, chat_id: Any) -> Message:
+        self._message_id += 1
+        chat_id = chat_id if isinstance(chat_id, int) else 0
+        return Message(message_id=self._message_id, date=0, chat=Chat(id=chat_id, type="private"))
+
+    async def make_request(self, bot: Bot, method: Any, timeout: Optional[int] = None) -> Any:
+        name = type(method).__name__
+        self.calls[name] += 1
+        returning = str(method.__returning__)
+        chat_id = getattr(method, "chat_id", 0)
+
+        if name == "GetMe":
+            return self._me
+        if name == "GetChat":
+            return ChatFullInfo(id=chat_id if isinstance(chat_id, int) else -1, type="channel",
+                                title="Replay", accent_color_id=0, max_reaction_count=0)
+        if name == "GetChatMember":
+            return ChatMemberAdministrator(
+                user=self._me, can_be_edited=False, is_anonymous=False, can_manage_chat=True,
+                can_delete_messages=True, can_manage_video_chats=True, can_restrict_members=True,
+                can_promote_members=False, can_change_info=True, can_invite_users=True,
+                can_post_stories=False, can_edit_stories=False, can_delete_stories=False,
+            )
+        if "ChatInviteLink" in returning:
+            return ChatInviteLink(invite_link="https://t.me/+replay", creator=self._me,
+                                  creates_join_request=False, is_primary=False, is_revoked=False)
+        if returning.startswith("list[") and "Message" in returning:
+            return [self._message(chat_id) for _ in getattr(method, "media", [None])]
+        if "Message" in returning:
+            return self._message(chat_id)
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        yield b""
+
+
+class Profile:
+    """
+    Накопитель метрик по хендлерам.
+    """
+
+    def __init__(self, alloc: bool) -> None:
+        self.alloc = alloc
+        self.current: Optional[str] = None
+        self.db_depth = 0
+        self.rows: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "errors": 0, "wall": 0.0, "cpu": 0.0, "db": 0.0, "alloc": 0}
+        )
+
+    def wrap_database(self) -> None:
+        """
+        Оборачивает публичные функции database.* замером времени.
+        Хендлеры обращаются к ним как к атрибутам модуля, поэтому подмена
+        учитывает все вызовы; вложенные вызовы не считаются дважды.
+        """
+        for name, fn in list(vars(database).items()):
+            if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != database.__name__:
+                continue
+            setattr(database, name, self._timed(fn))
+
+    def _timed(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if self.db_depth or self.current is None:
+                return fn(*args, **kwargs)
+            self.db_depth += 1
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.rows[self.current]["db"] += time.perf_counter() - t
+                self.db_depth -= 1
+        return wrapper
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: определяет сработавший хендлер и замеряет его.
+    """
+
+    def __init__(self, profile: Profile) -> None:
+        self.profile = profile
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        target = data["handler"].callback
+        cd = data.get("cd")
+        table = getattr(target, "__self__", None)
+        if cd is not None and hasattr(table, "resolve"):
+            target = table.resolve(cd.action) or target
+        label = f"{target.__module__}.{target.__name__}"
+
+        p = self.profile
+        row = p.rows[label]
+        p.current = label
+        if p.alloc:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            return await handler(event, data)
+        except Exception:
+            row["errors"] += 1
+            raise
+        finally:
+            row["wall"] += time.perf_counter() - wall
+            row["cpu"] += time.process_time() - cpu
+            if p.alloc:
+                row["alloc"] += tracemalloc.get_traced_memory()[1] - base
+            row["calls"] += 1
+            p.current = None
+
+
+def copy_database(src: str) -> str:
+    dst = os.path.join(tempfile.mkdtemp(), "replay.db")
+    with sqlite3.connect(src) as source, sqlite3.connect(dst) as target:
+        source.backup(target)
+    return dst
+
+
+def load_updates(path: str) -> List[Update]:
+    with open(path, encoding="utf-8") as f:
+        return [Update.model_validate(json.loads(line)) for line in f if line.strip()]
+
+
+def _album_key(update: Update) -> Optional[Tuple[int, str]]:
+    message = update.message
+    if message is None or message.media_group_id is None:
+        return None
+    return message.chat.id, message.media_group_id
+
+
+def group_albums(updates: List[Update]) -> List[List[Update]]:
+    """
+    Разбивает поток на группы: подряд идущие апдейты одного альбома — одна
+    группа, остальные апдейты — по одному.
+    """
+    groups: List[List[Update]] = []
+    last = None
+    for update in updates:
+        key = _album_key(update)
+        if key is not None and key == last:
+            groups[-1].append(update)
+        else:
+            groups.append([update])
+        last = key
+    return groups
+
+
+def busiest_bot_id() -> int:
+    """
+    bot_id, за которым закреплено больше всего каналов (1, если каналов нет).
+    """
+    with sqlite3.connect(config.DATABASE_NAME) as conn:
+        row = conn.execute("""
+            SELECT bot_id FROM channels GROUP BY bot_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+    return row[0] if row else 1
+
+
+async def replay(args: argparse.Namespace) -> None:
+    from bot import create_dispatcher
+    from handlers import admin, user
+    from services.invite_pool import InviteLinkPool
+    from services.tenants import Tenants
+
+    # каналы из БД до поддержки нескольких ботов закрепляются за --bot-id (или 1)
+    database.init_db(default_bot_id=args.bot_id or 1)
+    updates = load_updates(args.updates)
+    session = StubSession()
+    bot = Bot(token=f"{args.bot_id or busiest_bot_id()}:replay", session=session)
+    tenants = Tenants()
+    tenants.add(bot, InviteLinkPool(bot, size=0))
+
+    profile = Profile(alloc=args.alloc)
+    profile.wrap_database()
+    profiler = ProfilingMiddleware(profile)
+    for router in (admin.router, user.router):
+        router.message.middleware(profiler)
+        router.callback_query.middleware(profiler)
+    dp = create_dispatcher(tenants, throttle=args.throttle)
+    dp["albums"].window = args.album_window
+
+    if args.alloc:
+        tracemalloc.start()
+    failed = 0
+    t = time.perf_counter()
+    for group in group_albums(updates):
+        results = await asyncio.gather(*(dp.feed_update(bot, u) for u in group), return_exceptions=True)
+        failed += sum(isinstance(r, Exception) for r in results)
+    total = time.perf_counter() - t
+
+    print(f"Replayed {len(updates)} updates in {total:.2f}s "
+          f"({len(updates) / total if total else 0:.0f}/s), {failed} raised")
+    header = f"{'handler':<48} {'calls':>6} {'err':>4} {'cpu ms':>9} {'db ms':>9} {'wall ms':>9}"
+    if args.alloc:
+        header += f" {'alloc KiB':>10}"
+    print(header)
+    for label, r in sorted(profile.rows.items(), key=lambda kv: -kv[1]["cpu"]):
+        line = (f"{label:<48} {r['calls']:>6} {r['errors']:>4} {r['cpu'] * 1000:>9.1f} "
+                f"{r['db'] * 1000:>9.1f} {r['wall'] * 1000:>9.1f}")
+        if args.alloc:
+            line += f" {r['alloc'] / 1024:>10.1f}"
+        print(line)
+    print("Bot API calls (stubbed):", dict(sorted(session.calls.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("updates", help="JSONL-файл, записанный UpdateRecorderMiddleware")
+    parser.add_argument("--db", default=config.DATABASE_NAME, help="исходная БД, проигрывание идёт на её копии")
+    parser.add_argument("--alloc", action="store_true", help="считать выделения памяти (tracemalloc)")
+    parser.add_argument("--throttle", action="store_true", help="оставить антифлуд включённым")
+    parser.add_argument("--album-window", type=float, default=config.MEDIA_GROUP_WINDOW,
+                        help="окно сборки альбома, сек (по умолчанию как вживую; 0 — не ждать)")
+    parser.add_argument("--bot-id", type=int, default=0,
+                        help="ID бота, от имени которого идут апдейты (по умолчанию — бот большинства каналов)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} not found")
+    config.DATABASE_NAME = copy_database(args.db)
+    config.RECORD_UPDATES_PATH = ""
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    print(f"Database copy: {config.DATABASE_NAME}")
+    asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
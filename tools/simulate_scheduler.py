@@ -0,0 +1,137 @@
+"""
+Симуляция планировщика подписок в ускоренном времени.
+
+Заполняет отдельную БД большим числом подписок, разбросанных на несколько
+недель вперёд, и прокручивает виртуальные часы шагами по `interval` секунд,
+вызывая на каждом шаге тот же sweep_once(), что и бот, и разбирая outbox
+без обращения к Telegram. В конце печатает длительность обходов, время
+работы с БД, пиковую память и отставание фактического исключения от
+момента истечения подписки.
+
+Запуск из корня репозитория:
+    python -m tools.simulate_scheduler --subs 1000000 --weeks 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+import clock
+import config
+import database
+from services.subscriptions import sweep_once
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def populate(subs: int, channels: int, start: int, span: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    with database.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO channels(channel_id, owner_id, title, payment_info)
+            VALUES (?, ?, ?, '')
+        """, ((-1000 - c, c, f"Channel {c}") for c in range(channels)))
+        conn.executemany("""
+            INSERT INTO subscriptions(channel_id, user_id, expire_at, reminded_1h)
+            VALUES (?, ?, ?, 0)
+        """, ((-1000 - i % channels, i, start + rnd.randrange(span)) for i in range(subs)))
+
+
+def drain_outbox(now: int, lags: List[float]) -> int:
+    """
+    Разбирает outbox так, как это делали бы воркеры, но без вызовов Bot API.
+    """
+    done = 0
+    while True:
+        job = database.claim_job(config.OUTBOX_LEASE)
+        if job is None:
+            return done
+        if job["kind"] == "kick":
+            lags.append(now - job["payload"]["expire_at"])
+        database.complete_job(job["id"])
+        done += 1
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    start = int(time.time())
+    span = args.weeks * 7 * 86400
+    end = start + span + 3600
+
+    t0 = time.perf_counter()
+    database.init_db()
+    populate(args.subs, args.channels, start, span, args.seed)
+    print(f"Populated {args.subs} subscriptions in {time.perf_counter() - t0:.1f}s")
+
+    vclock = clock.VirtualClock(start)
+    clock.use(vclock)
+
+    tracemalloc.start()
+    sweep_times: List[float] = []
+    drain_times: List[float] = []
+    lags: List[float] = []
+    expired_total = reminded_total = jobs_total = 0
+
+    t_wall = time.perf_counter()
+    while vclock.time() < end:
+        t = time.perf_counter()
+        expired, reminded = await sweep_once(args.batch)
+        sweep_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        jobs_total += drain_outbox(clock.now(), lags)
+        drain_times.append(time.perf_counter() - t)
+
+        expired_total += expired
+        reminded_total += reminded
+        await clock.sleep(args.interval)
+    wall = time.perf_counter() - t_wall
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = 1000
+    print(f"Simulated {span / 86400:.1f} days in {wall:.1f}s wall, {len(sweep_times)} sweeps")
+    print(f"Expired: {expired_total}, reminded: {reminded_total}, outbox jobs: {jobs_total}")
+    print(f"Sweep (DB) time, ms: p50={percentile(sweep_times, .5) * ms:.2f} "
+          f"p95={percentile(sweep_times, .95) * ms:.2f} max={max(sweep_times) * ms:.2f} "
+          f"total={sum(sweep_times):.1f}s")
+    print(f"Outbox drain (DB) time, ms: p50={percentile(drain_times, .5) * ms:.2f} "
+          f"p95={percentile(drain_times, .95) * ms:.2f} max={max(drain_times) * ms:.2f} "
+          f"total={sum(drain_times):.1f}s")
+    print(f"Removal lag after expiry, s: p50={percentile(lags, .5):.0f} "
+          f"p95={percentile(lags, .95):.0f} max={max(lags, default=0):.0f}")
+    print(f"Python heap peak: {peak / 2 ** 20:.1f} MiB, "
+          f"max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subs", type=int, default=1_000_000, help="число подписок")
+    parser.add_argument("--channels", type=int, default=1000, help="число каналов")
+    parser.add_argument("--weeks", type=int, default=4, help="на сколько недель разбросаны истечения")
+    parser.add_argument("--interval", type=int, default=60, help="шаг планировщика, с")
+    parser.add_argument("--batch", type=int, default=1000, help="размер порции обхода")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="файл БД (по умолчанию временный)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "simulation.db")
+    if os.path.exists(path):
+        sys.exit(f"{path} already exists, refusing to overwrite")
+    config.DATABASE_NAME = path
+    print(f"Database: {path}")
+    asyncio.run(simulate(args))
+
+
+if __name__ == "__main__":
+    main()
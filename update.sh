@@ -1,6 +1,31 @@
-echo "Updating subscriberBot..."
-sudo systemctl stop subscriberBot
+# Деплой без простоя: новый экземпляр запускается заранее и ждёт аренды в БД,
+# старый по SIGTERM перестаёт принимать апдейты, дорабатывает начатое и отдаёт её.
+# Экземпляры — шаблонный unit subscriberBot@.service (blue/green) с KillSignal=SIGTERM
+# и TimeoutStopSec больше POLLING_DRAIN_TIMEOUT и SCHEDULER_DRAIN_TIMEOUT.
 echo "Pulling changes..."
-git pull
-echo "Restarting subscriberBot..."
-sudo systemctl start subscriberBot
\ No newline at end of file
+git pull || exit 1
+
+OLD=""
+for unit in subscriberBot subscriberBot@blue subscriberBot@green; do
+    if systemctl is-active --quiet "$unit"; then
+        OLD="$unit"
+    fi
+done
+NEW="subscriberBot@blue"
+if [ "$OLD" = "subscriberBot@blue" ]; then
+    NEW="subscriberBot@green"
+fi
+
+echo "Starting $NEW..."
+sudo systemctl start "$NEW"
+sleep "${WARMUP:-5}"
+if ! systemctl is-active --quiet "$NEW"; then
+    echo "$NEW failed to start, $OLD keeps running"
+    exit 1
+fi
+
+if [ -n "$OLD" ]; then
+    echo "Handing over from $OLD..."
+    sudo systemctl stop "$OLD"
+fi
+echo "subscriberBot is running as $NEW"
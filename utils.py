@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
@@ -50,3 +50,32 @@ def make_keyboard(
         keyboard.append(row)
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def nav_buttons(
+    rows: List[dict],
+    has_more: bool,
+    backward: bool,
+    at_start: bool,
+    make_target: Callable[[bool, dict], str],
+) -> List[Tuple[str, str]]:
+    """
+    Кнопки «назад/вперёд» для страницы, полученной keyset-выборкой.
+
+    :param rows: строки текущей страницы
+    :param has_more: есть ли ещё строки в направлении движения
+    :param backward: страница получена движением назад
+    :param at_start: это первая страница (без курсора)
+    :param make_target: (backward, граничная строка) -> callback_data
+    """
+    if not rows:
+        return []
+    has_prev = has_more if backward else not at_start
+    has_next = True if backward else has_more
+
+    buttons: List[Tuple[str, str]] = []
+    if has_prev:
+        buttons.append(("◀️", make_target(True, rows[0])))
+    if has_next:
+        buttons.append(("▶️", make_target(False, rows[-1])))
+    return buttons